@@ -1,76 +1,177 @@
 # siglab_lib/calcHiguchi.py
 import numpy as np
-from scipy import stats
+from numpy.lib.stride_tricks import sliding_window_view
+from siglab_lib.featureTable import FeatureTable, feature_precision
 
-def calculate_higuchi_stats(magR, time_S):
+# Feature table columns: curve length for k = 1..5 and the log-log slope
+HIGUCHI_COLUMNS = ('length_k1', 'length_k2', 'length_k3', 'length_k4', 'length_k5', 'slope')
+
+def higuchi_windows(windows, k_values=(1, 2, 3, 4, 5)):
+    """
+    Calculate Higuchi Fractal Dimension statistics for a stack of windows
+
+    Parameters:
+    - windows: (num_windows, N) array, one analysis window per row
+    - k_values: Interval lengths used for the curve lengths
+
+    Returns:
+    - (num_windows, len(k_values) + 1) array; curve length per k and log-log slope
+    """
+    num_windows, N = windows.shape
+    hfd_values = np.zeros((num_windows, len(k_values)))
+
+    for col, k in enumerate(k_values):
+        for m in range(k):
+            # Construct derived series from each window and calculate its length
+            curve_length = np.abs(np.diff(windows[:, m::k], axis=1)).sum(axis=1)
+
+            # Normalize length
+            hfd_values[:, col] += curve_length * (N / (((N - m) // k) * k))
+
+        # Average length for this interval
+        hfd_values[:, col] /= k
+
+    # Log-log regression slope, same as stats.linregress for each row
+    x = np.log(k_values)
+    x_centered = x - x.mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y = np.log(hfd_values)
+        slope = (y @ x_centered) / (x_centered @ x_centered)
+
+    return np.column_stack([hfd_values, slope])
+
+def calculate_higuchi_block(block, samples_per_sec, carry=None):
+    """
+    Calculate Higuchi statistics for a block of whole segments
+
+    Parameters:
+    - block: Signal data for consecutive segments (length a multiple of samples_per_sec)
+    - samples_per_sec: Samples in one segment
+    - carry: Last segment of the previous block, or None for the first block
+
+    Returns:
+    - higuchi_stats: FeatureTable with HIGUCHI_COLUMNS for the block
+    - carry: Lookback samples to pass to the next block
+    """
+    num_segments = len(block) // samples_per_sec
+    two_sec_window = 2 * samples_per_sec
+    higuchi_stats = FeatureTable(HIGUCHI_COLUMNS, num_rows=num_segments)  # HFD for k=1,2,3,4,5 and slope
+
+    if num_segments == 0:
+        return higuchi_stats, carry
+
+    # The first segment of the recording has no lookback and stays zero
+    first = 0 if carry is not None else 1
+    data = block if carry is None else np.concatenate([carry, block])
+
+    # 2-second windows ending at the end of each segment, stepped by one segment
+    if len(data) >= two_sec_window:
+        windows = sliding_window_view(data, two_sec_window)[::samples_per_sec]
+        higuchi_stats.buffer[:, first:] = higuchi_windows(windows[:num_segments - first]).T
+
+    return higuchi_stats, block[(num_segments - 1) * samples_per_sec:num_segments * samples_per_sec]
+
+def calculate_higuchi_stats(magR, time_axis):
     """
     Calculate Higuchi Fractal Dimension statistics for 1-second windows with 2-second lookback
-    
+
     Parameters:
     - magR: Full signal data
-    - time_S: Corresponding time data
-    
+    - time_axis: TimeAxis of the signal
+
     Returns:
-    - Higuchi statistics array
+    - FeatureTable with HIGUCHI_COLUMNS
     """
-    # Sampling parameters
-    samples_per_sec = 30
-    two_sec_window = 2 * samples_per_sec
-    
-    # Initialize output arrays
+    # Sampling parameters from the file's sample rate
+    samples_per_sec = time_axis.samples_per_segment
+    num_segments = len(magR) // samples_per_sec
+
+    higuchi_stats, _ = calculate_higuchi_block(magR[:num_segments * samples_per_sec], samples_per_sec)
+    return higuchi_stats
+
+def higuchi_mean(higuchi_stats):
+    """Mean curve length over k = 1..5 of each segment"""
+    return higuchi_stats.values(HIGUCHI_COLUMNS[:5]).mean(axis=0)
+
+# Features per configuration in a Higuchi sweep cube
+SWEEP_FEATURES = ('higuchi_mean', 'slope')
+
+def _lag_prefix_sums(x, k):
+    """
+    Prefix sums of the lag-k absolute differences along each residue class
+
+    Returns:
+    - P with P[i] = d[i] + d[i - k] + d[i - 2k] + ..., where d[i] = |x[i + k] - x[i]|
+    """
+    d = np.abs(x[k:] - x[:-k])
+    rows = -(-len(d) // k)
+    padded = np.zeros(rows * k)
+    padded[:len(d)] = d
+    return padded.reshape(rows, k).cumsum(axis=0).ravel()[:len(d)]
+
+def higuchi_sweep(magR, time_axis, window_seconds=(2,), kmax_values=(5,)):
+    """
+    Higuchi mean and slope for every (window length, k-max) pair in one pass
+
+    Each lag k is differenced and prefix-summed once; the curve length of any
+    window is then a difference of two prefix sums per offset m, so every
+    extra window length or k-max costs O(segments). Window length 2 s with
+    k-max 5 reproduces calculate_higuchi_stats.
+
+    Parameters:
+    - magR: Full signal data
+    - time_axis: TimeAxis of the signal
+    - window_seconds: Window lengths in seconds (windows end at each segment end)
+    - kmax_values: Largest interval k of each configuration (k = 1..kmax)
+
+    Returns:
+    - configs: List of (window_seconds, kmax), in cube order
+    - cube: (num_configs, len(SWEEP_FEATURES), num_segments) array; segments
+      without a full window are zero
+    """
+    samples_per_sec = time_axis.samples_per_segment
     num_segments = len(magR) // samples_per_sec
-    higuchi_stats = np.zeros((num_segments, 6))  # HFD for k=1,2,3,4,5 and slope
-    
-    for i in range(1, num_segments):
-        # Current segment start and end indices 
-        # Start 2 seconds back, but calculate for the current 1-second segment
-        start_idx = (i-1) * samples_per_sec
-        end_idx = start_idx + two_sec_window
-        current_segment_start = i * samples_per_sec
-        current_segment_end = current_segment_start + samples_per_sec
-        
-        # Ensure we don't go out of bounds
-        end_idx = min(end_idx, len(magR))
-        current_segment_end = min(current_segment_end, len(magR))
-        
-        window_data = magR[start_idx:end_idx]
-        current_segment = magR[current_segment_start:current_segment_end]
-        
-        # Only calculate if we have full 2-second window
-        if len(window_data) == two_sec_window and len(current_segment) == samples_per_sec:
-            # Calculate Higuchi Fractal Dimension for k=1,2,3,4,5
-            k_values = [1, 2, 3, 4, 5]
-            hfd_values = []
-            
-            for k in k_values:
-                N = len(window_data)
-                lengths = []
-                
-                for m in range(k):
-                    # Construct derived series from full 2-second window
-                    derived_series = window_data[m::k]
-                    
-                    # Calculate length
-                    curve_length = np.sum(np.abs(np.diff(derived_series)))
-                    
-                    # Normalize length
-                    L = curve_length * (N / (((N - m) // k) * k))
-                    lengths.append(L)
-                
-                # Average length for this interval
-                hfd_values.append(np.mean(lengths))
-            
-            # Log-log regression
-            x = np.log(k_values)
-            y = np.log(hfd_values)
-            
-            # Linear regression
-            slope, _, _, _, _ = stats.linregress(x, y)
-            
-            # Store results
-            higuchi_stats[i] = [*hfd_values, slope]
-        else:
-            # Copy previous values if window is incomplete
-            higuchi_stats[i] = higuchi_stats[i-1]
-    
-    return higuchi_stats
\ No newline at end of file
+    x = np.asarray(magR[:num_segments * samples_per_sec], dtype=np.float64)
+    segment_end = (np.arange(num_segments) + 1) * samples_per_sec
+
+    window_lengths = {w: int(round(w * samples_per_sec)) for w in window_seconds}
+    max_k = max(kmax_values)
+
+    # Curve length per (window, k) for the segments that have a full window
+    lengths = {w: np.zeros((max_k, num_segments)) for w in window_seconds}
+    for k in range(1, max_k + 1):
+        if len(x) <= k:
+            break
+        prefix = _lag_prefix_sums(x, k)
+        for w, N in window_lengths.items():
+            rows = np.flatnonzero(segment_end >= N)
+            start = segment_end[rows] - N
+            for m in range(k):
+                num_diffs = (N - m - 1) // k
+                if num_diffs <= 0:
+                    continue
+                first = start + m
+                last = first + (num_diffs - 1) * k
+                before = np.where(first >= k, prefix[np.maximum(first - k, 0)], 0.0)
+                curve_length = prefix[last] - before
+
+                # Normalize length (same factor as higuchi_windows)
+                lengths[w][k - 1, rows] += curve_length * (N / (((N - m) // k) * k))
+            lengths[w][k - 1, rows] /= k
+
+    configs = [(w, kmax) for w in window_seconds for kmax in kmax_values]
+    cube = np.zeros((len(configs), len(SWEEP_FEATURES), num_segments), dtype=feature_precision())
+    for index, (w, kmax) in enumerate(configs):
+        hfd_values = lengths[w][:kmax]
+        valid = segment_end >= window_lengths[w]
+
+        # Log-log regression slope, same as higuchi_windows
+        log_k = np.log(np.arange(1, kmax + 1))
+        log_k_centered = log_k - log_k.mean()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (log_k_centered @ np.log(hfd_values)) / (log_k_centered @ log_k_centered)
+
+        cube[index, 0] = np.where(valid, hfd_values.mean(axis=0), 0.0)
+        cube[index, 1] = np.where(valid, slope, 0.0)
+
+    return configs, cube
@@ -1,159 +1,305 @@
 # siglab_lib/calcStats.py
 import numpy as np
+from siglab_lib.featureTable import FeatureTable
 
-def compute_blood_stats(magR, time_S):
+# Feature table columns: per-segment statistics, then the blood tracker estimates
+SEGMENT_COLUMNS = ('max', 'min', 'mean', 'range', 'std')
+BLOOD_COLUMNS = ('blood_val', 'blood_rng')
+STATS_COLUMNS = SEGMENT_COLUMNS + BLOOD_COLUMNS
+
+def segment_view(magR, samples_per_sec):
     """
-    Compute blood statistics with robust update mechanism
-    
+    Reshape signal data into whole 1-second segments (no copy)
+
     Parameters:
-    - magR: Full signal data
-    - time_S: Corresponding time data
-    
+    - magR: Signal data
+    - samples_per_sec: Samples in one segment
+
     Returns:
-    - Blood statistics array
+    - (num_segments, samples_per_sec) view of magR; trailing partial segment dropped
     """
-    # Sampling parameters
-    samples_per_sec = 30
-    segment_length = samples_per_sec  # 1-second segment
-    
-    # Initial blood estimates
-    blood_est_val = 700.0
-    blood_est_rng = 40.0
-    
-    # Flag to track when first valid blood segment is found
-    first_valid_found = False
-    
-    # Initialize output arrays
     num_segments = len(magR) // samples_per_sec
-    blood_stats = np.zeros((num_segments, 2))
-    blood_stats[0] = [blood_est_val, blood_est_rng]
-    
-    for i in range(1, num_segments):
-        # Current segment start and end indices
-        start_idx = i * samples_per_sec
-        end_idx = start_idx + samples_per_sec
-        current_segment = magR[start_idx:end_idx]
-        
-        # Compute current segment statistics
-        segment_mean = np.mean(current_segment)
-        segment_range = np.max(current_segment) - np.min(current_segment)
-        
+    return magR[:num_segments * samples_per_sec].reshape(num_segments, samples_per_sec)
+
+# Blood tracker constants
+DEFAULT_BLOOD_PARAMS = {
+    'init_val': 700.0,          # Initial blood estimate value
+    'init_rng': 40.0,           # Initial blood estimate range
+    'first_range_max': 40.0,    # Max segment range to accept the first blood segment
+    'first_mean_step': 40.0,    # Max mean change vs previous segment for the first blood segment
+    'reject_dist': 60.0,        # Segments farther than this from the estimate are ignored
+    'max_step': 10.0,           # Clamp on the per-segment move of the estimate
+    'ema_alpha': 0.1            # Exponential moving average weight of the new segment
+}
+
+def init_blood_carry(params=None):
+    """
+    Create the carry-over state for the blood tracker
+
+    Parameters:
+    - params: Tracker constants overriding DEFAULT_BLOOD_PARAMS
+
+    Returns:
+    - Dictionary holding the tracker state between blocks of segments
+    """
+    params = dict(DEFAULT_BLOOD_PARAMS, **(params or {}))
+    return {
+        'params': params,
+        'segment': 0,                        # Index of the next segment to process
+        'blood_est_val': params['init_val'], # Initial blood estimates
+        'blood_est_rng': params['init_rng'],
+        'first_valid_found': False,
+        'prev_mean': None,                   # Mean of the previous segment
+        'prev_row': None                     # Previous [val, rng] output row
+    }
+
+def track_blood_stats(segment_mean, segment_range, carry):
+    """
+    Run the blood tracker over a block of consecutive segments
+
+    Parameters:
+    - segment_mean: Per-segment means for the block
+    - segment_range: Per-segment ranges for the block
+    - carry: Tracker state from init_blood_carry(), updated in place
+
+    Returns:
+    - Blood statistics array for the block, columns [val, rng]
+    """
+    p = carry['params']
+    keep = 1.0 - p['ema_alpha']
+    alpha = p['ema_alpha']
+
+    blood_est_val = carry['blood_est_val']
+    blood_est_rng = carry['blood_est_rng']
+    first_valid_found = carry['first_valid_found']
+    prev_mean = carry['prev_mean']
+    prev_row = carry['prev_row']
+
+    rows = []
+    i = carry['segment']
+    for seg_mean, seg_range in zip(np.asarray(segment_mean).tolist(),
+                                   np.asarray(segment_range).tolist()):
+        if i == 0:
+            # First segment always holds the initial estimates
+            row = (blood_est_val, blood_est_rng)
+
         # Initial criteria before first valid segment:
-        if not first_valid_found:
+        elif not first_valid_found:
             # More relaxed criteria for initial blood estimate
-            if segment_range <= 40:  # Tight range
+            if seg_range <= p['first_range_max']:  # Tight range
                 # Check neighboring segments for consistency
                 if i > 1:
-                    prev_segment = magR[(i-1)*samples_per_sec:i*samples_per_sec]
-                    prev_mean = np.mean(prev_segment)
-                    
                     # Check if means are close
-                    if abs(segment_mean - prev_mean) <= 40:
+                    if abs(seg_mean - prev_mean) <= p['first_mean_step']:
                         # Update blood estimate
-                        blood_est_val = blood_est_val * 0.9 + segment_mean * 0.1
-                        blood_est_rng = blood_est_rng * 0.9 + segment_range * 0.1
+                        blood_est_val = blood_est_val * keep + seg_mean * alpha
+                        blood_est_rng = blood_est_rng * keep + seg_range * alpha
                         first_valid_found = True
-                        blood_stats[i] = [blood_est_val, blood_est_rng]
+                        row = (blood_est_val, blood_est_rng)
                     else:
                         # Copy previous value if no valid segment found
-                        blood_stats[i] = blood_stats[i-1]
+                        row = prev_row
+                else:
+                    # No previous segment to compare against; row left empty
+                    row = (0.0, 0.0)
             else:
                 # Copy previous value if no valid segment found
-                blood_stats[i] = blood_stats[i-1]
-        
+                row = prev_row
+
         # After first valid segment is found
         else:
             # Check distance from current blood estimate
-            mean_diff = segment_mean - blood_est_val
-            
-            # Limit update if farther than 60
-            if abs(segment_mean - blood_est_val) > 60:
+            mean_diff = seg_mean - blood_est_val
+
+            # Limit update if farther than reject_dist
+            if abs(mean_diff) > p['reject_dist']:
                 # Copy previous value
-                blood_stats[i] = blood_stats[i-1]
-                continue
-            
-            # Limit movement to +/- 10, but preserve the direction
-            if abs(mean_diff) > 10:
-                mean_diff = 10 if mean_diff > 0 else -10
-            
-            # Update using exponential moving average to preserve overall trend
-            blood_est_val = blood_est_val * 0.9 + (blood_est_val + mean_diff) * 0.1
-            blood_est_rng = blood_est_rng * 0.9 + segment_range * 0.1
-            
-            # Store current blood estimates
-            blood_stats[i] = [blood_est_val, blood_est_rng]
-    
-    return blood_stats
+                row = prev_row
+            else:
+                # Limit movement to +/- max_step, but preserve the direction
+                if abs(mean_diff) > p['max_step']:
+                    mean_diff = p['max_step'] if mean_diff > 0 else -p['max_step']
+
+                # Update using exponential moving average to preserve overall trend
+                blood_est_val = blood_est_val * keep + (blood_est_val + mean_diff) * alpha
+                blood_est_rng = blood_est_rng * keep + seg_range * alpha
+                row = (blood_est_val, blood_est_rng)
+
+        rows.append(row)
+        prev_row = row
+        prev_mean = seg_mean
+        i += 1
+
+    # Save state for the next block
+    carry.update({
+        'segment': i,
+        'blood_est_val': blood_est_val,
+        'blood_est_rng': blood_est_rng,
+        'first_valid_found': first_valid_found,
+        'prev_mean': prev_mean,
+        'prev_row': prev_row
+    })
+
+    return np.array(rows, dtype=np.float64).reshape(-1, 2)
+
+def track_blood_batch(segment_mean, segment_range, params):
+    """
+    Run the blood tracker for many parameter sets at once
+
+    Same rules as track_blood_stats, with every constant an array of shape
+    (P,) so P tracker configurations advance together segment by segment.
+
+    Parameters:
+    - segment_mean: Per-segment means of the whole recording
+    - segment_range: Per-segment ranges of the whole recording
+    - params: Dictionary of DEFAULT_BLOOD_PARAMS keys, each a scalar or (P,) array
+
+    Returns:
+    - blood_val: (P, num_segments) blood estimate values
+    - blood_rng: (P, num_segments) blood estimate ranges
+    """
+    p = {key: np.atleast_1d(np.asarray(value, dtype=np.float64))
+         for key, value in dict(DEFAULT_BLOOD_PARAMS, **params).items()}
+    num_configs = max(len(value) for value in p.values())
+    p = {key: np.broadcast_to(value, (num_configs,)) for key, value in p.items()}
+    keep = 1.0 - p['ema_alpha']
+    alpha = p['ema_alpha']
+
+    num_segments = len(segment_mean)
+    blood_val = np.zeros((num_configs, num_segments))
+    blood_rng = np.zeros((num_configs, num_segments))
+    if num_segments == 0:
+        return blood_val, blood_rng
+
+    est_val = p['init_val'].copy()
+    est_rng = p['init_rng'].copy()
+    found = np.zeros(num_configs, dtype=bool)
+    row_val = est_val.copy()
+    row_rng = est_rng.copy()
+    blood_val[:, 0] = row_val
+    blood_rng[:, 0] = row_rng
+
+    means = np.asarray(segment_mean, dtype=np.float64).tolist()
+    ranges = np.asarray(segment_range, dtype=np.float64).tolist()
+    for i in range(1, num_segments):
+        seg_mean = means[i]
+        seg_range = ranges[i]
+
+        # Before the first valid segment: tight range and a steady mean
+        tight = seg_range <= p['first_range_max']
+        if i > 1:
+            first = ~found & tight & (abs(seg_mean - means[i - 1]) <= p['first_mean_step'])
+            empty = np.zeros(num_configs, dtype=bool)
+        else:
+            first = np.zeros(num_configs, dtype=bool)
+            empty = ~found & tight
+
+        # After it: bounded, clamped moving average
+        mean_diff = np.clip(seg_mean - est_val, -p['max_step'], p['max_step'])
+        follow = found & (np.abs(seg_mean - est_val) <= p['reject_dist'])
+
+        new_val = np.where(first, est_val * keep + seg_mean * alpha,
+                           est_val * keep + (est_val + mean_diff) * alpha)
+        update = first | follow
+        est_val = np.where(update, new_val, est_val)
+        est_rng = np.where(update, est_rng * keep + seg_range * alpha, est_rng)
+        found |= first
+
+        # Updated rows take the new estimate, the rest copy the previous row
+        row_val = np.where(update, est_val, np.where(empty, 0.0, row_val))
+        row_rng = np.where(update, est_rng, np.where(empty, 0.0, row_rng))
+        blood_val[:, i] = row_val
+        blood_rng[:, i] = row_rng
 
+    return blood_val, blood_rng
 
+def compute_blood_stats(magR, time_axis):
+    """
+    Compute blood statistics with robust update mechanism
 
+    Parameters:
+    - magR: Full signal data
+    - time_axis: TimeAxis of the signal
 
-def compute_segment_stats(magR, time_S):
+    Returns:
+    - Blood statistics array
+    """
+    segments = segment_view(magR, time_axis.samples_per_segment)
+    segment_mean = segments.mean(axis=1)
+    segment_range = segments.max(axis=1) - segments.min(axis=1)
+
+    return track_blood_stats(segment_mean, segment_range, init_blood_carry())
+
+def compute_segment_block_stats(segments):
+    """
+    Compute max, min, mean, range, std for a block of segments
+
+    Parameters:
+    - segments: (num_segments, samples_per_sec) array
+
+    Returns:
+    - FeatureTable with SEGMENT_COLUMNS
+    """
+    table = FeatureTable(SEGMENT_COLUMNS, num_rows=len(segments))
+    table['max'] = segments.max(axis=1)
+    table['min'] = segments.min(axis=1)
+    table['mean'] = segments.mean(axis=1)
+    table['range'] = table['max'] - table['min']
+    table['std'] = segments.std(axis=1)
+    return table
+
+def add_blood_stats(segment_stats, carry):
+    """
+    Run the blood tracker over segment statistics
+
+    Parameters:
+    - segment_stats: FeatureTable with SEGMENT_COLUMNS
+    - carry: Tracker state from init_blood_carry (updated in place)
+
+    Returns:
+    - FeatureTable with STATS_COLUMNS
+    """
+    blood_stats = track_blood_stats(segment_stats['mean'], segment_stats['range'], carry)
+    return segment_stats.with_columns(blood_val=blood_stats[:, 0], blood_rng=blood_stats[:, 1])
+
+def compute_segment_stats(magR, time_axis):
     """
     Compute statistics for 1 Hz segments
-    
+
     Parameters:
     - magR: Full signal data
-    - time_S: Corresponding time data
-    
+    - time_axis: TimeAxis of the signal
+
     Returns:
-    - Dictionary with segment statistics
-    """
-    # Compute number of segments (1 Hz)
-    total_samples = len(magR)
-    samples_per_segment = 30  # 30 Hz sampling
-    num_segments = total_samples // samples_per_segment
-
-    # Initialize statistics arrays
-    seg_stats_each = np.zeros((num_segments, 5))  # max, min, mean, range, std
-    seg_stats_time = np.zeros(num_segments)
-
-    # Compute statistics for each segment
-    for i in range(num_segments):
-        start = i * samples_per_segment
-        end = start + samples_per_segment
-        segment = magR[start:end]
-        
-        seg_stats_each[i, 0] = np.max(segment)     # max
-        seg_stats_each[i, 1] = np.min(segment)     # min
-        seg_stats_each[i, 2] = np.mean(segment)    # mean
-        seg_stats_each[i, 3] = seg_stats_each[i, 0] - seg_stats_each[i, 1]  # range
-        seg_stats_each[i, 4] = np.std(segment)     # std
-        
-        seg_stats_time[i] = time_S[start]  # time at start of segment
+    - FeatureTable with SEGMENT_COLUMNS (segment times come from time_axis.segment_to_time)
+    """
+    # Segment length follows the sample rate of the file
+    return compute_segment_block_stats(segment_view(magR, time_axis.samples_per_segment))
 
-    return {
-        'each': seg_stats_each,
-        'time': seg_stats_time
-    }
+def compute_stats(magR, time_axis, blood_params=None):
+    """
+    Compute segment statistics and blood estimates for a signal
+
+    Parameters:
+    - magR: Full signal data
+    - time_axis: TimeAxis of the signal
+    - blood_params: Tracker constants overriding DEFAULT_BLOOD_PARAMS
+
+    Returns:
+    - FeatureTable with STATS_COLUMNS, one row per whole segment
+    """
+    return add_blood_stats(compute_segment_stats(magR, time_axis), init_blood_carry(blood_params))
 
 def calculate_segment_stats(app):
     """
     Calculate comprehensive signal statistics
-    
+
     Parameters:
-    - app: Main application instance with time_S and magR attributes
-    
+    - app: Main application instance with time_axis and magR attributes
+
     Returns:
-    - stats: Dictionary containing:
-        - bloodEstRng: Blood range estimates
-        - bloodEstVal: Blood mean estimates
-        - segmentStats: 1-second interval statistics
-    """
-    # Compute segment statistics
-    segment_stats = compute_segment_stats(app.magR, app.time_S)
-    
-    # Compute blood statistics
-    blood_stats = compute_blood_stats(app.magR, app.time_S)
-    
-    # Prepare return structure
-    stats = {
-        'bloodEstRng': blood_stats[:, 1],     # Range column
-        'bloodEstVal': blood_stats[:, 0],     # Mean column
-        'segmentStats': {
-            'each': segment_stats['each'],    # Segment-wise statistics
-            'time': segment_stats['time']     # Corresponding times
-        }
-    }
-    
-    return stats
\ No newline at end of file
+    - FeatureTable with STATS_COLUMNS:
+        - max, min, mean, range, std: 1-second interval statistics
+        - blood_val, blood_rng: Blood mean and range estimates
+    """
+    return compute_stats(app.magR, app.time_axis)
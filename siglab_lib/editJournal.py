@@ -0,0 +1,204 @@
+# siglab_lib/editJournal.py
+import os
+import struct
+import numpy as np
+
+# Journal layout: header (magic, number of segments), then fixed-size
+# records (start segment, end segment, state) appended for every edit.
+# A record starting at _SNAPSHOT is followed by the whole state track as
+# int16 values; compaction rewrites the journal as a single snapshot.
+_MAGIC = b'SLJ1'
+_HEADER = struct.Struct('<4sI')
+_RECORD = struct.Struct('<IIh')
+_SNAPSHOT = 0xFFFFFFFF
+_SNAPSHOT_DTYPE = np.dtype('<i2')
+
+def journal_path(filepath):
+    """Journal file stored beside the recording"""
+    return filepath + '.jnl'
+
+def _runs(values):
+    """Split an array into (offset, end, value) runs of equal values"""
+    change = np.flatnonzero(np.diff(values)) + 1
+    starts = np.concatenate([[0], change])
+    ends = np.concatenate([change, [len(values)]])
+    return zip(starts.tolist(), ends.tolist(), values[starts].tolist())
+
+class EditJournal:
+    def __init__(self, filepath, num_segments, compact_every=500):
+        """
+        Append-only journal of state label edits for one recording
+
+        Parameters:
+        - filepath: Path to the .f5b file the labels belong to
+        - num_segments: Length of the tag/state array
+        - compact_every: Records after which the journal is compacted into a snapshot
+        """
+        self.filepath = filepath
+        self.path = journal_path(filepath)
+        self.num_segments = num_segments
+        self.compact_every = compact_every
+        self.num_records = 0
+
+        # In-memory undo/redo history: (start, end, state, replaced values)
+        self.undo_stack = []
+        self.redo_stack = []
+
+        self._file = None
+
+    def replay(self, tag_state):
+        """
+        Apply journaled edits left over from a previous session
+
+        Parameters:
+        - tag_state: State array loaded from the file, updated in place
+
+        Returns:
+        - Number of records applied
+        """
+        if not os.path.exists(self.path):
+            return 0
+
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        if len(data) < _HEADER.size:
+            return 0
+        magic, num_segments = _HEADER.unpack_from(data)
+        if magic != _MAGIC or num_segments != self.num_segments:
+            # Start over, so new edits are not appended behind a rejected header
+            print(f"Ignoring journal {self.path}: does not match {self.filepath}")
+            self._start_file()
+            return 0
+
+        applied = 0
+        offset = _HEADER.size
+        snapshot_size = self.num_segments * _SNAPSHOT_DTYPE.itemsize
+        while offset + _RECORD.size <= len(data):
+            start, end, state = _RECORD.unpack_from(data, offset)
+            if start == _SNAPSHOT:
+                if offset + _RECORD.size + snapshot_size > len(data):
+                    break
+                tag_state[:] = np.frombuffer(data, _SNAPSHOT_DTYPE, self.num_segments, offset + _RECORD.size)
+                offset += _RECORD.size + snapshot_size
+                applied += 1
+            else:
+                if end <= self.num_segments:
+                    tag_state[start:end] = state
+                    applied += 1
+                offset += _RECORD.size
+
+        # A record cut short by a crash is dropped from the file too, so the
+        # next edit is appended where a complete record ends
+        if offset < len(data):
+            os.truncate(self.path, offset)
+
+        self.num_records = applied
+        return applied
+
+    def _start_file(self):
+        """Truncate the journal to a fresh header and keep it open for appending"""
+        self.close()
+        self._file = open(self.path, 'wb')
+        self._file.write(_HEADER.pack(_MAGIC, self.num_segments))
+        self._file.flush()
+        self.num_records = 0
+
+    def _append(self, start, end, state):
+        """Append one record and push it to disk"""
+        if self._file is None:
+            if not os.path.exists(self.path) or os.path.getsize(self.path) < _HEADER.size:
+                self._start_file()
+            else:
+                self._file = open(self.path, 'ab')
+
+        self._file.write(_RECORD.pack(start, end, int(state)))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.num_records += 1
+
+    def _write_values(self, tag_state, start, values):
+        """Write a slice of state values, journaled as runs"""
+        for run_start, run_end, state in _runs(values):
+            tag_state[start + run_start:start + run_end] = state
+            self._append(start + run_start, start + run_end, state)
+
+    def assign(self, tag_state, start, end, state):
+        """
+        Assign a state to a range of segments and journal it
+
+        Parameters:
+        - tag_state: State array, updated in place
+        - start, end: Segment range [start, end)
+        - state: State code
+        """
+        self.undo_stack.append((start, end, state, tag_state[start:end].copy()))
+        self.redo_stack.clear()
+        tag_state[start:end] = state
+        self._append(start, end, state)
+
+    def undo(self, tag_state):
+        """
+        Revert the last assignment
+
+        Returns:
+        - (start, end) of the reverted range, or None if nothing to undo
+        """
+        if not self.undo_stack:
+            return None
+        start, end, state, previous = self.undo_stack.pop()
+        self.redo_stack.append((start, end, state, previous))
+        self._write_values(tag_state, start, previous)
+        return start, end
+
+    def redo(self, tag_state):
+        """
+        Re-apply the last undone assignment
+
+        Returns:
+        - (start, end) of the re-applied range, or None if nothing to redo
+        """
+        if not self.redo_stack:
+            return None
+        start, end, state, previous = self.redo_stack.pop()
+        self.undo_stack.append((start, end, state, previous))
+        tag_state[start:end] = state
+        self._append(start, end, state)
+        return start, end
+
+    def needs_compaction(self):
+        return self.num_records >= self.compact_every
+
+    def compact(self, tag_state):
+        """
+        Replace the journaled records with one snapshot of the current states
+
+        The recording itself is left untouched; its labels only change on Save.
+        The new journal is written beside the old one and swapped in, so a
+        crash leaves one of the two complete.
+
+        Parameters:
+        - tag_state: Current state array
+        """
+        self.close()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, self.num_segments))
+            f.write(_RECORD.pack(_SNAPSHOT, self.num_segments, 0))
+            f.write(np.asarray(tag_state).astype(_SNAPSHOT_DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.num_records = 0
+
+    def discard(self):
+        """Delete the journal file (after its edits are saved or reverted)"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.num_records = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
\ No newline at end of file
@@ -1,26 +1,26 @@
 # siglab_lib/externalPlot.py
 import os
 import tkinter as tk
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from siglab_lib.reportFigures import draw_stats, draw_higuchi
 
 def create_stats_plot(app):
     """
     Create a plot of segment statistics in a new window
+
+    While the stats are still being computed progressively, the window
+    shows the computed segments and fills in as more arrive.
     
     Parameters:
     - app: Main application instance
     """
-    # Use the pre-calculated stats from the app instance
-    if not hasattr(app, 'stats') or app.stats is None:
+    # Use the pre-calculated stats from the app instance, or the partial ones
+    progressive = app.progressive.get('stats')
+    if app.stats is None and progressive is None:
         tk.messagebox.showinfo("Stats Plot", "No stats available. Calculate stats first.")
         return
     
-    stats_data = app.stats
-    #print("bloodEstVal:", *[int(val) for val in stats_data['bloodEstVal'][:30]])
-    #print("bloodEstRng:", *[int(val) for val in stats_data['bloodEstRng'][:30]])
-    
     # Rest of the plotting code remains the same
     # Create new top-level window
     plot_window = tk.Toplevel()
@@ -42,33 +42,57 @@ def create_stats_plot(app):
     canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
     toolbar.pack(side=tk.TOP, fill=tk.X)
     
-    # Extract segment stats data
-    segment_stats = stats_data['segmentStats']['each']
-    tag_time_S = stats_data['segmentStats']['time']
-    
-    # Extract blood estimate values
-    blood_est_val = stats_data['bloodEstVal']
-    
-    # Plot data
-    ax.scatter(tag_time_S, segment_stats[:, 2], color='black', label='Mean', s=30)
-    
-    # Plot min-max range lines
-    for i in range(len(tag_time_S)):
-        ax.vlines(tag_time_S[i], segment_stats[i, 1], segment_stats[i, 0], 
-                  color='blue', alpha=0.5, linewidth=2)
-    
-    # Plot blood estimate value as a horizontal red line
-    #ax.axhline(y=blood_est_val[0], color='red', linestyle='--', label='Blood Est Value')
-    ax.plot(tag_time_S, blood_est_val, color='darkred', linestyle='-', label='Blood Est Value')
-    
-    ax.set_title(f"MinMaxRng plot: {os.path.basename(app.filepath)}")
-    ax.set_xlabel('Time (s)')
-    ax.set_ylabel('Magnitude')
-    ax.legend()
-    ax.grid(True)
-    
-    # Show the plot
-    canvas.draw()
+    # Draw means, min-max range lines and the blood estimate
+    title = f"MinMaxRng plot: {os.path.basename(app.filepath)}"
+    if progressive is None:
+        draw_stats(ax, app.stats, app.time_axis, title=title)
+        canvas.draw()
+        return
+
+    def redraw():
+        xlim = ax.get_xlim()
+        ax.clear()
+        draw_stats(ax, progressive.table, app.time_axis, title=title,
+                   valid=None if progressive.done else progressive.valid)
+        ax.set_xlim(xlim)
+
+    ax.set_xlim(app.time_axis.start, app.time_axis.end)
+    follow_progress(app, plot_window, canvas, [ax], progressive, redraw)
+#-------------------------------------------------------------
+#                    follow_progress
+#-------------------------------------------------------------
+def follow_progress(app, window, canvas, axes, progressive, redraw):
+    """
+    Redraw a window as a progressive feature computation fills in
+
+    The window's visible time range is computed first whenever it is
+    panned or zoomed.
+
+    Parameters:
+    - app: Main application instance
+    - window: Toplevel holding the plot
+    - canvas: Its FigureCanvasTkAgg
+    - axes: Time axes of the plot
+    - progressive: ProgressiveFeature being computed
+    - redraw: Callback that clears and redraws the axes
+    """
+    def focus(ax):
+        progressive.focus(*app.time_axis.segment_range(*ax.get_xlim()))
+
+    def update():
+        redraw()
+        # (ax.clear() drops callbacks, so they are connected again on every redraw)
+        for ax in axes:
+            ax.callbacks.connect('xlim_changed', focus)
+        canvas.draw_idle()
+
+    def stop_following(event):
+        if event.widget is window and (progressive, update) in app.progress_listeners:
+            app.progress_listeners.remove((progressive, update))
+
+    app.progress_listeners.append((progressive, update))
+    window.bind('<Destroy>', stop_following)
+    update()
 #-------------------------------------------------------------
 #                    create_higuchi_plot
 #-------------------------------------------------------------
@@ -81,8 +105,11 @@ def create_higuchi_plot(app):
     """
     from siglab_lib.calcHiguchi import calculate_higuchi_stats
     
-    # Calculate Higuchi statistics
-    higuchi_stats = calculate_higuchi_stats(app.magR, app.time_S)
+    # Use precomputed Higuchi statistics when available, or the partial ones
+    higuchi_stats = app.higuchi_stats
+    progressive = app.progressive.get('higuchi_stats')
+    if higuchi_stats is None and progressive is None:
+        higuchi_stats = calculate_higuchi_stats(app.magR, app.time_axis)
     
     # Create new top-level window 
     plot_window = tk.Toplevel()
@@ -112,28 +139,112 @@ def create_higuchi_plot(app):
     canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
     toolbar.pack(side=tk.TOP, fill=tk.X)
     
-    # Extract time points
-    tag_time_S = app.time_S[::30]  # Time points for each segment
-    
-    # Calculate 1-second mean of Higuchi values
-    higuchi_mean = np.mean(higuchi_stats[:, :5], axis=1)
-    
-    # Plot Higuchi Mean with 1 pt width line and 10pt dots
-    mean_ax.plot(tag_time_S, higuchi_mean, color='black', linewidth=1.0)
-    mean_ax.scatter(tag_time_S, higuchi_mean, color='black', s=10)
-    mean_ax.set_title(f"Higuchi Mean: {os.path.basename(app.filepath)}")
-    mean_ax.set_ylabel('Higuchi Mean')
-    mean_ax.grid(True)
-    
-    # Plot Higuchi Slope with dots only
-    slope_ax.scatter(tag_time_S, higuchi_stats[:, 5], color='black', s=10)
-    slope_ax.set_title(f"Higuchi Slope: {os.path.basename(app.filepath)}")
-    slope_ax.set_xlabel('Time (s)')
-    slope_ax.set_ylabel('Higuchi Slope')
-    slope_ax.grid(True)
+    # Draw Higuchi mean and slope over time
+    if progressive is None:
+        draw_higuchi(mean_ax, slope_ax, higuchi_stats, app.time_axis, os.path.basename(app.filepath))
+    else:
+        def redraw():
+            xlim = mean_ax.get_xlim()
+            mean_ax.clear()
+            slope_ax.clear()
+            draw_higuchi(mean_ax, slope_ax, progressive.table, app.time_axis, os.path.basename(app.filepath),
+                         valid=None if progressive.done else progressive.valid)
+            mean_ax.set_xlim(xlim)
+
+        mean_ax.set_xlim(app.time_axis.start, app.time_axis.end)
+        follow_progress(app, plot_window, canvas, [mean_ax], progressive, redraw)
     
     # Adjust layout to prevent overlap
     plt.tight_layout()
     
     # Show the plot
-    canvas.draw()
\ No newline at end of file
+    canvas.draw()
+#-------------------------------------------------------------
+#                    create_confusion_window
+#-------------------------------------------------------------
+def create_confusion_window(app):
+    """
+    Show the confusion matrix of labeled (tag_state) vs estimated states
+
+    Parameters:
+    - app: Main application instance
+    """
+    from siglab_lib.stateEst import confusion_matrix, format_confusion
+
+    matrix = confusion_matrix(app.tag_state, app.state_est, num_states=len(app.state_colors))
+    state_names = [app.state_colors[code]['name'] for code in sorted(app.state_colors)]
+
+    # Create new top-level window
+    text_window = tk.Toplevel()
+    text_window.title(f"Labeled vs Estimated States: {os.path.basename(app.filepath)}")
+    text_window.configure(bg='#B0C4DE')  # Match main window background
+
+    text = tk.Text(text_window, font=('Courier', 10), bg='#E6EDF3', width=80, height=12)
+    text.insert(tk.END, format_confusion(matrix, state_names))
+    text.configure(state='disabled')
+    text.pack(side=tk.TOP, fill=tk.BOTH, expand=1, padx=10, pady=10)
+#-------------------------------------------------------------
+#                    create_state_summary_window
+#-------------------------------------------------------------
+def create_state_summary_window(app):
+    """
+    Show per-state counts, durations and feature statistics of the current recording
+
+    Parameters:
+    - app: Main application instance (stats and higuchi_stats computed)
+    """
+    from siglab_lib.stateGroups import summarize_states, format_state_summary
+
+    summary = summarize_states(app.stats, app.higuchi_stats, app.tag_state, app.time_axis)
+    state_names = [app.state_colors[code]['name'] for code in sorted(app.state_colors)]
+
+    # Create new top-level window
+    text_window = tk.Toplevel()
+    text_window.title(f"State Summary: {os.path.basename(app.filepath)}")
+    text_window.configure(bg='#B0C4DE')  # Match main window background
+
+    text = tk.Text(text_window, font=('Courier', 10), bg='#E6EDF3', width=100, height=40)
+    text.insert(tk.END, format_state_summary(summary, state_names))
+    text.configure(state='disabled')
+    text.pack(side=tk.TOP, fill=tk.BOTH, expand=1, padx=10, pady=10)
+
+#-------------------------------------------------------------
+#                    create_query_window
+#-------------------------------------------------------------
+def create_query_window(app, query, hits):
+    """
+    List the time spans that match a feature query; double-click opens one
+
+    Parameters:
+    - app: Main application instance
+    - query: Query text, shown in the title
+    - hits: List from FeatureIndex.hits
+    """
+    # Create new top-level window
+    list_window = tk.Toplevel()
+    list_window.title(f"Query: {query}")
+    list_window.geometry('700x500')
+    list_window.configure(bg='#B0C4DE')  # Match main window background
+
+    total = sum(hit['segments'] for hit in hits)
+    tk.Label(list_window, text=f"{len(hits)} spans, {total} segments", bg='#B0C4DE').pack(side=tk.TOP, pady=5)
+
+    frame = tk.Frame(list_window)
+    frame.pack(side=tk.TOP, fill=tk.BOTH, expand=1, padx=10, pady=10)
+    scrollbar = tk.Scrollbar(frame)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    listbox = tk.Listbox(frame, font=('Courier', 10), bg='#E6EDF3', yscrollcommand=scrollbar.set)
+    listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=1)
+    scrollbar.config(command=listbox.yview)
+
+    for hit in hits:
+        listbox.insert(tk.END, f"{os.path.basename(hit['file']):<30} {hit['start_S']:>10.1f} - {hit['end_S']:>10.1f} s"
+                               f"  ({hit['segments']} seg)")
+
+    def open_selected(event):
+        selection = listbox.curselection()
+        if selection:
+            app._open_hit(hits[selection[0]])
+
+    listbox.bind('<Double-Button-1>', open_selected)
+    listbox.bind('<Return>', open_selected)
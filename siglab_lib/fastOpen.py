@@ -0,0 +1,229 @@
+# siglab_lib/fastOpen.py
+import os
+import json
+import stat
+import hashlib
+import tempfile
+import numpy as np
+from siglab_lib.featureTable import FeatureTable
+from siglab_lib.timeAxis import TimeAxis
+
+# Sidecar folder next to the recording: <file>.f5b.fast/
+SIDECAR_SUFFIX = '.fast'
+SIDECAR_VERSION = 1
+
+# Content hash: this many evenly spaced blocks of the source file, so a
+# multi-gigabyte recording is fingerprinted in about a millisecond
+_HASH_BLOCKS = 16
+_HASH_BLOCK_BYTES = 1 << 16
+
+# Arrays copied out of the sidecar because the GUI edits them in place
+_EDITABLE = ('tag_state', 'state_est')
+
+def sidecar_path(filepath):
+    return filepath + SIDECAR_SUFFIX
+
+def source_fingerprint(filepath):
+    """
+    Modification time, size and sampled content hash of a recording
+
+    Returns:
+    - Dictionary with mtime_ns, size and hash
+    """
+    file_stat = os.stat(filepath)
+    digest = hashlib.blake2b(str(file_stat.st_size).encode(), digest_size=16)
+    with open(filepath, 'rb') as f:
+        last = max(file_stat.st_size - _HASH_BLOCK_BYTES, 0)
+        for offset in np.unique(np.linspace(0, last, _HASH_BLOCKS).astype(np.int64)):
+            f.seek(int(offset))
+            digest.update(f.read(_HASH_BLOCK_BYTES))
+    return {'mtime_ns': file_stat.st_mtime_ns, 'size': file_stat.st_size, 'hash': digest.hexdigest()}
+
+def _read_meta(filepath):
+    """Sidecar metadata, or None when there is no readable sidecar"""
+    try:
+        with open(os.path.join(sidecar_path(filepath), 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == SIDECAR_VERSION else None
+
+def _replace_file(filepath, name, write):
+    """
+    Write a sidecar file through a uniquely named temporary and move it into place
+
+    Several processes may build the same sidecar at once; each writes its
+    own temporary, so none can replace a file with one another is still
+    writing. The file gets the recording's read/write permissions.
+
+    Parameters:
+    - filepath: .f5b file the sidecar belongs to
+    - name: File name inside the sidecar folder
+    - write: Function(open binary file) writing the contents
+    """
+    folder = sidecar_path(filepath)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.chmod(tmp_path, stat.S_IMODE(os.stat(filepath).st_mode) & 0o666)
+        os.replace(tmp_path, os.path.join(folder, name))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def _write_meta(filepath, meta):
+    """Replace the metadata file atomically (written last, so it only lists finished arrays)"""
+    _replace_file(filepath, 'meta.json', lambda f: f.write(json.dumps(meta).encode()))
+
+def _write_array(filepath, meta, name, array, columns=None):
+    """Write one array as raw binary and describe it in meta"""
+    array = np.ascontiguousarray(array)
+    _replace_file(filepath, name + '.bin', array.tofile)
+    meta['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape)}
+    if columns is not None:
+        meta['arrays'][name]['columns'] = list(columns)
+
+def _map_array(filepath, info, name):
+    """Read-only memory map of one sidecar array"""
+    shape = tuple(info['shape'])
+    if 0 in shape:
+        return np.zeros(shape, dtype=info['dtype'])
+    return np.memmap(os.path.join(sidecar_path(filepath), name + '.bin'), dtype=info['dtype'], mode='r', shape=shape)
+
+def sidecar_is_current(filepath):
+    """True when the sidecar matches the recording's modification time and content hash"""
+    meta = _read_meta(filepath)
+    return meta is not None and meta['source'] == source_fingerprint(filepath)
+
+def build_sidecar(filepath, recording=None):
+    """
+    Write the fast-open sidecar of a recording
+
+    Parameters:
+    - filepath: .f5b file
+    - recording: Dictionary from load_recording (read from filepath when None)
+    """
+    from siglab_lib.fileIO import load_recording
+
+    # Fingerprint first, so changes made while reading make the sidecar stale
+    source = source_fingerprint(filepath)
+    if recording is None:
+        recording = load_recording(filepath)
+
+    os.makedirs(sidecar_path(filepath), exist_ok=True)
+    time_axis = recording['time_axis']
+    meta = {
+        'version': SIDECAR_VERSION,
+        'source': source,
+        'time_axis': {
+            't0': time_axis.start,
+            'sample_rate_Hz': time_axis.sample_rate_Hz,
+            'num_samples': time_axis.num_samples,
+            'gaps': [[int(i), float(t)] for i, t in zip(time_axis.run_start[1:], time_axis.run_t0[1:])]
+        },
+        'arrays': {}
+    }
+    _write_array(filepath, meta, 'magR', recording['magR'])
+    _write_array(filepath, meta, 'tag_state', recording['tag_state'])
+    if recording.get('state_est') is not None:
+        _write_array(filepath, meta, 'state_est', recording['state_est'])
+    _write_meta(filepath, meta)
+
+def open_sidecar(filepath):
+    """
+    Map a recording from its sidecar without copying the signal
+
+    magR and cached feature tables are read-only memory maps whose pages
+    are shared by every process that opens the same recording.
+
+    Returns:
+    - Recording dictionary like load_recording (plus stats / higuchi_stats
+      when cached), or None when the sidecar is missing or stale
+    """
+    from siglab_lib.overviewPyramid import load_overview
+
+    meta = _read_meta(filepath)
+    if meta is None or meta['source'] != source_fingerprint(filepath):
+        return None
+
+    axis = meta['time_axis']
+    arrays = meta['arrays']
+    recording = {
+        'filepath': filepath,
+        'time_axis': TimeAxis(axis['t0'], axis['sample_rate_Hz'], axis['num_samples'],
+                              [tuple(gap) for gap in axis['gaps']]),
+        'state_est': None
+    }
+    for name, info in arrays.items():
+        try:
+            array = _map_array(filepath, info, name)
+        except (OSError, ValueError):
+            # Array file missing or cut short
+            return None
+        if name in _EDITABLE:
+            recording[name] = np.array(array)
+        elif 'columns' in info:
+            recording[name] = FeatureTable(info['columns'], array, dtype=array.dtype)
+        else:
+            recording[name] = array
+    recording['overview'] = load_overview(filepath, axis['num_samples'])
+    return recording
+
+def load_recording_fast(filepath):
+    """
+    Open a recording through its sidecar, building or rebuilding it when needed
+
+    Falls back to reading the recording normally when the sidecar cannot
+    be written (read-only folder, quota, full disk).
+
+    Returns:
+    - Recording dictionary from open_sidecar, or from load_recording
+    """
+    from siglab_lib.fileIO import load_recording
+
+    recording = open_sidecar(filepath)
+    if recording is None:
+        try:
+            build_sidecar(filepath)
+        except OSError as e:
+            print(f"Fast open sidecar not written for {os.path.basename(filepath)}: {e}")
+            return load_recording(filepath)
+        recording = open_sidecar(filepath) or load_recording(filepath)
+    return recording
+
+def store_features(filepath, name, table):
+    """
+    Cache a computed feature table in a current sidecar
+
+    Parameters:
+    - filepath: .f5b file
+    - name: Recording key ('stats' or 'higuchi_stats')
+    - table: FeatureTable
+
+    Returns:
+    - True when stored (False when there is no current sidecar)
+    """
+    meta = _read_meta(filepath)
+    if meta is None or meta['source'] != source_fingerprint(filepath):
+        return False
+    _write_array(filepath, meta, name, table.buffer, table.columns)
+    _write_meta(filepath, meta)
+    return True
+
+def refresh_sidecar_labels(filepath, tag_state, state_est=None):
+    """
+    Store saved labels in a sidecar that was current before the save
+
+    The signal and cached features stay valid when only the labels
+    change, so they are kept and the sidecar takes the new fingerprint.
+    Callers check sidecar_is_current before writing the recording.
+    """
+    meta = _read_meta(filepath)
+    if meta is None:
+        return
+    _write_array(filepath, meta, 'tag_state', tag_state)
+    if state_est is not None:
+        _write_array(filepath, meta, 'state_est', state_est)
+    meta['source'] = source_fingerprint(filepath)
+    _write_meta(filepath, meta)
@@ -0,0 +1,287 @@
+# siglab_lib/featureIndex.py
+import os
+import re
+import numpy as np
+import h5py
+from siglab_lib.calcStats import STATS_COLUMNS
+from siglab_lib.featureTable import FeatureTable, feature_pool
+from siglab_lib.stateEst import NUM_STATES, STATE_NAMES, estimator_features
+
+# Indexed per-segment feature columns (state is indexed separately as bitmaps)
+INDEX_FEATURES = STATS_COLUMNS + ('ref_diff', 'higuchi_mean', 'higuchi_slope')
+
+# One query term: <column> <op> <value>
+_TERM = re.compile(r'^\s*([A-Za-z_]\w*)\s*(<=|>=|==|<|>)\s*(\S+)\s*$')
+
+# A candidate set is intersected with another predicate's sorted rows when
+# that predicate matches at most this many times more rows; otherwise the
+# candidates are probed directly
+_INTERSECT_RATIO = 4
+
+def parse_query(text):
+    """
+    Parse a conjunctive query such as "range > 80 and higuchi_slope < -1.2 and state == Blood1"
+
+    Parameters:
+    - text: Terms "<column> <op> <value>" joined by "and"; op is <, <=, >, >= or ==,
+      and state terms take == with a state name or code
+
+    Returns:
+    - List of (column, op, value) predicates
+    """
+    predicates = []
+    for term in re.split(r'\band\b', text, flags=re.IGNORECASE):
+        match = _TERM.match(term)
+        if match is None:
+            raise ValueError(f"Cannot parse query term '{term.strip()}'")
+        column, op, value = match.groups()
+
+        if column == 'state':
+            if op != '==':
+                raise ValueError("State terms only support ==")
+            names = [name.lower() for name in STATE_NAMES]
+            value = names.index(value.lower()) if value.lower() in names else int(value)
+        elif column in INDEX_FEATURES:
+            value = float(value)
+        else:
+            raise ValueError(f"Unknown column '{column}'; choose from state, {', '.join(INDEX_FEATURES)}")
+        predicates.append((column, op, value))
+
+    return predicates
+
+def _recording_rows(filepath):
+    """Indexed feature columns and labeled states of one recording"""
+    from siglab_lib.labelSession import load_recording_features
+
+    recording = load_recording_features(filepath)
+    stats, higuchi_stats = recording['stats'], recording['higuchi_stats']
+    features = estimator_features(stats, higuchi_stats)
+    num = min(len(features['range']), len(recording['tag_state']))
+
+    columns = {name: stats[name][:num] for name in STATS_COLUMNS}
+    columns.update({name: features[name][:num] for name in ('ref_diff', 'higuchi_mean', 'higuchi_slope')})
+    time_axis = recording['time_axis']
+    return {
+        'table': FeatureTable.from_columns(columns),
+        'state': recording['tag_state'][:num].astype(np.int8),
+        'time_S': time_axis.segment_to_time(np.arange(num)),
+        'segment_S': time_axis.samples_per_segment / time_axis.sample_rate_Hz
+    }
+
+def _index_job(filepath):
+    try:
+        return filepath, _recording_rows(filepath), None
+    except Exception as e:
+        return filepath, None, str(e)
+
+class FeatureIndex:
+    def __init__(self, files, table, file_id, segment, time_S, state, segment_S):
+        """
+        Per-segment features of many recordings with indexes for range queries
+
+        Every feature column gets a sorted index (row order and sorted
+        values) and every state a packed bitmap of its rows, so a predicate
+        resolves to its matching rows with a binary search or a bitmap
+        instead of a scan.
+
+        Parameters:
+        - files: Recording paths; file_id indexes into this list
+        - table: FeatureTable with INDEX_FEATURES, one row per segment of all files
+        - file_id, segment, time_S, state: Per-row file, segment number, start time and label
+        - segment_S: Segment duration of each file
+        """
+        self.files = list(files)
+        self.table = table
+        self.file_id = file_id
+        self.segment = segment
+        self.time_S = time_S
+        self.state = state
+        self.segment_S = np.asarray(segment_S, dtype=np.float64)
+
+        self.order = {}
+        self.sorted_values = {}
+        self.state_bitmaps = None
+        self.state_counts = None
+
+    def __len__(self):
+        return len(self.file_id)
+
+    def build(self):
+        """Build the sorted column indexes and the state bitmaps"""
+        for name in self.table.columns:
+            order = np.argsort(self.table[name], kind='stable').astype(np.int64)
+            self.order[name] = order
+            self.sorted_values[name] = self.table[name][order]
+
+        masks = self.state[np.newaxis, :] == np.arange(NUM_STATES)[:, np.newaxis]
+        self.state_bitmaps = np.packbits(masks, axis=1)
+        self.state_counts = masks.sum(axis=1)
+        return self
+
+    def _value_bounds(self, op, value):
+        """(low, high, low inclusive, high inclusive) of a comparison"""
+        return {
+            '<': (-np.inf, value, True, False),
+            '<=': (-np.inf, value, True, True),
+            '>': (value, np.inf, False, True),
+            '>=': (value, np.inf, True, True),
+            '==': (value, value, True, True)
+        }[op]
+
+    def _sorted_range(self, column, op, value):
+        """Position range [first, last) of the matching rows in a column's sorted index"""
+        low, high, low_inclusive, high_inclusive = self._value_bounds(op, value)
+        values = self.sorted_values[column]
+        first = np.searchsorted(values, low, side='left' if low_inclusive else 'right')
+        last = np.searchsorted(values, high, side='right' if high_inclusive else 'left')
+        return first, max(first, last)
+
+    def _count(self, predicate):
+        column, op, value = predicate
+        if column == 'state':
+            return int(self.state_counts[value]) if 0 <= value < NUM_STATES else 0
+        first, last = self._sorted_range(column, op, value)
+        return last - first
+
+    def _rows(self, predicate):
+        """Sorted row numbers matching one predicate, read from its index"""
+        column, op, value = predicate
+        if column == 'state':
+            if not 0 <= value < NUM_STATES:
+                return np.zeros(0, dtype=np.int64)
+            return np.flatnonzero(np.unpackbits(self.state_bitmaps[value], count=len(self)))
+        first, last = self._sorted_range(column, op, value)
+        return np.sort(self.order[column][first:last])
+
+    def _probe(self, predicate, rows):
+        """Subset of rows that match one predicate, by looking up their values"""
+        column, op, value = predicate
+        if column == 'state':
+            if not 0 <= value < NUM_STATES:
+                return rows[:0]
+            bits = self.state_bitmaps[value][rows >> 3] >> (7 - (rows & 7)).astype(np.uint8)
+            return rows[(bits & 1).astype(bool)]
+        low, high, low_inclusive, high_inclusive = self._value_bounds(op, value)
+        values = self.table[column][rows]
+        keep = (values >= low) if low_inclusive else (values > low)
+        keep &= (values <= high) if high_inclusive else (values < high)
+        return rows[keep]
+
+    def query(self, predicates):
+        """
+        Rows matching every predicate
+
+        Predicates are taken from the most to the least selective, by their
+        index counts. The first gives the candidate rows; each later one is
+        intersected with its own index rows while those are few, and probed
+        on the candidates otherwise.
+
+        Parameters:
+        - predicates: (column, op, value) list, or a query string for parse_query
+
+        Returns:
+        - Sorted row numbers
+        """
+        if isinstance(predicates, str):
+            predicates = parse_query(predicates)
+        if not predicates:
+            return np.arange(len(self))
+
+        counts = [self._count(predicate) for predicate in predicates]
+        ranked = [predicates[i] for i in np.argsort(counts, kind='stable')]
+        ranked_counts = sorted(counts)
+
+        rows = self._rows(ranked[0])
+        for predicate, count in zip(ranked[1:], ranked_counts[1:]):
+            if len(rows) == 0:
+                break
+            if count <= _INTERSECT_RATIO * len(rows):
+                rows = np.intersect1d(rows, self._rows(predicate), assume_unique=True)
+            else:
+                rows = self._probe(predicate, rows)
+        return rows
+
+    def hits(self, rows):
+        """
+        Merge matching rows into time spans of consecutive segments
+
+        Parameters:
+        - rows: Sorted row numbers from query
+
+        Returns:
+        - List of {'file', 'start_S', 'end_S', 'segments'} in index order
+        """
+        if len(rows) == 0:
+            return []
+
+        # A span breaks where the file changes or a segment is skipped
+        file_id, segment = self.file_id[rows], self.segment[rows]
+        breaks = np.flatnonzero((np.diff(file_id) != 0) | (np.diff(segment) != 1)) + 1
+        starts = np.r_[0, breaks]
+        ends = np.r_[breaks, len(rows)] - 1
+
+        return [{
+            'file': self.files[file_id[first]],
+            'start_S': float(self.time_S[rows[first]]),
+            'end_S': float(self.time_S[rows[last]] + self.segment_S[file_id[first]]),
+            'segments': int(last - first + 1)
+        } for first, last in zip(starts, ends)]
+
+    def save(self, path):
+        """Write the rows and their indexes to an HDF5 file"""
+        with h5py.File(path, 'w') as f:
+            f.create_dataset('files', data=np.array(self.files, dtype=h5py.string_dtype()))
+            f.create_dataset('segment_S', data=self.segment_S)
+            self.table.save(f, 'features')
+            for name in ('file_id', 'segment', 'time_S', 'state', 'state_bitmaps', 'state_counts'):
+                f.create_dataset(name, data=getattr(self, name))
+            for name in self.table.columns:
+                f.create_dataset(f'order/{name}', data=self.order[name])
+                f.create_dataset(f'sorted/{name}', data=self.sorted_values[name])
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save"""
+        with h5py.File(path, 'r') as f:
+            files = [name.decode() if isinstance(name, bytes) else name for name in f['files'][:]]
+            index = cls(files, FeatureTable.load(f['features']), f['file_id'][:], f['segment'][:],
+                        f['time_S'][:], f['state'][:], f['segment_S'][:])
+            index.state_bitmaps = f['state_bitmaps'][:]
+            index.state_counts = f['state_counts'][:]
+            for name in index.table.columns:
+                index.order[name] = f[f'order/{name}'][:]
+                index.sorted_values[name] = f[f'sorted/{name}'][:]
+        return index
+
+def build_feature_index(files, workers=None, progress=None):
+    """
+    Compute the features of many recordings in parallel and index them
+
+    Parameters:
+    - files: Labeled .f5b files
+    - workers: Process count (None = CPU count)
+    - progress: Optional callback(filepath, error)
+
+    Returns:
+    - FeatureIndex over the recordings that loaded
+    """
+    indexed, tables, file_id, segment, time_S, state, segment_S = [], [], [], [], [], [], []
+    with feature_pool(workers) as pool:
+        for filepath, rows, error in pool.map(_index_job, files):
+            if rows is not None:
+                num = len(rows['table'])
+                file_id.append(np.full(num, len(indexed), dtype=np.int32))
+                segment.append(np.arange(num, dtype=np.int64))
+                tables.append(rows['table'])
+                time_S.append(rows['time_S'])
+                state.append(rows['state'])
+                segment_S.append(rows['segment_S'])
+                indexed.append(os.path.abspath(filepath))
+            if progress is not None:
+                progress(filepath, error)
+
+    if not indexed:
+        raise ValueError("No recordings could be indexed")
+
+    return FeatureIndex(indexed, FeatureTable.concat(tables), np.concatenate(file_id), np.concatenate(segment),
+                        np.concatenate(time_S), np.concatenate(state), segment_S).build()
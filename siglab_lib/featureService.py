@@ -0,0 +1,578 @@
+# siglab_lib/featureService.py
+import os
+import json
+import stat
+import hashlib
+import secrets
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import AuthenticationError, resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import h5py
+from siglab_lib.calcStats import DEFAULT_BLOOD_PARAMS, STATS_COLUMNS, compute_stats
+from siglab_lib.calcHiguchi import HIGUCHI_COLUMNS, calculate_higuchi_stats
+from siglab_lib.featureTable import FeatureTable, feature_precision, set_feature_precision
+from siglab_lib.fastOpen import open_sidecar, source_fingerprint
+
+def _stats(magR, time_axis, params):
+    return compute_stats(magR, time_axis, blood_params=params)
+
+def _higuchi_stats(magR, time_axis, params):
+    return calculate_higuchi_stats(magR, time_axis)
+
+# Feature name -> (function(magR, time_axis, params), parameter defaults, table columns)
+FEATURES = {
+    'stats': (_stats, DEFAULT_BLOOD_PARAMS, STATS_COLUMNS),
+    'higuchi_stats': (_higuchi_stats, {}, HIGUCHI_COLUMNS)
+}
+
+# The service belongs to one user: its socket sits in a directory only that
+# user can enter (unless $SIGNALLAB_FEATURE_SOCKET names another path), and
+# both sides prove they hold the user's key before any request is read
+KEY_PATH = os.path.join(os.path.expanduser('~'), '.config', 'signallab', 'feature-service.key')
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'signallab', 'features')
+DEFAULT_MEMORY_MB = 2048
+DEFAULT_DISK_MB = 10240
+
+# Requests and replies are small JSON documents; table data goes through shared memory
+_MAX_MESSAGE_BYTES = 1 << 20
+_PRECISIONS = (np.dtype(np.float32).str, np.dtype(np.float64).str)
+
+def _check_private(path, kind):
+    """Refuse a key file or runtime directory another user owns or can read"""
+    info = os.lstat(path)
+    if info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077:
+        raise PermissionError(f"{kind} {path} must be owned by and private to the current user")
+
+def runtime_dir():
+    """Per-user directory (mode 0700) holding the service socket"""
+    base = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    path = os.path.join(base, f'signallab-{os.getuid()}')
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    _check_private(path, "Runtime directory")
+    return path
+
+def service_address():
+    """Socket path: $SIGNALLAB_FEATURE_SOCKET, or features.sock in the runtime directory"""
+    return os.environ.get('SIGNALLAB_FEATURE_SOCKET') or os.path.join(runtime_dir(), 'features.sock')
+
+def service_key(create=False):
+    """
+    Secret shared by the service and its clients
+
+    Parameters:
+    - create: Generate the key file (mode 0600) when there is none
+
+    Returns:
+    - Key bytes
+    """
+    if create and not os.path.exists(KEY_PATH):
+        os.makedirs(os.path.dirname(KEY_PATH), mode=0o700, exist_ok=True)
+        try:
+            fd = os.open(KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(secrets.token_hex(32).encode())
+    _check_private(KEY_PATH, "Key file")
+    with open(KEY_PATH, 'rb') as f:
+        return f.read().strip()
+
+def _send(conn, message):
+    conn.send_bytes(json.dumps(message).encode())
+
+def _recv(conn):
+    message = json.loads(conn.recv_bytes(_MAX_MESSAGE_BYTES))
+    if not isinstance(message, dict):
+        raise ValueError("Malformed feature service message")
+    return message
+
+def _check_params(feature, params):
+    """
+    Validate feature parameters and drop those equal to their defaults
+
+    Returns:
+    - Parameter dictionary (values as float), so equal settings share a cache key
+    """
+    if feature not in FEATURES:
+        raise ValueError(f"Unknown feature '{feature}'; choose from {', '.join(FEATURES)}")
+    defaults = FEATURES[feature][1]
+    params = params or {}
+    if not isinstance(params, dict):
+        raise ValueError("Feature parameters must be a dictionary")
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown {feature} parameters: {', '.join(sorted(unknown))}")
+    try:
+        params = {name: float(value) for name, value in params.items()}
+    except (TypeError, ValueError):
+        raise ValueError(f"{feature} parameters must be numbers")
+    return {name: value for name, value in params.items() if value != defaults[name]}
+
+def compute_feature(recording, feature, params=None):
+    """
+    Compute one feature table of a loaded recording in this process
+
+    Parameters:
+    - recording: Dictionary with magR and time_axis
+    - feature: Name in FEATURES
+    - params: Optional parameters overriding the feature's defaults
+      (DEFAULT_BLOOD_PARAMS for stats; Higuchi takes none)
+
+    Returns:
+    - FeatureTable
+    """
+    params = _check_params(feature, params)
+    return FEATURES[feature][0](recording['magR'], recording['time_axis'], params)
+
+def _compute_job(filepath, feature, params, precision):
+    from siglab_lib.fileIO import load_recording
+
+    set_feature_precision(precision)
+    recording = open_sidecar(filepath) or load_recording(filepath)
+    return compute_feature(recording, feature, params)
+
+def _cache_key(filepath, feature, params, precision):
+    """Key of a result: recording content fingerprint, feature, parameters and precision"""
+    source = source_fingerprint(filepath)
+    text = json.dumps([source['hash'], source['size'], source['mtime_ns'], feature, params, precision],
+                      sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+def _attach(name):
+    """Open a shared-memory block created by another process without taking ownership of it"""
+    shm = SharedMemory(name=name)
+    # Attaching registers the block with this process's resource tracker,
+    # which would unlink it at exit
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+def _read_shared(message, columns=None):
+    """
+    Copy a table out of the shared-memory block described by a message
+
+    Parameters:
+    - message: Dictionary with shm, shape, dtype and columns
+    - columns: Columns the table must have (None accepts any)
+    """
+    shape, dtype = tuple(message['shape']), np.dtype(message['dtype'])
+    if dtype.str not in _PRECISIONS or len(shape) != 2 or shape[0] != len(message['columns']):
+        raise ValueError("Malformed feature table")
+    if columns is not None and tuple(message['columns']) != tuple(columns):
+        raise ValueError("Feature table columns do not match the feature")
+
+    shm = _attach(message['shm'])
+    try:
+        buffer = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+    return FeatureTable(message['columns'], buffer, dtype=dtype)
+
+class FeatureService:
+    def __init__(self, address=None, workers=None, cache_dir=DEFAULT_CACHE_DIR,
+                 memory_mb=DEFAULT_MEMORY_MB, disk_mb=DEFAULT_DISK_MB):
+        """
+        Feature computation shared by the SignalLab instances of one user
+
+        Requests name a recording, a feature and its parameters. Results are
+        keyed by the recording's content fingerprint, kept in shared memory
+        and on disk (least recently used dropped past memory_mb / disk_mb),
+        and handed to clients as shared-memory block names. Requests for a
+        result that is already being loaded or computed wait for that one.
+
+        Parameters:
+        - address: Unix socket path (None = service_address())
+        - workers: Compute processes (None = CPU count)
+        - cache_dir: On-disk result cache (None = memory only)
+        - memory_mb: Shared-memory cache budget
+        - disk_mb: On-disk cache budget
+        """
+        self.address = address or service_address()
+        self.cache_dir = cache_dir
+        self.memory_bytes = int(memory_mb * 2**20)
+        self.disk_bytes = int(disk_mb * 2**20)
+        self._key = service_key(create=True)
+        self._pool = ProcessPoolExecutor(max_workers=workers)
+        self._memory = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._listener = None
+        self._stopping = False
+        self.counts = {'memory': 0, 'shared': 0, 'disk': 0, 'computed': 0, 'stored': 0}
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+    # Caches
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + '.h5')
+
+    def _read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with h5py.File(path, 'r') as f:
+                table = FeatureTable.load(f['table'])
+            # The modification time orders the disk cache for pruning
+            os.utime(path)
+        except (OSError, KeyError):
+            return None
+        return table
+
+    def _write_disk(self, key, table):
+        """Write a result through a unique temporary file, then prune the cache to its budget"""
+        if self.cache_dir is None:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=key + '.', suffix='.tmp')
+        os.close(fd)
+        try:
+            with h5py.File(tmp_path, 'w') as f:
+                table.save(f, 'table')
+            os.replace(tmp_path, self._disk_path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete the least recently used cached results past the disk budget"""
+        with self._disk_lock:
+            files = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.h5'):
+                    info = entry.stat()
+                    files.append((info.st_mtime, info.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def _insert(self, key, table):
+        """
+        Place a table in shared memory and drop the oldest entries past the budget
+
+        Returns:
+        - (cache entry of key, True when inserted); an existing entry wins and
+          the new copy is released
+        """
+        buffer = table.buffer
+        shm = SharedMemory(create=True, size=max(buffer.nbytes, 1))
+        np.ndarray(buffer.shape, dtype=buffer.dtype, buffer=shm.buf)[...] = buffer
+        entry = {'shm': shm, 'shape': list(buffer.shape), 'dtype': buffer.dtype.str,
+                 'columns': list(table.columns), 'nbytes': buffer.nbytes}
+
+        with self._lock:
+            existing = self._memory.get(key)
+            if existing is None:
+                self._memory[key] = entry
+                total = sum(cached['nbytes'] for cached in self._memory.values())
+                while total > self.memory_bytes and len(self._memory) > 1:
+                    _, evicted = self._memory.popitem(last=False)
+                    total -= evicted['nbytes']
+                    evicted['shm'].close()
+                    evicted['shm'].unlink()
+                return entry, True
+
+        shm.close()
+        shm.unlink()
+        return existing, False
+
+    def _resolve(self, key, job, compute=True):
+        """
+        Find or produce the result of a key
+
+        Parameters:
+        - key: Cache key
+        - job: (filepath, feature, params, precision) for the worker pool
+        - compute: False to only look in the caches
+
+        Returns:
+        - (entry or None, source) where source is memory, shared, disk, computed or miss
+        """
+        while True:
+            with self._lock:
+                entry = self._memory.get(key)
+                if entry is not None:
+                    self._memory.move_to_end(key)
+                    return entry, 'memory'
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = Future()
+                    break
+            if not compute:
+                return None, 'miss'
+            entry, _ = pending.result()
+            if entry is not None:
+                return entry, 'shared'
+            # The owner only looked in the caches; try again as owner
+
+        try:
+            table, source = self._read_disk(key), 'disk'
+            if table is None and compute:
+                table, source = self._pool.submit(_compute_job, *job).result(), 'computed'
+                self._write_disk(key, table)
+            entry = self._insert(key, table)[0] if table is not None else None
+            pending.set_result((entry, source))
+            return entry, source if entry is not None else 'miss'
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+    # Requests
+
+    def _handle(self, request):
+        op = request.get('op')
+        if op == 'status':
+            with self._lock:
+                return {'ok': True, 'entries': len(self._memory), 'pending': len(self._pending),
+                        'memory_mb': sum(entry['nbytes'] for entry in self._memory.values()) / 2**20,
+                        'counts': dict(self.counts)}
+        if op == 'shutdown':
+            return {'ok': True}
+        if op not in ('get', 'peek', 'put'):
+            raise ValueError(f"Unknown request '{op}'")
+
+        filepath, feature = request.get('file'), request.get('feature')
+        if not isinstance(filepath, str) or not os.path.isabs(filepath):
+            raise ValueError("Requests need an absolute recording path")
+        params = _check_params(feature, request.get('params'))
+        precision = request.get('precision')
+        if precision not in _PRECISIONS:
+            raise ValueError(f"Unsupported feature precision {precision}")
+        key = _cache_key(filepath, feature, params, precision)
+
+        if op == 'put':
+            with self._lock:
+                known = key in self._memory or key in self._pending
+            if not known:
+                table = _read_shared(request, FEATURES[feature][2])
+                if table.dtype.str != precision:
+                    raise ValueError("Feature table precision does not match the request")
+                self._write_disk(key, table)
+                if self._insert(key, table)[1]:
+                    with self._lock:
+                        self.counts['stored'] += 1
+            return {'ok': True}
+
+        entry, source = self._resolve(key, (filepath, feature, params, precision), compute=op == 'get')
+        if entry is None:
+            return {'ok': True, 'source': source}
+        with self._lock:
+            self.counts[source] += 1
+        return {'ok': True, 'source': source, 'shm': entry['shm'].name, 'shape': entry['shape'],
+                'dtype': entry['dtype'], 'columns': entry['columns']}
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = _recv(conn)
+                except (EOFError, OSError, ValueError):
+                    return
+                try:
+                    reply = self._handle(request)
+                except Exception as e:
+                    reply = {'ok': False, 'error': str(e)}
+                try:
+                    _send(conn, reply)
+                except OSError:
+                    return
+                if request.get('op') == 'shutdown':
+                    self.stop()
+                    return
+
+    def _accept(self):
+        """Next authenticated connection, or None for a client that failed the handshake"""
+        try:
+            return self._listener.accept()
+        except Exception:
+            return None
+
+    def serve_forever(self):
+        """Accept clients until stopped (shutdown request or Ctrl+C)"""
+        # A socket left by a daemon that died is removed; a live one is not
+        if os.path.exists(self.address):
+            if is_running(self.address):
+                raise ValueError(f"A feature service is already running at {self.address}")
+            os.remove(self.address)
+
+        self._listener = Listener(self.address, family='AF_UNIX', authkey=self._key)
+        os.chmod(self.address, 0o600)
+        try:
+            while not self._stopping:
+                conn = self._accept()
+                if conn is None:
+                    continue
+                if self._stopping:
+                    conn.close()
+                    break
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self._listener.close()
+            self.close()
+
+    def stop(self):
+        """Make serve_forever return (it is woken by one last connection)"""
+        self._stopping = True
+        client = connect(self.address)
+        if client is not None:
+            client.close()
+
+    def close(self):
+        """Stop the workers and release the shared-memory cache"""
+        self._pool.shutdown(cancel_futures=True)
+        with self._lock:
+            for entry in self._memory.values():
+                entry['shm'].close()
+                entry['shm'].unlink()
+            self._memory.clear()
+
+class FeatureClient:
+    def __init__(self, address=None):
+        """
+        Authenticated connection to a running FeatureService
+
+        Raises OSError when no service is listening at address (None =
+        service_address()) or the user has no service key.
+        """
+        self.conn = Client(address or service_address(), family='AF_UNIX', authkey=service_key())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def request(self, op, **fields):
+        _send(self.conn, dict(fields, op=op))
+        reply = _recv(self.conn)
+        if not reply.get('ok'):
+            raise ValueError(reply.get('error', "Feature service request failed"))
+        return reply
+
+    def _feature_request(self, op, filepath, feature, params, **fields):
+        return self.request(op, file=os.path.abspath(filepath), feature=feature, params=params or {},
+                            precision=feature_precision().str, **fields)
+
+    def get(self, filepath, feature, params=None, compute=True):
+        """
+        Feature table of a recording from the service
+
+        Parameters:
+        - filepath: .f5b file (read by the service)
+        - feature: Name in FEATURES
+        - params: Optional parameters overriding the feature's defaults
+        - compute: False to only return cached results
+
+        Returns:
+        - FeatureTable, or None when compute is False and nothing is cached
+        """
+        for attempt in range(2):
+            reply = self._feature_request('get' if compute else 'peek', filepath, feature, params)
+            if 'shm' not in reply:
+                return None
+            try:
+                return _read_shared(reply, FEATURES[feature][2])
+            except FileNotFoundError:
+                # Evicted between the reply and the read
+                continue
+        raise ValueError(f"{feature} of {filepath} was evicted before it could be read")
+
+    def put(self, filepath, feature, table, params=None):
+        """Offer a table computed elsewhere to the service's caches"""
+        buffer = table.buffer
+        shm = SharedMemory(create=True, size=max(buffer.nbytes, 1))
+        try:
+            np.ndarray(buffer.shape, dtype=buffer.dtype, buffer=shm.buf)[...] = buffer
+            self._feature_request('put', filepath, feature, params, shm=shm.name, shape=list(buffer.shape),
+                                  dtype=buffer.dtype.str, columns=list(table.columns))
+        finally:
+            shm.close()
+            shm.unlink()
+
+def connect(address=None):
+    """FeatureClient of the running service, or None when there is none (or it fails authentication)"""
+    try:
+        return FeatureClient(address)
+    except (OSError, AuthenticationError):
+        return None
+
+def is_running(address=None):
+    client = connect(address)
+    if client is None:
+        return False
+    client.close()
+    return True
+
+def get_features(filepath, feature, params=None, recording=None):
+    """
+    Feature table of a recording, from the service when one is running
+
+    Falls back to computing in this process when no service answers.
+
+    Parameters:
+    - filepath: .f5b file
+    - feature: Name in FEATURES
+    - params: Optional parameters overriding the feature's defaults
+    - recording: Loaded recording for the fallback (read from filepath when None)
+
+    Returns:
+    - FeatureTable
+    """
+    # Bad parameters are the caller's error, not a reason to fall back
+    _check_params(feature, params)
+
+    client = connect()
+    if client is not None:
+        try:
+            with client:
+                return client.get(filepath, feature, params)
+        except (OSError, EOFError, ValueError) as e:
+            print(f"Feature service: {e}; computing {feature} locally")
+
+    if recording is None:
+        from siglab_lib.fileIO import load_recording
+        recording = load_recording(filepath)
+    return compute_feature(recording, feature, params)
+
+def peek_features(filepath, feature, params=None):
+    """Cached feature table from the running service, or None"""
+    client = connect()
+    if client is None:
+        return None
+    try:
+        with client:
+            return client.get(filepath, feature, params, compute=False)
+    except (OSError, EOFError, ValueError) as e:
+        print(f"Feature service: {e}")
+        return None
+
+def put_features(filepath, feature, table, params=None):
+    """Share a locally computed feature table with the running service, if any"""
+    client = connect()
+    if client is None:
+        return
+    try:
+        with client:
+            client.put(filepath, feature, table, params)
+    except (OSError, EOFError, ValueError) as e:
+        print(f"Feature service: {e}")
@@ -0,0 +1,180 @@
+# siglab_lib/featureTable.py
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Storage precision of feature tables; float32 halves feature memory, float64 keeps computed values exactly
+_PRECISIONS = (np.dtype(np.float32), np.dtype(np.float64))
+_precision = np.dtype(np.float32)
+
+def set_feature_precision(dtype):
+    """
+    Set the precision new feature tables are stored in
+
+    Parameters:
+    - dtype: float32 or float64
+    """
+    global _precision
+    dtype = np.dtype(dtype)
+    if dtype not in _PRECISIONS:
+        raise ValueError(f"Feature precision must be float32 or float64, not {dtype}")
+    _precision = dtype
+
+def feature_precision():
+    """Precision new feature tables are stored in"""
+    return _precision
+
+def feature_pool(max_workers=None):
+    """
+    Process pool whose workers store feature tables in this process's precision
+
+    The precision is passed to each worker at start-up, since workers
+    started with spawn or forkserver do not inherit module state.
+
+    Parameters:
+    - max_workers: Process count (None = CPU count)
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=set_feature_precision,
+                               initargs=(feature_precision().str,))
+
+class FeatureTable:
+    def __init__(self, columns, values=None, num_rows=0, dtype=None):
+        """
+        Named per-segment feature columns in one contiguous buffer
+
+        The buffer is column-major, shape (num_columns, num_rows), so every
+        column is a contiguous zero-copy view and the whole table pickles or
+        writes to HDF5 as a single array.
+
+        Parameters:
+        - columns: Column names
+        - values: Optional (num_columns, num_rows) array (copied when dtype or layout differ)
+        - num_rows: Rows of a zero-filled table when values is None
+        - dtype: Storage dtype (defaults to the feature precision policy)
+        """
+        self.columns = tuple(columns)
+        self._index = {name: col for col, name in enumerate(self.columns)}
+        dtype = np.dtype(dtype or feature_precision())
+
+        if values is None:
+            self.buffer = np.zeros((len(self.columns), num_rows), dtype=dtype)
+        else:
+            self.buffer = np.ascontiguousarray(values, dtype=dtype)
+            if self.buffer.ndim != 2 or self.buffer.shape[0] != len(self.columns):
+                raise ValueError(f"Expected {len(self.columns)} columns, got shape {self.buffer.shape}")
+
+    @classmethod
+    def _wrap(cls, columns, buffer):
+        """Table around an existing buffer without copying it"""
+        table = cls.__new__(cls)
+        table.columns = tuple(columns)
+        table._index = {name: col for col, name in enumerate(table.columns)}
+        table.buffer = buffer
+        return table
+
+    @classmethod
+    def from_columns(cls, columns, dtype=None):
+        """
+        Build a table from named arrays
+
+        Parameters:
+        - columns: {name: equal-length array}, in column order
+        """
+        names = list(columns)
+        num_rows = len(columns[names[0]]) if names else 0
+        table = cls(names, num_rows=num_rows, dtype=dtype)
+        for name in names:
+            table[name] = columns[name]
+        return table
+
+    def __len__(self):
+        return self.buffer.shape[1]
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __getitem__(self, name):
+        """Zero-copy view of one column"""
+        return self.buffer[self._index[name]]
+
+    def __setitem__(self, name, values):
+        self.buffer[self._index[name]] = values
+
+    def __repr__(self):
+        return f"FeatureTable({len(self)} rows, {self.dtype}, columns={list(self.columns)})"
+
+    @property
+    def dtype(self):
+        return self.buffer.dtype
+
+    @property
+    def nbytes(self):
+        return self.buffer.nbytes
+
+    def rows(self, start, stop=None):
+        """Zero-copy view of a row range"""
+        return FeatureTable._wrap(self.columns, self.buffer[:, start:stop])
+
+    def take(self, index):
+        """Copy of the rows selected by an index or boolean mask"""
+        return FeatureTable._wrap(self.columns, np.ascontiguousarray(self.buffer[:, index]))
+
+    def values(self, names):
+        """(len(names), num_rows) array of several columns (a view for a run of adjacent columns)"""
+        cols = [self._index[name] for name in names]
+        if cols == list(range(cols[0], cols[0] + len(cols))):
+            return self.buffer[cols[0]:cols[0] + len(cols)]
+        return self.buffer[cols]
+
+    def with_columns(self, **columns):
+        """New table with extra columns appended"""
+        table = FeatureTable(self.columns + tuple(columns), num_rows=len(self), dtype=self.dtype)
+        table.buffer[:len(self.columns)] = self.buffer
+        for name, values in columns.items():
+            table[name] = values
+        return table
+
+    def astype(self, dtype):
+        """Table stored in another precision (self when it already is)"""
+        if np.dtype(dtype) == self.dtype:
+            return self
+        return FeatureTable(self.columns, self.buffer, dtype=dtype)
+
+    @staticmethod
+    def concat(tables):
+        """Stack tables with the same columns row-wise"""
+        return FeatureTable._wrap(tables[0].columns, np.concatenate([table.buffer for table in tables], axis=1))
+
+    def save(self, group, name):
+        """Write the table as one (num_columns, num_rows) dataset of an open h5py group"""
+        dset = group.create_dataset(name, data=self.buffer)
+        dset.attrs['columns'] = list(self.columns)
+        return dset
+
+    @classmethod
+    def load(cls, dset, start=0, stop=None):
+        """Read a table written by save or create_table_dataset (optionally a row range)"""
+        columns = [str(name) for name in dset.attrs['columns']]
+        return cls._wrap(columns, dset[:, start:stop])
+
+def create_table_dataset(group, name, columns, dtype=None, chunk_rows=4096):
+    """
+    Create a resizable dataset that feature tables are appended to
+
+    Parameters:
+    - group: Open h5py group
+    - name: Dataset path
+    - columns: Column names
+    - dtype: Storage dtype (defaults to the feature precision policy)
+    - chunk_rows: Rows per HDF5 chunk
+    """
+    dset = group.create_dataset(name, shape=(len(columns), 0), maxshape=(len(columns), None),
+                                dtype=np.dtype(dtype or feature_precision()),
+                                chunks=(len(columns), chunk_rows))
+    dset.attrs['columns'] = list(columns)
+    return dset
+
+def append_table(dset, table):
+    """Grow a table dataset and write a table's rows at the end"""
+    start = dset.shape[1]
+    dset.resize(start + len(table), axis=1)
+    dset[:, start:] = table.buffer
@@ -5,6 +5,34 @@ import tkinter.filedialog as filedialog
 import tkinter.messagebox as messagebox
 import h5py
 from siglab_lib.mainWinPlot import MainWindowPlotter
+from siglab_lib.editJournal import EditJournal
+from siglab_lib.timeAxis import TimeAxis
+from siglab_lib.repack import DEFAULT_LAYOUT, copy_recording
+from siglab_lib.overviewPyramid import load_overview, update_overview
+from siglab_lib.fastOpen import load_recording_fast, refresh_sidecar_labels, sidecar_is_current
+
+def load_recording(filepath):
+    """
+    Read signal data and state labels from an .f5b file
+
+    Parameters:
+    - filepath: Path to the .f5b file
+
+    Returns:
+    - Dictionary with filepath, magR, time_axis, tag_state, state_est
+      (estimated states, None if the file has none) and overview (the
+      stored overview pyramid, None if the file has no current one)
+    """
+    with h5py.File(filepath, 'r') as f:
+        recording = {
+            'filepath': filepath,
+            'magR': f['signal/magR'][:],
+            'time_axis': TimeAxis.from_hdf5(f),
+            'tag_state': f['tag/state'][:],
+            'state_est': f['tag/state_est'][:] if 'tag/state_est' in f else None
+        }
+    recording['overview'] = load_overview(filepath, len(recording['magR']))
+    return recording
 
 class FileOperations:
     def __init__(self, app):
@@ -20,6 +48,9 @@ class FileOperations:
         """
         Open HDF5 file and load signal data
         """
+        if not self.app._offer_save("Open", "Save labels before opening another file?"):
+            return
+
         filepath = filedialog.askopenfilename(
             title="Open F5B File",
             filetypes=[("F5B files", "*.f5b")]
@@ -27,18 +58,75 @@ class FileOperations:
         
         if filepath:
             try:
-                with h5py.File(filepath, 'r') as f:
-                    self.app.magR = f['signal/magR'][:]
-                    self.app.time_S = f['signal/time_S'][:]
-                    self.app.tag_state = f['tag/state'][:]
-                    self.app.filepath = filepath
+                # Show the stored overview before reading the raw signal
+                overview = load_overview(filepath)
+                if overview is not None:
+                    self.app.plot_utils.plot_overview(overview, os.path.basename(filepath))
 
-                # Plot the data
-                self.app.plot_utils.plot_data()
+                # Memory-map the signal from the sidecar (built on first open)
+                if self.app.fast_open.get():
+                    self.show_recording(load_recording_fast(filepath))
+                else:
+                    self.show_recording(load_recording(filepath))
 
             except Exception as e:
+                # Put back the plot of the recording that is still loaded
+                if self.app.magR is not None:
+                    self.app.plot_utils.plot_data()
                 messagebox.showerror("File Open Error", str(e))
 
+    def show_recording(self, recording):
+        """
+        Make a loaded recording the current one and plot it
+
+        Parameters:
+        - recording: Dictionary from load_recording / load_recording_features
+        """
+        self.app.magR = recording['magR']
+        self.app.time_axis = recording['time_axis']
+        self.app.tag_state = recording['tag_state']
+        self.app.filepath = recording['filepath']
+        self.app.stats = recording.get('stats')
+        self.app.higuchi_stats = recording.get('higuchi_stats')
+        self.app.state_est = recording.get('state_est')
+        self.app.overview = recording.get('overview')
+        self.app.compare_state = None
+
+        # Features still being computed belong to the previous recording
+        for progressive in self.app.progressive.values():
+            progressive.cancel()
+        self.app.progressive = {}
+
+        # Recover label edits journaled but not yet saved
+        if self.app.journal is not None:
+            self.app.journal.close()
+        self.app.journal = EditJournal(self.app.filepath, len(self.app.tag_state))
+        recovered = self.app.journal.replay(self.app.tag_state)
+        self.app.labels_dirty = recovered > 0
+        if recovered:
+            print(f"Recovered {recovered} unsaved label edits for {os.path.basename(self.app.filepath)}")
+
+        # Plot the data
+        self.app.plot_utils.plot_data()
+
+    def revert_file(self):
+        """
+        Discard unsaved label edits and reload the labels from the file
+        """
+        if self.app.filepath is None:
+            return
+
+        if not messagebox.askyesno("Revert", "Discard all label edits since the last save?"):
+            return
+
+        try:
+            if self.app.journal is not None:
+                self.app.journal.discard()
+            self.show_recording(load_recording(self.app.filepath))
+
+        except Exception as e:
+            messagebox.showerror("Revert Error", str(e))
+
     def save_file(self):
         """
         Save current state to the original file
@@ -48,6 +136,9 @@ class FileOperations:
             return
 
         try:
+            # A current sidecar only needs the new labels after the save
+            refresh_sidecar = self.app.fast_open.get() and sidecar_is_current(self.app.filepath)
+
             with h5py.File(self.app.filepath, 'r+') as f:
                 # Delete existing state dataset if it exists
                 if 'tag/state' in f:
@@ -55,7 +146,27 @@ class FileOperations:
                 
                 # Create new dataset with current states
                 f.create_dataset('tag/state', data=self.app.tag_state)
+
+                # Store the estimated-state track alongside
+                if self.app.state_est is not None:
+                    if 'tag/state_est' in f:
+                        del f['tag/state_est']
+                    f.create_dataset('tag/state_est', data=self.app.state_est)
+
+                # Extend an existing overview pyramid with any new samples; building
+                # a missing one reads the whole signal, so it is left to the setting
+                if 'overview' in f or self.app.build_overview.get():
+                    update_overview(f)
+
+            if self.app.overview is None:
+                self.app.overview = load_overview(self.app.filepath, len(self.app.magR))
+            if refresh_sidecar:
+                refresh_sidecar_labels(self.app.filepath, self.app.tag_state, self.app.state_est)
             
+            # Saved labels make the journal redundant
+            if self.app.journal is not None:
+                self.app.journal.discard()
+            self.app.labels_dirty = False
             messagebox.showinfo("Save", f"Updated states saved to {self.app.filepath}")
         
         except Exception as e:
@@ -77,39 +188,17 @@ class FileOperations:
             )
 
             if save_path:
-                # Open original file
+                # Optional chunked/compressed layout for the new file
+                layout = DEFAULT_LAYOUT if self.app.compress_save_as.get() else None
+
+                # Copy the original file with the current states
                 with h5py.File(self.app.filepath, 'r') as src:
-                    # Create new file
                     with h5py.File(save_path, 'w') as dst:
-                        # Manually copy groups and datasets
-                        def copy_group(src_group, dst_group):
-                            for key, item in src_group.items():
-                                if isinstance(item, h5py.Group):
-                                    # Create new group
-                                    new_group = dst_group.create_group(key)
-                                    copy_group(item, new_group)
-                                else:
-                                    # Carefully copy dataset
-                                    try:
-                                        # Try to get data
-                                        if item.shape == ():
-                                            # Scalar dataset
-                                            dst_group.create_dataset(key, data=item[()])
-                                        else:
-                                            # Multidimensional dataset
-                                            dst_group.create_dataset(key, data=item[:])
-                                    except Exception as e:
-                                        print(f"Could not copy dataset {key}: {e}")
-                        
-                        # Copy all groups and datasets
-                        copy_group(src, dst)
-                
-                # Open the new file to ensure tag/state is updated
-                with h5py.File(save_path, 'r+') as f:
-                    # Update or create tag/state dataset
-                    if 'tag/state' in f:
-                        del f['tag/state']
-                    f.create_dataset('tag/state', data=self.app.tag_state)
+                        replace = {'tag/state': self.app.tag_state}
+                        if self.app.state_est is not None:
+                            replace['tag/state_est'] = self.app.state_est
+                        copy_recording(src, dst, layout, replace=replace)
+                        update_overview(dst)
                 
                 #messagebox.showinfo("Save As", f"File saved to {save_path}")
         
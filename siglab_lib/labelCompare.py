@@ -0,0 +1,262 @@
+# siglab_lib/labelCompare.py
+import os
+import csv
+import glob
+import itertools
+import numpy as np
+import h5py
+from siglab_lib.timeAxis import TimeAxis
+from siglab_lib.stateEst import NUM_STATES, STATE_NAMES, confusion_matrix, confusion_metrics
+from siglab_lib.featureTable import feature_pool
+
+def label_runs(states):
+    """
+    Run-length encode a label track
+
+    Parameters:
+    - states: Per-segment state codes
+
+    Returns:
+    - starts, ends (exclusive) and values of the constant runs
+    """
+    states = np.asarray(states)
+    if len(states) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, states[:0]
+    starts = np.flatnonzero(np.r_[True, states[1:] != states[:-1]])
+    ends = np.r_[starts[1:], len(states)]
+    return starts, ends, states[starts]
+
+def disagreement_intervals(states_a, states_b):
+    """
+    Segment intervals where two label tracks disagree
+
+    Each interval is a run over which both tracks hold a constant, different state.
+
+    Returns:
+    - (k, 4) int array: start segment, end segment (exclusive), state in a, state in b
+    """
+    num = min(len(states_a), len(states_b))
+    a = np.asarray(states_a[:num]).astype(np.int64)
+    b = np.asarray(states_b[:num]).astype(np.int64)
+
+    # Runs of the (a, b) pair, kept where the pair differs
+    starts, ends, _ = label_runs(a * (NUM_STATES + 1) + b)
+    keep = a[starts] != b[starts]
+    return np.column_stack([starts[keep], ends[keep], a[starts[keep]], b[starts[keep]]])
+
+def boundary_offsets(states_a, states_b):
+    """
+    Signed distance from each state boundary in a to the nearest boundary in b
+
+    Returns:
+    - Offsets in segments (positive when b's boundary comes later), one per boundary of a
+    """
+    bounds_a = label_runs(states_a)[0][1:]
+    bounds_b = label_runs(states_b)[0][1:]
+    if len(bounds_a) == 0 or len(bounds_b) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    right = np.clip(np.searchsorted(bounds_b, bounds_a), 0, len(bounds_b) - 1)
+    left = np.clip(right - 1, 0, len(bounds_b) - 1)
+    offset_right = bounds_b[right] - bounds_a
+    offset_left = bounds_b[left] - bounds_a
+    return np.where(np.abs(offset_left) <= np.abs(offset_right), offset_left, offset_right)
+
+def compare_labels(states_a, states_b, num_states=NUM_STATES):
+    """
+    Agreement statistics between two label tracks of the same recording
+
+    Parameters:
+    - states_a, states_b: Per-segment state codes (compared over the shorter length)
+    - num_states: Size of the state table
+
+    Returns:
+    - Dictionary: segments, agreement, kappa, per-state agreement, disagreement
+      intervals and boundary offset summary
+    """
+    num = min(len(states_a), len(states_b))
+    a = np.asarray(states_a[:num])
+    b = np.asarray(states_b[:num])
+
+    confusion = confusion_matrix(a, b, num_states)
+    metrics = confusion_metrics(confusion)
+
+    # Positive specific agreement per state: 2 * both / (count in a + count in b)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_state = 2.0 * np.diag(confusion) / (confusion.sum(axis=1) + confusion.sum(axis=0))
+
+    intervals = disagreement_intervals(a, b)
+    offsets = np.abs(boundary_offsets(a, b))
+
+    return {
+        'segments': num,
+        'length_mismatch': len(states_a) != len(states_b),
+        'agreement': float(metrics['accuracy']),
+        'kappa': float(metrics['kappa']),
+        'per_state': per_state,
+        'intervals': intervals,
+        'disagree_segments': int((intervals[:, 1] - intervals[:, 0]).sum()),
+        'boundaries_a': len(label_runs(a)[0]) - 1 if num else 0,
+        'boundaries_b': len(label_runs(b)[0]) - 1 if num else 0,
+        'boundary_offset_mean': float(offsets.mean()) if len(offsets) else float('nan'),
+        'boundary_offset_median': float(np.median(offsets)) if len(offsets) else float('nan'),
+        'boundary_offset_max': int(offsets.max()) if len(offsets) else 0
+    }
+
+def load_labels(filepath, dataset='tag/state'):
+    """
+    Read one label version and the time axis of a recording
+
+    Returns:
+    - (state codes, TimeAxis)
+    """
+    with h5py.File(filepath, 'r') as f:
+        return f[dataset][:], TimeAxis.from_hdf5(f)
+
+def compare_file(name, sources):
+    """
+    Pairwise comparison of every label version of one recording
+
+    Parameters:
+    - name: Recording name used in the report
+    - sources: List of (version name, filepath, dataset)
+
+    Returns:
+    - rows: One report row per version pair
+    - intervals: One row per disagreement interval
+    """
+    labels = {}
+    time_axis = None
+    for version, filepath, dataset in sources:
+        labels[version], axis = load_labels(filepath, dataset)
+        if time_axis is None:
+            time_axis = axis
+
+    rows, interval_rows = [], []
+    for (version_a, _, _), (version_b, _, _) in itertools.combinations(sources, 2):
+        result = compare_labels(labels[version_a], labels[version_b])
+        row = {
+            'file': name,
+            'version_a': version_a,
+            'version_b': version_b,
+            'segments': result['segments'],
+            'length_mismatch': result['length_mismatch'],
+            'agreement': result['agreement'],
+            'kappa': result['kappa'],
+            'disagreements': len(result['intervals']),
+            'disagree_segments': result['disagree_segments'],
+            'boundaries_a': result['boundaries_a'],
+            'boundaries_b': result['boundaries_b'],
+            'boundary_offset_mean': result['boundary_offset_mean'],
+            'boundary_offset_median': result['boundary_offset_median'],
+            'boundary_offset_max': result['boundary_offset_max']
+        }
+        for code, state_name in enumerate(STATE_NAMES):
+            row[f'agree_{state_name}'] = float(result['per_state'][code])
+        rows.append(row)
+
+        start_times = time_axis.segment_to_time(result['intervals'][:, 0])
+        for (start, end, state_a, state_b), start_S in zip(result['intervals'], start_times):
+            interval_rows.append({
+                'file': name,
+                'version_a': version_a,
+                'version_b': version_b,
+                'start_segment': int(start),
+                'end_segment': int(end),
+                'start_S': float(start_S),
+                'duration_S': float((end - start) * time_axis.samples_per_segment / time_axis.sample_rate_Hz),
+                'state_a': STATE_NAMES[state_a] if 0 <= state_a < NUM_STATES else str(state_a),
+                'state_b': STATE_NAMES[state_b] if 0 <= state_b < NUM_STATES else str(state_b)
+            })
+
+    return rows, interval_rows
+
+def match_versions(version_dirs, datasets=None):
+    """
+    Pair up the label versions of each recording
+
+    Recordings are matched by file name across the version folders. With a
+    single folder, the versions are different datasets of the same files.
+
+    Parameters:
+    - version_dirs: Folders holding one annotator's copy of the .f5b files each
+    - datasets: Label dataset per folder (default tag/state for all)
+
+    Returns:
+    - {file name: [(version name, filepath, dataset), ...]} for files present in every version
+    """
+    datasets = datasets or ['tag/state'] * len(version_dirs)
+    if len(version_dirs) == 1:
+        version_dirs = version_dirs * len(datasets)
+    if len(datasets) != len(version_dirs):
+        raise ValueError("Give one dataset per version folder")
+
+    versions = []
+    for folder, dataset in zip(version_dirs, datasets):
+        name = os.path.basename(os.path.normpath(folder))
+        if len(set(version_dirs)) == 1:
+            name = dataset
+        elif version_dirs.count(folder) > 1:
+            name = f"{name}:{dataset}"
+        versions.append((name, folder, dataset))
+
+    common = None
+    for _, folder, _ in versions:
+        names = {os.path.basename(path) for path in glob.glob(os.path.join(folder, '*.f5b'))}
+        common = names if common is None else common & names
+
+    return {name: [(version, os.path.join(folder, name), dataset) for version, folder, dataset in versions]
+            for name in sorted(common or [])}
+
+def _compare_job(job):
+    name, sources = job
+    try:
+        return name, compare_file(name, sources), None
+    except Exception as e:
+        return name, None, str(e)
+
+def compare_cohort(version_dirs, datasets=None, workers=None, progress=None):
+    """
+    Compare label versions across many recordings in parallel
+
+    Parameters:
+    - version_dirs: Folders with one label version each (see match_versions)
+    - datasets: Label dataset per folder
+    - workers: Process count (None = CPU count)
+    - progress: Optional callback(file name, error)
+
+    Returns:
+    - rows: One report row per (file, version pair)
+    - intervals: One row per disagreement interval
+    """
+    matched = match_versions(version_dirs, datasets)
+    rows, intervals = [], []
+    with feature_pool(workers) as pool:
+        for name, result, error in pool.map(_compare_job, matched.items()):
+            if result is not None:
+                rows.extend(result[0])
+                intervals.extend(result[1])
+            if progress is not None:
+                progress(name, error)
+    return rows, intervals
+
+def sort_rows(rows, key, descending=False):
+    """Sort report rows by a column, NaN values last"""
+    def sort_value(row):
+        value = row[key]
+        missing = isinstance(value, float) and np.isnan(value)
+        return (missing, value if not missing else 0)
+
+    ordered = sorted(rows, key=sort_value, reverse=descending)
+    # Keep NaN rows at the end in either direction
+    return [row for row in ordered if not sort_value(row)[0]] + [row for row in ordered if sort_value(row)[0]]
+
+def write_rows(rows, out_path):
+    """Write report rows to a CSV file"""
+    if not rows:
+        return
+    with open(out_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
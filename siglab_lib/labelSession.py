@@ -0,0 +1,133 @@
+# siglab_lib/labelSession.py
+import os
+import glob
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import h5py
+from siglab_lib.fileIO import load_recording
+from siglab_lib.featureService import get_features
+
+# Bytes held in memory per input sample once a recording and its features are
+# loaded: float32 magR plus float64 feature rows and segment times
+_BYTES_PER_SAMPLE = 8
+
+def load_recording_features(filepath):
+    """
+    Load a recording and precompute its stats and Higuchi features
+
+    Features come from the shared feature service when one is running.
+
+    Parameters:
+    - filepath: Path to the .f5b file
+
+    Returns:
+    - Recording dictionary with stats and higuchi_stats added
+    """
+    recording = load_recording(filepath)
+    recording['stats'] = get_features(filepath, 'stats', recording=recording)
+    recording['higuchi_stats'] = get_features(filepath, 'higuchi_stats', recording=recording)
+    return recording
+
+def estimate_recording_mb(filepath):
+    """
+    Estimate the memory a loaded recording with features will take
+
+    Parameters:
+    - filepath: Path to the .f5b file
+
+    Returns:
+    - Estimated size in MB (reads only the dataset shape)
+    """
+    with h5py.File(filepath, 'r') as f:
+        num_samples = f['signal/magR'].shape[0]
+    return num_samples * _BYTES_PER_SAMPLE / 2**20
+
+class LabelSession:
+    def __init__(self, file_list, prefetch_depth=1, max_prefetch_mb=1024):
+        """
+        Step through a list of recordings while the next ones load in the background
+
+        Parameters:
+        - file_list: Ordered .f5b paths to label
+        - prefetch_depth: How many files ahead of the current one to preload
+        - max_prefetch_mb: Memory cap for preloaded recordings
+        """
+        self.file_list = list(file_list)
+        self.prefetch_depth = prefetch_depth
+        self.max_prefetch_mb = max_prefetch_mb
+        self.index = -1
+
+        # Single worker keeps prefetching strictly in file order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()   # index -> (future, estimated MB)
+
+    @classmethod
+    def from_folder(cls, folder, **kwargs):
+        """Create a session over all .f5b files in a folder, sorted by name"""
+        return cls(sorted(glob.glob(os.path.join(folder, '*.f5b'))), **kwargs)
+
+    def has_next(self):
+        return self.index + 1 < len(self.file_list)
+
+    def next(self):
+        """
+        Advance to the next file
+
+        Returns:
+        - Recording dictionary with features (blocks only if the prefetch is not finished)
+
+        A file that fails to load raises and stays next, so the position only
+        moves once a recording is returned.
+        """
+        if not self.has_next():
+            return None
+
+        index = self.index + 1
+        with self._lock:
+            # Drop anything behind the new position
+            for idx in [i for i in self._pending if i < index]:
+                self._pending.pop(idx)[0].cancel()
+            entry = self._pending.pop(index, None)
+
+        try:
+            if entry is None:
+                recording = load_recording_features(self.file_list[index])
+            else:
+                recording = entry[0].result()
+            self.index = index
+        finally:
+            self._schedule_prefetch()
+        return recording
+
+    def _schedule_prefetch(self):
+        """Queue background loads for the files after the current one"""
+        with self._lock:
+            used_mb = sum(mb for _, mb in self._pending.values())
+            last = min(self.index + self.prefetch_depth, len(self.file_list) - 1)
+
+            for idx in range(self.index + 1, last + 1):
+                if idx in self._pending:
+                    continue
+                try:
+                    size_mb = estimate_recording_mb(self.file_list[idx])
+                except Exception as e:
+                    print(f"Prefetch skipped {self.file_list[idx]}: {e}")
+                    break
+
+                # Stop at the memory cap; the file loads on demand instead
+                if used_mb + size_mb > self.max_prefetch_mb:
+                    break
+
+                future = self._executor.submit(load_recording_features, self.file_list[idx])
+                self._pending[idx] = (future, size_mb)
+                used_mb += size_mb
+
+    def close(self):
+        """Cancel outstanding prefetches and stop the worker"""
+        with self._lock:
+            for future, _ in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self._executor.shutdown(wait=False)
\ No newline at end of file
@@ -5,6 +5,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
+from siglab_lib.reportFigures import draw_signal
 
 class MainWindowPlotter:
     def __init__(self, app):
@@ -54,46 +55,83 @@ class MainWindowPlotter:
 
         self.app.ax.clear()
 
-        # Plot main signal FIRST (gray line in the background)
-        self.app.ax.plot(self.app.time_S, self.app.magR, color='gray', zorder=1)
-
-        # Plot state markers ON TOP of the signal line
-        for state_val, state_info in self.app.state_colors.items():
-            # Find indices for this state
-            state_mask = self.app.tag_state == state_val
-            state_time = self.app.time_S[::30][state_mask]
-            state_mag = self.app.magR[::30][state_mask]
-
-            self.app.ax.scatter(state_time, state_mag, 
-                                color=state_info['color'], 
-                                label=state_info['name'],
-                                s=10,
-                                zorder=2) 
-
-        # Set plot title using case file name
-        self.app.ax.set_title(f'Signal: {os.path.basename(self.app.filepath)}')
-        
-        # Set x and y axis labels
-        self.app.ax.set_xlabel('Time (s)')
-        self.app.ax.set_ylabel('Magnitude (magR)')
+        # Signal, labeled state markers and estimated-state track; with an
+        # overview pyramid the line comes from the level matching the view
+        overview = self.app.overview
+        self.signal_line = draw_signal(self.app.ax, self.app.magR, self.app.time_axis, self.app.tag_state,
+                                       self.app.state_colors,
+                                       state_est=self.app.state_est,
+                                       title=f'Signal: {os.path.basename(self.app.filepath)}',
+                                       signal_line=overview.line(magR=self.app.magR) if overview else None)
+        if overview is not None:
+            self._follow_view(overview, self.app.magR)
+        self.app.ax.callbacks.connect('xlim_changed', self._focus_progressive)
 
         # Autoscale or restore previous limits
         if rescale:
-            self.app.ax.set_xlim(self.app.time_S[0], self.app.time_S[-1])
+            self.app.ax.set_xlim(self.app.time_axis.start, self.app.time_axis.end)
+            data_min, data_max = overview.value_range() if overview else (self.app.magR.min(), self.app.magR.max())
             self.app.ax.set_ylim(
-                self.app.magR.min() - abs(self.app.magR.min()) * 0.05,
-                self.app.magR.max() + abs(self.app.magR.max()) * 0.05
+                data_min - abs(data_min) * 0.05,
+                data_max + abs(data_max) * 0.05
             )
         else:
             # Restore previous view limits
             self.app.ax.set_xlim(current_xlim)
             self.app.ax.set_ylim(current_ylim)
 
-        # Re-apply grid settings
+        # Adjust plot margins
+        self.app.fig.tight_layout(pad=1.0)
+
+        self.app.canvas.draw()
+
+    def _focus_progressive(self, ax):
+        """Compute features of the visible range first while they are in progress"""
+        if self.app.progressive:
+            first, end = self.app.time_axis.segment_range(*ax.get_xlim())
+            for progressive in self.app.progressive.values():
+                progressive.focus(first, end)
+
+    def plot_overview(self, overview, name):
+        """
+        Draw the full-recording envelope from the overview pyramid alone
+
+        Used while a file opens, before its raw signal has been read.
+
+        Parameters:
+        - overview: Overview of the recording
+        - name: Recording name for the title
+        """
+        self.app.ax.clear()
+        self.signal_line, = self.app.ax.plot(*overview.line(), color='gray', zorder=1)
+        self._follow_view(overview, None)
+
+        data_min, data_max = overview.value_range()
+        self.app.ax.set_xlim(overview.time_axis.start, overview.time_axis.end)
+        self.app.ax.set_ylim(data_min - abs(data_min) * 0.05, data_max + abs(data_max) * 0.05)
+        self.app.ax.set_title(f'Signal: {name}')
+        self.app.ax.set_xlabel('Time (s)')
+        self.app.ax.set_ylabel('Magnitude (magR)')
         self.app.ax.grid(True, linestyle='--', color='darkgray')
 
-        # Adjust plot margins
         self.app.fig.tight_layout(pad=1.0)
+        self.app.canvas.draw()
+        self.app.root.update_idletasks()
+
+    def _follow_view(self, overview, magR):
+        """
+        Keep the signal line at the coarsest suitable overview level as the view changes
+
+        Parameters:
+        - overview: Overview of the recording
+        - magR: Raw signal for close zooms, or None to stay on the finest level
+        """
+        def on_xlim_changed(ax):
+            tmin, tmax = ax.get_xlim()
+            start = int(overview.time_axis.time_to_index(tmin, side='left'))
+            stop = int(overview.time_axis.time_to_index(tmax, side='right')) + 1
+            self.signal_line.set_data(*overview.line(start, stop, magR=magR))
+            self.app.canvas.draw_idle()
 
-        self.app.ax.legend()
-        self.app.canvas.draw()
\ No newline at end of file
+        # (ax.clear() drops callbacks, so this is connected again on every redraw)
+        self.app.ax.callbacks.connect('xlim_changed', on_xlim_changed)
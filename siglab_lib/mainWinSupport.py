@@ -130,9 +130,14 @@ class InteractionModes:
             # Ensure points are in correct order
             xmin, xmax = sorted(self.selection_points)
             
-            # Find indices in tag_state that fall within this range
-            mask = (self.app.time_S[::30] >= xmin) & (self.app.time_S[::30] <= xmax)
-            self.app.tag_state[mask] = self.current_state_selection
+            # Find the segments in tag_state that fall within this range
+            first, end = self.app.time_axis.segment_range(xmin, xmax)
+            if end > first:
+                # Journal the edit so it survives a crash
+                self.app.journal.assign(self.app.tag_state, first, end,
+                                        self.current_state_selection)
+                self.app.labels_dirty = True
+                self._compact_journal()
             
             # Replot to show updated states WITHOUT rescaling
             self.app.plot_utils.plot_data(rescale=False)
@@ -144,6 +149,27 @@ class InteractionModes:
 
 
 
+    def _compact_journal(self):
+        """Compact a long journal into a snapshot of the current labels"""
+        if self.app.journal.needs_compaction():
+            try:
+                self.app.journal.compact(self.app.tag_state)
+            except Exception as e:
+                print(f"Error compacting edit journal: {e}")
+
+    def undo_state_edit(self):
+        """Revert the last state assignment"""
+        if self.app.journal is not None and self.app.journal.undo(self.app.tag_state):
+            self.app.labels_dirty = True
+            self.app.plot_utils.plot_data(rescale=False)
+
+    def redo_state_edit(self):
+        """Re-apply the last reverted state assignment"""
+        if self.app.journal is not None and self.app.journal.redo(self.app.tag_state):
+            self.app.labels_dirty = True
+            self.app.plot_utils.plot_data(rescale=False)
+
+
 class ToolbarUtils:
     def __init__(self, app):
         """
@@ -0,0 +1,242 @@
+# siglab_lib/overviewPyramid.py
+import numpy as np
+import h5py
+from siglab_lib.featureTable import FeatureTable, create_table_dataset
+from siglab_lib.timeAxis import TimeAxis, scan_gaps
+
+# Per-bin columns of every pyramid level
+OVERVIEW_COLUMNS = ('min', 'max', 'mean')
+
+# Samples per bin grow by this factor per level (level L bins hold factor**L samples)
+DEFAULT_FACTOR = 8
+
+# Levels are added while the next one still has this many bins
+MIN_LEVEL_BINS = 1024
+
+# Bins drawn across the visible range; finer data is used when a level has fewer
+VIEW_BINS = 2000
+
+# Raw samples read per pass while building or extending the pyramid
+_CHUNK_SAMPLES = 1 << 22
+
+def _num_levels(num_samples, factor):
+    """Number of levels for a recording length (at least one)"""
+    levels = 1
+    while -(-num_samples // factor ** (levels + 1)) >= MIN_LEVEL_BINS:
+        levels += 1
+    return levels
+
+def _reduce_bins(mins, maxs, means, counts, factor):
+    """
+    Pool groups of factor consecutive bins
+
+    Returns:
+    - mins, maxs, means, counts of the pooled bins (the last may be partial)
+    """
+    starts = np.arange(0, len(mins), factor)
+    pooled_counts = np.add.reduceat(counts, starts)
+    return (np.minimum.reduceat(mins, starts),
+            np.maximum.reduceat(maxs, starts),
+            np.add.reduceat(means * counts, starts) / pooled_counts,
+            pooled_counts)
+
+def _bin_counts(first_bin, num_bins, bin_samples, num_samples):
+    """Samples in each bin; only the last bin of the recording can be short"""
+    bin_start = (first_bin + np.arange(num_bins)) * bin_samples
+    return np.minimum(bin_samples, num_samples - bin_start).astype(np.float64)
+
+def _extend_levels(group, magR, done, total):
+    """
+    Recompute the pyramid bins touched by samples [done, total)
+
+    Each level is rebuilt from its first incomplete bin on, from the raw
+    samples for level 1 and from the level below otherwise, so the cost is
+    proportional to the new samples.
+    """
+    factor = int(group.attrs['factor'])
+    dtype = magR.dtype if np.issubdtype(magR.dtype, np.floating) else np.float32
+
+    for level in range(1, _num_levels(total, factor) + 1):
+        name = f'level{level}'
+        bin_samples = factor ** level
+        if name not in group:
+            create_table_dataset(group, name, OVERVIEW_COLUMNS, dtype=dtype)
+            first_bin = 0
+        else:
+            first_bin = done // bin_samples
+
+        if level == 1:
+            raw = magR[first_bin * bin_samples:total].astype(np.float64)
+            counts = np.ones(len(raw))
+            mins, maxs, means, _ = _reduce_bins(raw, raw, raw, counts, factor)
+        else:
+            # The level below was already extended to total
+            child = FeatureTable.load(group[f'level{level - 1}'], first_bin * factor)
+            child_counts = _bin_counts(first_bin * factor, len(child), bin_samples // factor, total)
+            mins, maxs, means, _ = _reduce_bins(child['min'], child['max'], child['mean'].astype(np.float64),
+                                                child_counts, factor)
+
+        dset = group[name]
+        dset.resize(first_bin + len(mins), axis=1)
+        dset[:, first_bin:] = np.vstack([mins, maxs, means])
+
+def update_overview(f, factor=DEFAULT_FACTOR):
+    """
+    Build or extend the overview pyramid of an open .f5b file
+
+    Only samples added since the last update are read, so a live-growing
+    recording can be kept current cheaply. An existing pyramid with another
+    factor is rebuilt.
+
+    Parameters:
+    - f: h5py.File open for writing
+    - factor: Samples per bin growth per level
+
+    Returns:
+    - Number of samples the pyramid covers
+    """
+    magR = f['signal/magR']
+    time_S = f['signal/time_S']
+    total = magR.shape[0]
+
+    if 'overview' in f and int(f['overview'].attrs['factor']) != factor:
+        del f['overview']
+    if 'overview' not in f:
+        group = f.create_group('overview')
+        group.attrs['factor'] = factor
+        group.attrs['num_samples'] = 0
+        group.attrs['gaps'] = np.zeros((0, 2))
+
+    group = f['overview']
+    done = int(group.attrs['num_samples'])
+    if total <= done:
+        return done
+
+    # Time axis of the covered samples, so the overview draws without reading time_S
+    if done == 0:
+        group.attrs['t0'] = float(time_S[0])
+        if 'signal/sample_rate_Hz' in f:
+            group.attrs['sample_rate_Hz'] = float(f['signal/sample_rate_Hz'][()])
+        else:
+            group.attrs['sample_rate_Hz'] = 1.0 / float(np.median(np.diff(time_S[:min(total, 1024)])))
+    new_gaps = scan_gaps(time_S, float(group.attrs['sample_rate_Hz']), max(done - 1, 0), total)
+    if new_gaps:
+        group.attrs['gaps'] = np.vstack([group.attrs['gaps'].reshape(-1, 2), new_gaps])
+
+    for start in range(done, total, _CHUNK_SAMPLES):
+        stop = min(start + _CHUNK_SAMPLES, total)
+        _extend_levels(group, magR, start, stop)
+        group.attrs['num_samples'] = stop
+    return total
+
+def write_overview(filepath, factor=DEFAULT_FACTOR):
+    """Build or extend the overview pyramid of an .f5b file on disk"""
+    with h5py.File(filepath, 'r+') as f:
+        return update_overview(f, factor)
+
+class Overview:
+    def __init__(self, filepath, factor, num_samples, time_axis, level_sizes):
+        """
+        Read access to the overview pyramid of one recording
+
+        Levels are read from the file on first use and kept.
+
+        Parameters:
+        - filepath: .f5b file holding the overview group
+        - factor: Samples per bin growth per level
+        - num_samples: Samples covered by the pyramid
+        - time_axis: TimeAxis of the covered samples
+        - level_sizes: Bins per level, finest first
+        """
+        self.filepath = filepath
+        self.factor = factor
+        self.num_samples = num_samples
+        self.time_axis = time_axis
+        self.level_sizes = list(level_sizes)
+        self._levels = {}
+
+    @property
+    def num_levels(self):
+        return len(self.level_sizes)
+
+    def level(self, level):
+        """FeatureTable (OVERVIEW_COLUMNS) of a level, 1 = finest"""
+        if level not in self._levels:
+            with h5py.File(self.filepath, 'r') as f:
+                self._levels[level] = FeatureTable.load(f[f'overview/level{level}'])
+        return self._levels[level]
+
+    def value_range(self):
+        """Signal minimum and maximum from the coarsest level"""
+        table = self.level(self.num_levels)
+        return float(table['min'].min()), float(table['max'].max())
+
+    def choose_level(self, start, stop, max_bins=VIEW_BINS, raw_available=False):
+        """
+        Coarsest level that still has max_bins bins over samples [start, stop)
+
+        Returns:
+        - Level number, or 0 when the raw samples should be drawn (or the
+          finest level when no raw samples are available)
+        """
+        for level in range(self.num_levels, 0, -1):
+            if (stop - start) / self.factor ** level >= max_bins:
+                return level
+        return 0 if raw_available else 1
+
+    def line(self, start=0, stop=None, max_bins=VIEW_BINS, magR=None):
+        """
+        Signal line for a sample range at the coarsest suitable resolution
+
+        Parameters:
+        - start, stop: Sample range
+        - max_bins: Bins wanted across the range
+        - magR: Raw signal, used when the range is too short for any level
+
+        Returns:
+        - times, values; min/max envelope points per bin, or raw samples
+        """
+        stop = self.num_samples if stop is None else min(stop, self.num_samples)
+        start = max(0, min(start, stop))
+        level = self.choose_level(start, stop, max_bins, magR is not None)
+
+        if level == 0:
+            return self.time_axis.times(start, stop), magR[start:stop]
+
+        # One extra bin on each side so the line runs past the view edges
+        bin_samples = self.factor ** level
+        first = max(start // bin_samples - 1, 0)
+        end = min(-(-stop // bin_samples) + 1, self.level_sizes[level - 1])
+        table = self.level(level).rows(first, end)
+
+        bin_times = self.time_axis.index_to_time(np.arange(first, end) * bin_samples)
+        times = np.repeat(bin_times, 2)
+        values = np.empty(2 * len(table), dtype=table.dtype)
+        values[0::2] = table['min']
+        values[1::2] = table['max']
+        return times, values
+
+def load_overview(filepath, num_samples=None):
+    """
+    Open the overview pyramid of an .f5b file
+
+    Parameters:
+    - filepath: .f5b file
+    - num_samples: Expected signal length; a pyramid covering a different length is ignored
+
+    Returns:
+    - Overview, or None when the file has no current pyramid
+    """
+    with h5py.File(filepath, 'r') as f:
+        if 'overview' not in f:
+            return None
+        group = f['overview']
+        covered = int(group.attrs['num_samples'])
+        if covered == 0 or (num_samples is not None and covered != num_samples):
+            return None
+
+        factor = int(group.attrs['factor'])
+        gaps = [tuple(gap) for gap in group.attrs['gaps'].reshape(-1, 2)]
+        time_axis = TimeAxis(float(group.attrs['t0']), float(group.attrs['sample_rate_Hz']), covered, gaps)
+        level_sizes = [group[f'level{level}'].shape[1] for level in range(1, _num_levels(covered, factor) + 1)]
+        return Overview(filepath, factor, covered, time_axis, level_sizes)
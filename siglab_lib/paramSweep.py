@@ -0,0 +1,191 @@
+# siglab_lib/paramSweep.py
+import csv
+import time
+import itertools
+import numpy as np
+from siglab_lib.fileIO import load_recording
+from siglab_lib.calcStats import DEFAULT_BLOOD_PARAMS, compute_segment_stats, track_blood_batch
+from siglab_lib.calcHiguchi import calculate_higuchi_stats, higuchi_mean
+from siglab_lib.stateEst import DEFAULT_EST_PARAMS, NUM_STATES, classify_segments, confusion_metrics
+from siglab_lib.featureTable import feature_pool
+
+# Search space used when none is given: value lists per parameter
+DEFAULT_SWEEP_SPACE = {
+    'reject_dist': [40.0, 60.0, 80.0],
+    'max_step': [5.0, 10.0, 20.0],
+    'blood_ref_diff': [15.0, 25.0, 35.0],
+    'wall_ref_diff': [70.0, 90.0, 110.0]
+}
+
+def grid_configs(space):
+    """
+    Every combination of a search space
+
+    Parameters:
+    - space: {parameter: list of values}
+
+    Returns:
+    - List of {parameter: value} dictionaries
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def random_configs(space, num_configs, seed=0):
+    """
+    Random draws from a search space
+
+    Parameters:
+    - space: {parameter: list of values, or (low, high) tuple for a uniform range}
+    - num_configs: Number of configurations
+    - seed: Random seed
+
+    Returns:
+    - List of {parameter: value} dictionaries
+    """
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(num_configs):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                config[name] = float(rng.uniform(*values))
+            else:
+                config[name] = values[rng.integers(len(values))]
+        configs.append(config)
+    return configs
+
+def _check_names(configs):
+    """Reject parameter names that neither the tracker nor the estimator knows"""
+    known = set(DEFAULT_BLOOD_PARAMS) | set(DEFAULT_EST_PARAMS)
+    unknown = {name for config in configs for name in config} - known
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+
+def evaluate_file(filepath, configs, batch_size=32):
+    """
+    Confusion matrices of every configuration on one labeled recording
+
+    Segment stats and Higuchi features are computed once. Each batch of
+    configurations runs the blood tracker with the parameter sets as a
+    vector dimension and classifies all (config, segment) pairs in one call.
+
+    Parameters:
+    - filepath: Labeled .f5b file
+    - configs: List of parameter dictionaries
+    - batch_size: Configurations evaluated together
+
+    Returns:
+    - confusion: (num_configs, NUM_STATES, NUM_STATES) counts, rows true, columns estimated
+    - seconds: (num_configs,) compute time attributed to each configuration
+    """
+    recording = load_recording(filepath)
+    segment_stats = compute_segment_stats(recording['magR'], recording['time_axis'])
+    higuchi_stats = calculate_higuchi_stats(recording['magR'], recording['time_axis'])
+
+    num_segments = min(len(segment_stats), len(higuchi_stats), len(recording['tag_state']))
+    segment_stats = segment_stats.rows(0, num_segments)
+    higuchi_stats = higuchi_stats.rows(0, num_segments)
+    true_states = recording['tag_state'][:num_segments].astype(np.int64)
+    base_features = {
+        'range': segment_stats['range'],
+        'higuchi_mean': higuchi_mean(higuchi_stats),
+        'higuchi_slope': higuchi_stats['slope']
+    }
+
+    confusion = np.zeros((len(configs), NUM_STATES, NUM_STATES), dtype=np.int64)
+    seconds = np.zeros(len(configs))
+    valid = (true_states >= 0) & (true_states < NUM_STATES)
+
+    for start in range(0, len(configs), batch_size):
+        batch = configs[start:start + batch_size]
+        t_start = time.perf_counter()
+
+        # Run the tracker once per distinct set of tracker constants
+        blood_keys = [tuple(config.get(name, DEFAULT_BLOOD_PARAMS[name]) for name in DEFAULT_BLOOD_PARAMS)
+                      for config in batch]
+        unique_keys, which = np.unique(np.array(blood_keys), axis=0, return_inverse=True)
+        blood_params = {name: unique_keys[:, col] for col, name in enumerate(DEFAULT_BLOOD_PARAMS)}
+        blood_val, _ = track_blood_batch(segment_stats['mean'], segment_stats['range'], blood_params)
+
+        # Estimator thresholds as (P, 1) columns against (P, N) features
+        features = dict(base_features, ref_diff=np.abs(segment_stats['mean'] - blood_val[which.ravel()]))
+        est_params = {name: np.array([[config.get(name, DEFAULT_EST_PARAMS[name])] for config in batch])
+                      for name in DEFAULT_EST_PARAMS}
+        est = classify_segments(features, est_params).astype(np.int64)
+
+        # One bincount over (config, true, est) triples
+        config_index = np.arange(len(batch))[:, None]
+        codes = (config_index * NUM_STATES + true_states) * NUM_STATES + est
+        counts = np.bincount(codes[:, valid].ravel(), minlength=len(batch) * NUM_STATES * NUM_STATES)
+        confusion[start:start + len(batch)] = counts.reshape(len(batch), NUM_STATES, NUM_STATES)
+
+        seconds[start:start + len(batch)] = (time.perf_counter() - t_start) / len(batch)
+
+    return confusion, seconds
+
+def _evaluate_job(job):
+    filepath, configs, batch_size = job
+    try:
+        return filepath, evaluate_file(filepath, configs, batch_size), None
+    except Exception as e:
+        return filepath, None, str(e)
+
+def run_sweep(files, configs, workers=None, batch_size=32, metric='kappa', progress=None):
+    """
+    Evaluate configurations against the labels of many recordings
+
+    Files are spread across a process pool; confusion matrices are summed
+    over files before the metrics are computed.
+
+    Parameters:
+    - files: Labeled .f5b files
+    - configs: List of parameter dictionaries
+    - workers: Process count (None = CPU count)
+    - batch_size: Configurations evaluated together per file
+    - metric: Column used for ranking
+    - progress: Optional callback(filepath, error)
+
+    Returns:
+    - Ranked list of row dictionaries: rank, metrics, seconds, and the
+      parameters (empty when no file could be evaluated)
+    """
+    _check_names(configs)
+    confusion = np.zeros((len(configs), NUM_STATES, NUM_STATES), dtype=np.int64)
+    seconds = np.zeros(len(configs))
+
+    jobs = [(filepath, configs, batch_size) for filepath in files]
+    evaluated = 0
+    with feature_pool(workers) as pool:
+        for filepath, result, error in pool.map(_evaluate_job, jobs):
+            if result is not None:
+                confusion += result[0]
+                seconds += result[1]
+                evaluated += 1
+            if progress is not None:
+                progress(filepath, error)
+    if evaluated == 0:
+        return []
+
+    metrics = confusion_metrics(confusion)
+    rows = []
+    for index, config in enumerate(configs):
+        row = {name: float(values[index]) for name, values in metrics.items()}
+        row['seconds'] = float(seconds[index])
+        row.update(config)
+        rows.append(row)
+
+    rows.sort(key=lambda row: -np.nan_to_num(row[metric], nan=-np.inf))
+    for rank, row in enumerate(rows, start=1):
+        row['rank'] = rank
+    return rows
+
+def write_sweep_table(rows, out_path):
+    """Write ranked sweep rows to a CSV file"""
+    if not rows:
+        return
+    leading = ['rank', 'accuracy', 'balanced_accuracy', 'kappa', 'seconds']
+    names = leading + [name for name in rows[0] if name not in leading]
+    with open(out_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=names)
+        writer.writeheader()
+        writer.writerows(rows)
\ No newline at end of file
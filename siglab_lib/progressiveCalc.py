@@ -0,0 +1,182 @@
+# siglab_lib/progressiveCalc.py
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+from siglab_lib.calcStats import STATS_COLUMNS, compute_segment_block_stats, init_blood_carry, track_blood_stats
+from siglab_lib.calcHiguchi import HIGUCHI_COLUMNS, calculate_higuchi_block
+from siglab_lib.featureTable import FeatureTable
+
+# Segments computed per scheduled block
+BLOCK_SEGMENTS = 600
+
+# The visible range is widened by this fraction of its width on each side
+VIEW_MARGIN = 0.5
+
+class ProgressiveFeature(ABC):
+    columns = ()
+
+    def __init__(self, magR, time_axis, block_segments=BLOCK_SEGMENTS):
+        """
+        Feature table filled block by block, visible range first
+
+        A worker thread computes blocks of segments. Blocks around the
+        range passed to focus go first, nearest to its center first; the
+        rest follow in recording order. Rows are published in place in
+        table as they finish and marked in valid.
+
+        Parameters:
+        - magR: Full signal data
+        - time_axis: TimeAxis of the signal
+        - block_segments: Segments per block
+        """
+        self.magR = magR
+        self.samples_per_sec = time_axis.samples_per_segment
+        self.num_segments = len(magR) // self.samples_per_sec
+        self.block_segments = block_segments
+
+        self.table = FeatureTable(self.columns, num_rows=self.num_segments)
+        self.valid = np.zeros(self.num_segments, dtype=bool)
+
+        num_blocks = -(-self.num_segments // block_segments)
+        self._pending = np.ones(num_blocks, dtype=bool)
+        self._view = None
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._thread = None
+
+    @abstractmethod
+    def _compute_block(self, first, end):
+        """Compute rows [first, end) into table and mark them in valid"""
+
+    @property
+    def done(self):
+        return not self._pending.any() and self._thread_idle()
+
+    def _thread_idle(self):
+        return self._thread is None or not self._thread.is_alive()
+
+    def focus(self, first_segment, end_segment):
+        """
+        Compute the blocks of a segment range (plus margin) next
+
+        Parameters:
+        - first_segment, end_segment: Visible segments, end exclusive
+        """
+        margin = int(VIEW_MARGIN * (end_segment - first_segment))
+        with self._lock:
+            self._view = (max(first_segment - margin, 0), min(end_segment + margin, self.num_segments))
+
+    def _take_block(self):
+        """Next block to compute, or None when all are taken"""
+        with self._lock:
+            pending = np.flatnonzero(self._pending)
+            if len(pending) == 0 or self._cancelled:
+                return None
+
+            block = pending[0]
+            if self._view is not None:
+                first, end = self._view
+                first_block, end_block = first // self.block_segments, -(-end // self.block_segments)
+                in_view = pending[(pending >= first_block) & (pending < end_block)]
+                if len(in_view):
+                    center = (first_block + end_block - 1) / 2
+                    block = in_view[np.argmin(np.abs(in_view - center))]
+
+            self._pending[block] = False
+            return block
+
+    def step(self):
+        """
+        Compute one block in the calling thread
+
+        Returns:
+        - (first, end) segments computed, or None when nothing is left
+        """
+        block = self._take_block()
+        if block is None:
+            return None
+        first = block * self.block_segments
+        end = min(first + self.block_segments, self.num_segments)
+        self._compute_block(first, end)
+        return first, end
+
+    def start(self):
+        """Compute the remaining blocks in a background thread"""
+        def run():
+            while self.step() is not None:
+                pass
+
+        self._thread = threading.Thread(target=run, name=f'progressive-{type(self).__name__}', daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self):
+        """Block until every segment is computed"""
+        if self._thread is not None:
+            self._thread.join()
+        while self.step() is not None:
+            pass
+        return self.table
+
+    def cancel(self):
+        """Stop after the block in progress"""
+        with self._lock:
+            self._cancelled = True
+
+class ProgressiveHiguchi(ProgressiveFeature):
+    """Higuchi statistics (HIGUCHI_COLUMNS); blocks are independent given one segment of lookback"""
+    columns = HIGUCHI_COLUMNS
+
+    def _compute_block(self, first, end):
+        sps = self.samples_per_sec
+        carry = self.magR[(first - 1) * sps:first * sps] if first > 0 else None
+        higuchi_stats, _ = calculate_higuchi_block(self.magR[first * sps:end * sps], sps, carry)
+        self.table.buffer[:, first:end] = higuchi_stats.buffer
+        self.valid[first:end] = True
+
+class ProgressiveStats(ProgressiveFeature):
+    """
+    Segment stats and blood estimates (STATS_COLUMNS)
+
+    max/min/mean/range/std follow the block order. The blood tracker is
+    sequential: it advances over the computed prefix of the recording, so
+    blood_val and blood_rng stay NaN (and blood_valid False) past it.
+    """
+    columns = STATS_COLUMNS
+
+    def __init__(self, magR, time_axis, block_segments=BLOCK_SEGMENTS):
+        super().__init__(magR, time_axis, block_segments)
+        self.table['blood_val'] = np.nan
+        self.table['blood_rng'] = np.nan
+        self.blood_valid = np.zeros(self.num_segments, dtype=bool)
+        self._blood_carry = init_blood_carry()
+        self._blood_done = 0
+        self._blood_lock = threading.Lock()
+
+    @property
+    def done(self):
+        return super().done and self._blood_done == self.num_segments
+
+    def _compute_block(self, first, end):
+        sps = self.samples_per_sec
+        segments = self.magR[first * sps:end * sps].reshape(-1, sps)
+        segment_stats = compute_segment_block_stats(segments)
+        self.table.buffer[:segment_stats.buffer.shape[0], first:end] = segment_stats.buffer
+        self.valid[first:end] = True
+        self._advance_blood()
+
+    def _advance_blood(self):
+        """Run the blood tracker over the segments computed since it last stopped"""
+        with self._blood_lock:
+            start = self._blood_done
+            missing = np.flatnonzero(~self.valid[start:])
+            end = start + missing[0] if len(missing) else self.num_segments
+            if end == start:
+                return
+
+            blood_stats = track_blood_stats(self.table['mean'][start:end], self.table['range'][start:end],
+                                            self._blood_carry)
+            self.table['blood_val'][start:end] = blood_stats[:, 0]
+            self.table['blood_rng'][start:end] = blood_stats[:, 1]
+            self.blood_valid[start:end] = True
+            self._blood_done = end
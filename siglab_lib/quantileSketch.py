@@ -0,0 +1,298 @@
+# siglab_lib/quantileSketch.py
+import os
+import numpy as np
+import h5py
+from siglab_lib.stateEst import NUM_STATES, estimator_features
+from siglab_lib.stateGroups import StateGroups
+from siglab_lib.featureTable import feature_pool
+
+# Per-segment features kept per state (keys of stateEst.estimator_features)
+SKETCH_FEATURES = ('range', 'ref_diff', 'higuchi_mean', 'higuchi_slope')
+
+# Level capacities shrink by this factor below the top level
+_CAPACITY_DECAY = 2.0 / 3.0
+
+class KLLSketch:
+    def __init__(self, k=200, seed=None):
+        """
+        Mergeable streaming quantile sketch (KLL compactor hierarchy)
+
+        Items at level h stand for 2**h input values. Rank error is about
+        1.7 / k of the count, independent of how many values were added.
+
+        Parameters:
+        - k: Capacity of the top level; larger is more accurate
+        - seed: Seed of the random compaction offsets
+        """
+        self.k = int(k)
+        self.levels = [np.zeros(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(2, int(np.ceil(self.k * _CAPACITY_DECAY ** depth)))
+
+    def _compress(self):
+        """Halve every level that is over capacity into the level above"""
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.zeros(0))
+
+                # Keep every other sorted item (random phase); an odd item stays here
+                items = np.sort(items)
+                odd = len(items) % 2
+                promoted = items[odd:][self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = items[:odd]
+            level += 1
+
+    def update(self, values):
+        """Add an array of values (non-finite values are ignored)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """Fold another sketch (same k) into this one"""
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with k={self.k} and k={other.k}")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.zeros(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def weighted_items(self):
+        """
+        Retained items and their weights
+
+        Returns:
+        - Sorted values and matching weights (the weights sum to count)
+        """
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2**level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        """
+        Approximate quantiles
+
+        Parameters:
+        - q: Quantile or array of quantiles in [0, 1]
+
+        Returns:
+        - Values with the shape of q (NaN for an empty sketch)
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+        values, weights = self.weighted_items()
+        cumulative = np.cumsum(weights)
+        index = np.clip(np.searchsorted(cumulative, q * cumulative[-1], side='left'), 0, len(values) - 1)
+        result = values[index]
+        return np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+
+    def cdf(self, x):
+        """Approximate fraction of values <= x"""
+        if self.count == 0:
+            return np.full(np.shape(x), np.nan)
+        values, weights = self.weighted_items()
+        cumulative = np.r_[0, np.cumsum(weights)]
+        return cumulative[np.searchsorted(values, x, side='right')] / self.count
+
+    def histogram(self, bins):
+        """
+        Approximate histogram with np.histogram semantics
+
+        Parameters:
+        - bins: Bin edges, or a number of equal bins between min and max
+
+        Returns:
+        - counts, edges
+        """
+        values, weights = self.weighted_items()
+        if np.isscalar(bins) and self.count:
+            bins = np.linspace(self.min, self.max, int(bins) + 1)
+        return np.histogram(values, bins=bins, weights=weights)
+
+    def save(self, group):
+        """Write the sketch into an open h5py group"""
+        group.attrs['k'] = self.k
+        group.attrs['count'] = self.count
+        group.attrs['min'] = self.min
+        group.attrs['max'] = self.max
+        group.create_dataset('items', data=np.concatenate(self.levels))
+        group.create_dataset('level_sizes', data=np.array([len(items) for items in self.levels], dtype=np.int64))
+
+    @classmethod
+    def load(cls, group, seed=None):
+        """Read a sketch written by save"""
+        sketch = cls(int(group.attrs['k']), seed=seed)
+        sketch.count = int(group.attrs['count'])
+        sketch.min = float(group.attrs['min'])
+        sketch.max = float(group.attrs['max'])
+        items = group['items'][:]
+        bounds = np.cumsum(group['level_sizes'][:])
+        sketch.levels = list(np.split(items, bounds[:-1])) if len(bounds) else [np.zeros(0)]
+        return sketch
+
+class FeatureSketches:
+    def __init__(self, k=200, num_states=NUM_STATES, features=SKETCH_FEATURES, seed=None):
+        """
+        One quantile sketch per (feature, labeled state)
+
+        Parameters:
+        - k: Sketch accuracy parameter
+        - num_states: Size of the state table
+        - features: Feature names (keys of estimator_features)
+        - seed: Seed of the compaction offsets
+        """
+        self.k = k
+        self.num_states = num_states
+        self.features = tuple(features)
+        self.files = []
+        seeds = np.random.SeedSequence(seed).spawn(len(self.features) * num_states)
+        self.sketches = {feature: [KLLSketch(k, seeds[i * num_states + state]) for state in range(num_states)]
+                         for i, feature in enumerate(self.features)}
+
+    def update(self, features, states):
+        """
+        Add one recording's per-segment features
+
+        Parameters:
+        - features: {feature: per-segment array}
+        - states: Per-segment labeled states (compared over the shorter length)
+        """
+        num = min([len(states)] + [len(features[feature]) for feature in self.features])
+
+        # Group segments by state once and split every feature the same way
+        groups = StateGroups(states[:num], self.num_states)
+        for feature in self.features:
+            values = np.asarray(features[feature][:num])
+            for state in range(self.num_states):
+                self.sketches[feature][state].update(values[groups.indices(state)])
+
+    def merge(self, other):
+        """Fold another set of sketches into this one"""
+        for feature in self.features:
+            for state in range(self.num_states):
+                self.sketches[feature][state].merge(other.sketches[feature][state])
+        self.files.extend(other.files)
+
+    def quantiles(self, feature, q):
+        """
+        Quantiles of one feature for every state
+
+        Returns:
+        - (num_states, len(q)) array
+        """
+        return np.array([sketch.quantile(np.atleast_1d(q)) for sketch in self.sketches[feature]])
+
+    def counts(self, feature):
+        """Number of segments per state"""
+        return np.array([sketch.count for sketch in self.sketches[feature]])
+
+    def histograms(self, feature, edges):
+        """
+        Histogram of one feature for every state over shared bin edges
+
+        Returns:
+        - (num_states, len(edges) - 1) array of counts
+        """
+        return np.array([sketch.histogram(edges)[0] for sketch in self.sketches[feature]])
+
+    def save(self, path):
+        """Write all sketches to an HDF5 file"""
+        with h5py.File(path, 'w') as f:
+            f.attrs['k'] = self.k
+            f.attrs['num_states'] = self.num_states
+            f.attrs['features'] = list(self.features)
+            f.create_dataset('files', data=np.array(self.files, dtype=h5py.string_dtype()))
+            for feature in self.features:
+                for state, sketch in enumerate(self.sketches[feature]):
+                    sketch.save(f.create_group(f'sketch/{feature}/{state}'))
+
+    @classmethod
+    def load(cls, path):
+        """Read sketches written by save"""
+        with h5py.File(path, 'r') as f:
+            features = [str(name) for name in f.attrs['features']]
+            sketches = cls(int(f.attrs['k']), int(f.attrs['num_states']), features)
+            sketches.files = [name.decode() if isinstance(name, bytes) else name for name in f['files'][:]]
+            for feature in features:
+                for state in range(sketches.num_states):
+                    sketches.sketches[feature][state] = KLLSketch.load(f[f'sketch/{feature}/{state}'])
+        return sketches
+
+def recording_sketches(stats, higuchi_stats, tag_state, k=200):
+    """
+    Sketches of one recording from its computed features
+
+    Parameters:
+    - stats: Stats table from calculate_segment_stats
+    - higuchi_stats: Higuchi table from calculate_higuchi_stats
+    - tag_state: Labeled states
+    - k: Sketch accuracy parameter
+    """
+    sketches = FeatureSketches(k)
+    sketches.update(estimator_features(stats, higuchi_stats), tag_state)
+    return sketches
+
+def sketch_file(filepath, k=200):
+    """Compute features of a labeled .f5b file and sketch them per state"""
+    from siglab_lib.labelSession import load_recording_features
+
+    recording = load_recording_features(filepath)
+    sketches = recording_sketches(recording['stats'], recording['higuchi_stats'], recording['tag_state'], k)
+    sketches.files.append(os.path.abspath(filepath))
+    return sketches
+
+def _sketch_job(job):
+    filepath, k = job
+    try:
+        return filepath, sketch_file(filepath, k), None
+    except Exception as e:
+        return filepath, None, str(e)
+
+def build_cohort_sketches(files, sketches=None, k=200, workers=None, progress=None):
+    """
+    Sketch many recordings in parallel and merge the results
+
+    Parameters:
+    - files: Labeled .f5b files
+    - sketches: Existing FeatureSketches to extend (files already in it are skipped)
+    - k: Sketch accuracy parameter for a new set
+    - workers: Process count (None = CPU count)
+    - progress: Optional callback(filepath, error)
+
+    Returns:
+    - Merged FeatureSketches
+    """
+    if sketches is None:
+        sketches = FeatureSketches(k)
+    done = set(sketches.files)
+    jobs = [(filepath, sketches.k) for filepath in files if os.path.abspath(filepath) not in done]
+
+    with feature_pool(workers) as pool:
+        for filepath, result, error in pool.map(_sketch_job, jobs):
+            if result is not None:
+                sketches.merge(result)
+            if progress is not None:
+                progress(filepath, error)
+    return sketches
@@ -0,0 +1,232 @@
+# siglab_lib/repack.py
+import os
+import stat
+import time
+import tempfile
+import numpy as np
+import h5py
+from siglab_lib.timeAxis import TimeAxis
+from siglab_lib.overviewPyramid import update_overview
+
+# Default read-optimized layout: 10-minute chunks, gzip with byte shuffle
+DEFAULT_LAYOUT = {
+    'chunk_seconds': 600,
+    'compression': 'gzip',
+    'compression_opts': 4,
+    'shuffle': True
+}
+
+def _dataset_options(item, layout, num_samples, num_segments, samples_per_segment):
+    """
+    h5py create_dataset options for one dataset under a layout
+
+    Signal-length datasets get chunks of chunk_seconds worth of samples and
+    segment-length datasets (tag/*) chunk_seconds segments, so windowed reads
+    and per-segment analysis touch whole chunks.
+    """
+    if layout is None or item.shape == ():
+        return {}
+
+    length = item.shape[0]
+    if length == num_samples:
+        rows = layout['chunk_seconds'] * samples_per_segment
+    elif length == num_segments:
+        rows = layout['chunk_seconds']
+    else:
+        rows = None
+
+    options = {
+        'compression': layout.get('compression'),
+        'compression_opts': layout.get('compression_opts') if layout.get('compression') == 'gzip' else None,
+        'shuffle': layout.get('shuffle', False)
+    }
+    if rows is not None and length > 0:
+        options['chunks'] = (min(rows, length),) + item.shape[1:]
+    elif length > 0:
+        options['chunks'] = True
+    else:
+        options = {}
+    return options
+
+def copy_recording(src, dst, layout=None, replace=None):
+    """
+    Copy every group, dataset and attribute of an open .f5b into another
+
+    Parameters:
+    - src: Open source h5py.File
+    - dst: Open destination h5py.File
+    - layout: Chunk/compression settings (see DEFAULT_LAYOUT), or None for h5py defaults
+    - replace: Optional {dataset path: array} written instead of the source data
+    """
+    replace = replace or {}
+    num_samples = num_segments = samples_per_segment = -1
+    if 'signal/time_S' in src:
+        time_axis = TimeAxis.from_hdf5(src)
+        num_samples = time_axis.num_samples
+        num_segments = time_axis.num_segments
+        samples_per_segment = time_axis.samples_per_segment
+
+    def copy_group(src_group, dst_group):
+        dst_group.attrs.update(src_group.attrs)
+        for key, item in src_group.items():
+            # The overview pyramid is derived from magR; callers rebuild it
+            if item.name == '/overview':
+                continue
+
+            if isinstance(item, h5py.Group):
+                # Create new group
+                copy_group(item, dst_group.create_group(key))
+                continue
+
+            # Carefully copy dataset
+            try:
+                data = replace.get(item.name.lstrip('/'))
+                if data is None:
+                    data = item[()]
+                options = _dataset_options(item, layout, num_samples, num_segments, samples_per_segment)
+                new_item = dst_group.create_dataset(key, data=data, **options)
+                new_item.attrs.update(item.attrs)
+            except Exception as e:
+                print(f"Could not copy dataset {key}: {e}")
+
+    copy_group(src, dst)
+
+    # Replacement datasets that do not exist in the source
+    for path, data in replace.items():
+        if path not in dst:
+            dst.create_dataset(path, data=data)
+
+def verify_copy(src_path, dst_path):
+    """
+    Check that two files hold the same datasets, values and attributes
+
+    The overview pyramid is rebuilt on copy and not compared.
+
+    Returns:
+    - List of mismatch descriptions (empty when identical)
+    """
+    problems = []
+    with h5py.File(src_path, 'r') as src, h5py.File(dst_path, 'r') as dst:
+        def check(name, item):
+            if name.split('/')[0] == 'overview':
+                return
+            if name not in dst:
+                problems.append(f"{name}: missing")
+                return
+            other = dst[name]
+            if (item.attrs.keys() != other.attrs.keys() or
+                    any(not np.array_equal(item.attrs[k], other.attrs[k]) for k in item.attrs)):
+                problems.append(f"{name}: attributes differ")
+            if isinstance(item, h5py.Dataset):
+                if item.shape != other.shape or item.dtype != other.dtype:
+                    problems.append(f"{name}: shape/dtype differ")
+                elif not np.array_equal(item[()], other[()]):
+                    problems.append(f"{name}: values differ")
+
+        src.visititems(check)
+    return problems
+
+def evict_from_cache(filepath):
+    """
+    Drop a file's pages from the OS page cache so the next reads come from disk
+
+    Returns:
+    - True when evicted, False where the platform has no posix_fadvise
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    fd = os.open(filepath, os.O_RDONLY)
+    try:
+        # Dirty pages are not dropped, so flush a just-written file first
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+def measure_read_throughput(filepath, window_seconds=120, num_reads=50, seed=0, cold=True):
+    """
+    Time random windowed reads of signal/magR
+
+    Parameters:
+    - filepath: .f5b file
+    - window_seconds: Length of each read window
+    - num_reads: Number of windows read
+    - cold: Evict the file from the page cache before timing (see evict_from_cache)
+
+    Returns:
+    - Throughput in MB/s
+    """
+    if cold:
+        evict_from_cache(filepath)
+    rng = np.random.default_rng(seed)
+    with h5py.File(filepath, 'r') as f:
+        magR = f['signal/magR']
+        rate = float(f['signal/sample_rate_Hz'][()]) if 'signal/sample_rate_Hz' in f else 30.0
+        window = min(int(window_seconds * rate), magR.shape[0])
+        starts = rng.integers(0, magR.shape[0] - window + 1, num_reads)
+
+        nbytes = 0
+        t_start = time.perf_counter()
+        for start in starts:
+            nbytes += magR[start:start + window].nbytes
+        elapsed = time.perf_counter() - t_start
+
+    return nbytes / 2**20 / max(elapsed, 1e-9)
+
+def repack_file(src_path, dst_path=None, layout=DEFAULT_LAYOUT, verify=True, overview=True):
+    """
+    Rewrite a recording with a chunked, compressed, read-optimized layout
+
+    Parameters:
+    - src_path: Source .f5b file
+    - dst_path: Output file, or None to replace the source after verification
+    - layout: Chunk/compression settings (see DEFAULT_LAYOUT)
+    - verify: Compare every dataset of the result with the source
+    - overview: Write the min/max/mean overview pyramid into the result
+
+    Returns:
+    - Report dictionary: sizes, size ratio, read throughput before/after and
+      whether it was timed with a cold or warm page cache
+    """
+    in_place = dst_path is None
+    if in_place:
+        # Temporary next to the source, named so folder scans for .f5b skip it
+        fd, out_path = tempfile.mkstemp(prefix=os.path.basename(src_path) + '.', suffix='.repack.tmp',
+                                        dir=os.path.dirname(os.path.abspath(src_path)))
+        os.close(fd)
+    else:
+        out_path = dst_path
+
+    try:
+        with h5py.File(src_path, 'r') as src, h5py.File(out_path, 'w') as dst:
+            copy_recording(src, dst, layout)
+            if overview:
+                update_overview(dst)
+
+        if verify:
+            problems = verify_copy(src_path, out_path)
+            if problems:
+                raise ValueError(f"Repack of {src_path} failed verification: " + "; ".join(problems))
+
+        report = {
+            'file': src_path,
+            'size_before_MB': os.path.getsize(src_path) / 2**20,
+            'size_after_MB': os.path.getsize(out_path) / 2**20,
+            'read_before_MBps': measure_read_throughput(src_path),
+            'read_after_MBps': measure_read_throughput(out_path),
+            'read_cache': 'cold' if hasattr(os, 'posix_fadvise') else 'warm'  # page cache state when timed
+        }
+        report['size_ratio'] = report['size_after_MB'] / max(report['size_before_MB'], 1e-12)
+
+        if in_place:
+            # mkstemp creates the file 0600; keep the recording's permissions
+            os.chmod(out_path, stat.S_IMODE(os.stat(src_path).st_mode))
+            os.replace(out_path, src_path)
+    except BaseException:
+        # Never leave a partial temporary behind
+        if in_place and os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+
+    return report
\ No newline at end of file
@@ -0,0 +1,88 @@
+# siglab_lib/report.py
+import os
+import glob
+import time
+from siglab_lib.labelSession import load_recording_features
+from siglab_lib.reportFigures import build_report_figures
+from siglab_lib.stateEst import STATE_COLORS
+from siglab_lib.featureTable import feature_pool
+
+# Points drawn per line/scatter series; keeps render time flat in recording length
+DEFAULT_MAX_POINTS = 10000
+
+def render_report(filepath, out_dir, fmt='pdf', max_points=DEFAULT_MAX_POINTS, dpi=100):
+    """
+    Render the summary pages of one recording without a display
+
+    Parameters:
+    - filepath: .f5b recording
+    - out_dir: Output folder
+    - fmt: 'pdf' (one multi-page file) or 'png' (one file per page)
+    - max_points: Point budget per series (None renders every point)
+    - dpi: Resolution of PNG pages
+
+    Returns:
+    - List of written paths
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    recording = load_recording_features(filepath)
+    pages = build_report_figures(recording, STATE_COLORS, max_points)
+    base = os.path.join(out_dir, os.path.splitext(os.path.basename(filepath))[0])
+
+    if fmt == 'pdf':
+        out_path = base + '_report.pdf'
+        with PdfPages(out_path) as pdf:
+            for fig in pages:
+                pdf.savefig(fig)
+        return [out_path]
+
+    written = []
+    for number, fig in enumerate(pages, start=1):
+        out_path = f"{base}_report_p{number}.png"
+        fig.savefig(out_path, dpi=dpi)
+        written.append(out_path)
+    return written
+
+def _render_job(job):
+    filepath, out_dir, fmt, max_points, dpi = job
+    t_start = time.perf_counter()
+    try:
+        return filepath, render_report(filepath, out_dir, fmt, max_points, dpi), time.perf_counter() - t_start, None
+    except Exception as e:
+        return filepath, [], time.perf_counter() - t_start, str(e)
+
+def expand_inputs(inputs):
+    """Expand folders into their .f5b files; files are kept as given"""
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.f5b'))))
+        else:
+            files.append(path)
+    return files
+
+def render_reports(files, out_dir, fmt='pdf', max_points=DEFAULT_MAX_POINTS, dpi=100, workers=None, progress=None):
+    """
+    Render reports for many recordings in a process pool
+
+    Parameters:
+    - files: .f5b recordings
+    - out_dir: Output folder (created when missing)
+    - fmt, max_points, dpi: See render_report
+    - workers: Process count (None = CPU count)
+    - progress: Optional callback(filepath, written paths, seconds, error)
+
+    Returns:
+    - Number of recordings rendered
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(filepath, out_dir, fmt, max_points, dpi) for filepath in files]
+
+    rendered = 0
+    with feature_pool(workers) as pool:
+        for filepath, written, seconds, error in pool.map(_render_job, jobs):
+            rendered += error is None
+            if progress is not None:
+                progress(filepath, written, seconds, error)
+    return rendered
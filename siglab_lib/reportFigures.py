@@ -0,0 +1,303 @@
+# siglab_lib/reportFigures.py
+import os
+import numpy as np
+from siglab_lib.calcHiguchi import higuchi_mean
+from siglab_lib.stateGroups import StateGroups
+
+# Shared look of all SignalLab figures
+FIGURE_COLOR = '#B0C4DE'
+AXES_COLOR = '#E6EDF3'
+
+def decimate_minmax(x, y, max_points):
+    """
+    Reduce a line to at most max_points points that keep its min/max envelope
+
+    Parameters:
+    - x, y: Line coordinates
+    - max_points: Point budget (None keeps every point)
+
+    Returns:
+    - x, y subsets in original order
+    """
+    num = len(y)
+    if max_points is None or num <= max_points:
+        return x, y
+
+    # Per bin, keep the positions of the minimum and the maximum
+    num_bins = max(1, max_points // 2)
+    bin_len = -(-num // num_bins)
+    padded = np.pad(np.asarray(y), (0, num_bins * bin_len - num), mode='edge').reshape(num_bins, bin_len)
+    offsets = np.arange(num_bins) * bin_len
+    keep = np.unique(np.minimum(np.r_[offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1)], num - 1))
+    return x[keep], y[keep]
+
+def state_indices(states, state_colors, max_points):
+    """
+    Segment indices of each state, thinned to a shared point budget
+
+    Returns:
+    - {state code: indices}; see StateGroups.thinned_indices
+    """
+    num_states = max(state_colors) + 1
+    return StateGroups(states, num_states).thinned_indices(state_colors, max_points)
+
+def style_axes(fig, *axes):
+    """Apply the SignalLab figure and axes colors"""
+    fig.patch.set_facecolor(FIGURE_COLOR)
+    for ax in axes:
+        ax.set_facecolor(AXES_COLOR)
+
+def draw_signal(ax, magR, time_axis, tag_state, state_colors, state_est=None, title=None, max_points=None,
+                signal_line=None):
+    """
+    Draw the signal with labeled state markers and the estimated-state track
+
+    Parameters:
+    - ax: Target axes
+    - magR, time_axis, tag_state: Recording data
+    - state_colors: State table (name/color per code)
+    - state_est: Optional estimated states, drawn along the bottom
+    - title: Axes title
+    - max_points: Point budget for the line and for the state markers (None = all)
+    - signal_line: Optional (times, values) drawn instead of the signal, e.g. an overview envelope
+
+    Returns:
+    - The signal Line2D
+    """
+    # Plot main signal FIRST (gray line in the background)
+    if signal_line is None:
+        signal_line = decimate_minmax(time_axis.times(), magR, max_points)
+    line, = ax.plot(*signal_line, color='gray', zorder=1)
+
+    # Plot state markers ON TOP of the signal line
+    segment_times = time_axis.segment_times()
+    segment_mag = magR[::time_axis.samples_per_segment]
+    marker_index = state_indices(tag_state, state_colors, max_points)
+    for state_val, state_info in state_colors.items():
+        index = marker_index[state_val]
+        ax.scatter(segment_times[index], segment_mag[index],
+                   color=state_info['color'],
+                   label=state_info['name'],
+                   s=10,
+                   zorder=2)
+
+    # Estimated states as a marker track along the bottom of the plot
+    if state_est is not None:
+        est_time = segment_times[:len(state_est)]
+        track = ax.get_xaxis_transform()
+        est_index = state_indices(state_est[:len(est_time)], state_colors, max_points)
+        for state_val, state_info in state_colors.items():
+            index = est_index[state_val]
+            ax.scatter(est_time[index], np.full(len(index), 0.02),
+                       color=state_info['color'],
+                       marker='|',
+                       s=40,
+                       transform=track,
+                       zorder=2)
+
+    ax.set_title(title or 'Signal')
+    ax.set_xlabel('Time (s)')
+    ax.set_ylabel('Magnitude (magR)')
+    ax.grid(True, linestyle='--', color='darkgray')
+    ax.legend()
+    return line
+
+def draw_stats(ax, stats, time_axis, title=None, max_points=None, valid=None):
+    """
+    Draw segment means, min-max range bars and the blood estimate over time
+
+    Parameters:
+    - ax: Target axes
+    - stats: Stats table from calculate_segment_stats
+    - time_axis: TimeAxis of the recording
+    - title: Axes title
+    - max_points: Segment budget; above it, neighbouring segments are pooled
+      (min of mins, max of maxes, mean of means)
+    - valid: Optional per-segment mask of computed rows; only those are drawn
+    """
+    segments = np.arange(len(stats))
+    if valid is not None:
+        segments = np.flatnonzero(valid)
+        stats = stats.take(segments)
+    tag_time_S = time_axis.segment_to_time(segments)  # time at start of segment
+    seg_max, seg_min, seg_mean = stats['max'], stats['min'], stats['mean']
+    blood_est_val = stats['blood_val']
+    if max_points is not None and len(tag_time_S) > max_points:
+        starts = np.arange(0, len(tag_time_S), -(-len(tag_time_S) // max_points))
+        counts = np.diff(np.r_[starts, len(tag_time_S)])
+        seg_max = np.maximum.reduceat(seg_max, starts)
+        seg_min = np.minimum.reduceat(seg_min, starts)
+        seg_mean = np.add.reduceat(seg_mean, starts) / counts
+        blood_est_val = np.add.reduceat(blood_est_val, starts) / counts
+        tag_time_S = tag_time_S[starts]
+
+    # Plot data
+    ax.scatter(tag_time_S, seg_mean, color='black', label='Mean', s=30)
+
+    # Plot min-max range lines
+    ax.vlines(tag_time_S, seg_min, seg_max, color='blue', alpha=0.5, linewidth=2)
+
+    # Plot blood estimate value
+    ax.plot(tag_time_S, blood_est_val, color='darkred', linestyle='-', label='Blood Est Value')
+
+    ax.set_title(title or 'MinMaxRng plot')
+    ax.set_xlabel('Time (s)')
+    ax.set_ylabel('Magnitude')
+    ax.legend()
+    ax.grid(True)
+
+def draw_higuchi(mean_ax, slope_ax, higuchi_stats, time_axis, name='', max_points=None, valid=None):
+    """
+    Draw the Higuchi mean and slope over time
+
+    Parameters:
+    - mean_ax, slope_ax: Target axes
+    - higuchi_stats: Higuchi table from calculate_higuchi_stats
+    - time_axis: TimeAxis of the recording
+    - name: Recording name for the titles
+    - max_points: Point budget per axes (None = all)
+    - valid: Optional per-segment mask of computed rows; only those are drawn
+    """
+    # Time points for each segment
+    segments = np.arange(len(higuchi_stats))
+    if valid is not None:
+        segments = np.flatnonzero(valid)
+        higuchi_stats = higuchi_stats.take(segments)
+    tag_time_S = time_axis.segment_to_time(segments)
+
+    # Plot Higuchi Mean with 1 pt width line and 10pt dots
+    mean_time, mean_value = decimate_minmax(tag_time_S, higuchi_mean(higuchi_stats), max_points)
+    mean_ax.plot(mean_time, mean_value, color='black', linewidth=1.0)
+    mean_ax.scatter(mean_time, mean_value, color='black', s=10)
+    mean_ax.set_title(f"Higuchi Mean: {name}")
+    mean_ax.set_ylabel('Higuchi Mean')
+    mean_ax.grid(True)
+
+    # Plot Higuchi Slope with dots only
+    slope_time, slope_value = decimate_minmax(tag_time_S, higuchi_stats['slope'], max_points)
+    slope_ax.scatter(slope_time, slope_value, color='black', s=10)
+    slope_ax.set_title(f"Higuchi Slope: {name}")
+    slope_ax.set_xlabel('Time (s)')
+    slope_ax.set_ylabel('Higuchi Slope')
+    slope_ax.grid(True)
+
+def _draw_state_scatter(ax, x, y, tag_state, state_colors, max_points):
+    """Scatter x against y per labeled state"""
+    num = min(len(x), len(y), len(tag_state))
+    scatter_index = state_indices(tag_state[:num], state_colors, max_points)
+    for state_val, state_info in state_colors.items():
+        index = scatter_index[state_val]
+        ax.scatter(x[index], y[index],
+                   color=state_info['color'],
+                   label=state_info['name'],
+                   alpha=0.7)
+
+def draw_higuchi_scatter(ax, higuchi_stats, tag_state, state_colors, name='', max_points=None):
+    """
+    Draw Higuchi mean vs slope, colored by labeled state
+
+    Parameters:
+    - max_points: Point budget shared by the states (None = all)
+    """
+    _draw_state_scatter(ax, higuchi_mean(higuchi_stats), higuchi_stats['slope'], tag_state, state_colors, max_points)
+
+    ax.set_title(f"Higuchi Mean vs Slope: {name}")
+    ax.set_xlabel('Higuchi Mean')
+    ax.set_ylabel('Higuchi Slope')
+    ax.grid(True)
+    ax.legend()
+
+def draw_range_bloodref_scatter(ax, stats, tag_state, state_colors, name='', max_points=None):
+    """
+    Draw segment range vs blood reference difference, colored by labeled state
+
+    Parameters:
+    - max_points: Point budget shared by the states (None = all)
+    """
+    blood_ref_diff = np.abs(stats['mean'] - stats['blood_val'])
+    _draw_state_scatter(ax, stats['range'], blood_ref_diff, tag_state, state_colors, max_points)
+
+    ax.set_title(f"Range vs Blood Reference Diff: {name}")
+    ax.set_xlabel('Range')
+    ax.set_ylabel('Blood Reference Difference')
+    ax.grid(True)
+    ax.legend()
+
+def draw_higuchi_sweep(fig, configs, cube, tag_state, state_colors, name='', max_points=None):
+    """
+    Draw one Higuchi mean vs slope scatter per sweep configuration
+
+    Parameters:
+    - fig: Target figure (one row per window length, one column per k-max)
+    - configs, cube: Output of calcHiguchi.higuchi_sweep
+    - tag_state, state_colors: Labeled states and state table
+    - max_points: Point budget per axes shared by the states (None = all)
+    """
+    windows = sorted({w for w, _ in configs})
+    kmaxes = sorted({kmax for _, kmax in configs})
+    axes = fig.subplots(len(windows), len(kmaxes), squeeze=False, sharex='col')
+
+    for index, (w, kmax) in enumerate(configs):
+        ax = axes[windows.index(w), kmaxes.index(kmax)]
+        ax.set_facecolor(AXES_COLOR)
+        _draw_state_scatter(ax, cube[index, 0], cube[index, 1], tag_state, state_colors, max_points)
+        ax.set_title(f"window {w:g} s, k = 1..{kmax}", fontsize=9)
+        ax.grid(True)
+
+    for ax in axes[-1]:
+        ax.set_xlabel('Higuchi Mean')
+    for ax in axes[:, 0]:
+        ax.set_ylabel('Higuchi Slope')
+    axes[0, 0].legend(fontsize=7)
+    fig.patch.set_facecolor(FIGURE_COLOR)
+    fig.suptitle(f"Higuchi Sweep: {name}")
+
+def build_report_figures(recording, state_colors, max_points=10000):
+    """
+    Build the report pages of one recording as backend-free Figures
+
+    Parameters:
+    - recording: Dictionary from load_recording_features
+    - state_colors: State table
+    - max_points: Point budget passed to every drawing function
+
+    Returns:
+    - List of matplotlib.figure.Figure, one per page
+    """
+    from matplotlib.figure import Figure
+
+    name = os.path.basename(recording['filepath'])
+    pages = []
+
+    fig = Figure(figsize=(15, 8))
+    ax = fig.add_subplot()
+    style_axes(fig, ax)
+    draw_signal(ax, recording['magR'], recording['time_axis'], recording['tag_state'], state_colors,
+                state_est=recording.get('state_est'), title=f'Signal: {name}', max_points=max_points)
+    ax.set_xlim(recording['time_axis'].start, recording['time_axis'].end)
+    pages.append(fig)
+
+    fig = Figure(figsize=(15, 8))
+    ax = fig.add_subplot()
+    style_axes(fig, ax)
+    draw_stats(ax, recording['stats'], recording['time_axis'], title=f"MinMaxRng plot: {name}", max_points=max_points)
+    pages.append(fig)
+
+    fig = Figure(figsize=(15, 8))
+    mean_ax, slope_ax = fig.subplots(2, 1, sharex=True)
+    style_axes(fig, mean_ax, slope_ax)
+    draw_higuchi(mean_ax, slope_ax, recording['higuchi_stats'], recording['time_axis'], name, max_points)
+    pages.append(fig)
+
+    fig = Figure(figsize=(15, 8))
+    higuchi_ax, range_ax = fig.subplots(1, 2)
+    style_axes(fig, higuchi_ax, range_ax)
+    draw_higuchi_scatter(higuchi_ax, recording['higuchi_stats'], recording['tag_state'], state_colors,
+                         name, max_points)
+    draw_range_bloodref_scatter(range_ax, recording['stats'], recording['tag_state'], state_colors,
+                                name, max_points)
+    pages.append(fig)
+
+    for fig in pages:
+        fig.tight_layout()
+    return pages
@@ -0,0 +1,129 @@
+# siglab_lib/resample.py
+from fractions import Fraction
+import numpy as np
+from scipy.signal import firwin
+
+# Output samples computed per vectorized step; bounds the (outputs x taps) gather
+_OUTPUT_STEP = 1 << 16
+
+def resample_ratio(rate_in, rate_out, max_denominator=1000):
+    """
+    Rational up/down factors that take rate_in to rate_out
+
+    Returns:
+    - (up, down) integers
+    """
+    ratio = Fraction(rate_out / rate_in).limit_denominator(max_denominator)
+    return ratio.numerator, ratio.denominator
+
+class PolyphaseResampler:
+    def __init__(self, rate_in, rate_out, beta=5.0):
+        """
+        Streaming rational resampler (same filter and alignment as scipy.signal.resample_poly)
+
+        Parameters:
+        - rate_in: Input sampling rate (Hz)
+        - rate_out: Output sampling rate (Hz)
+        - beta: Kaiser window parameter of the anti-aliasing filter
+        """
+        self.up, self.down = resample_ratio(rate_in, rate_out)
+        self.passthrough = self.up == self.down
+
+        # Low-pass FIR at the lower of the two Nyquist rates
+        max_rate = max(self.up, self.down)
+        if self.passthrough:
+            self.half_len = 0
+            h = np.ones(1)
+        else:
+            self.half_len = 10 * max_rate
+            h = firwin(2 * self.half_len + 1, 1.0 / max_rate, window=('kaiser', beta)) * self.up
+
+        # Polyphase matrix: phase p uses taps h[p], h[p + up], h[p + 2*up], ...
+        self.num_taps = -(-len(h) // self.up)
+        padded = np.zeros(self.num_taps * self.up)
+        padded[:len(h)] = h
+        self.phases = padded.reshape(self.num_taps, self.up).T
+
+        # Input history; buffer holds x[buf_start:total_in], zeros before the start
+        self._buf = np.zeros(self.num_taps)
+        self._buf_start = -self.num_taps
+        self._total_in = 0
+        self._next_out = 0
+
+    def _produce(self, last_out):
+        """Compute outputs next_out..last_out from the buffered input"""
+        if last_out < self._next_out:
+            # Not enough new input for another output yet
+            return np.zeros(0)
+
+        chunks = []
+        taps = np.arange(self.num_taps)
+        for first in range(self._next_out, last_out + 1, _OUTPUT_STEP):
+            n = np.arange(first, min(first + _OUTPUT_STEP, last_out + 1))
+            u = n * self.down + self.half_len
+            phase = u % self.up
+            newest = u // self.up - self._buf_start
+
+            # Gather the input taps for every output sample at once
+            samples = self._buf[newest[:, None] - taps[None, :]]
+            chunks.append(np.einsum('ij,ij->i', samples, self.phases[phase]))
+
+        self._next_out = last_out + 1
+
+        # Keep only the history still needed by the next output
+        keep_from = (self._next_out * self.down + self.half_len) // self.up - self.num_taps + 1
+        drop = max(0, keep_from - self._buf_start)
+        self._buf = self._buf[drop:]
+        self._buf_start += drop
+
+        return np.concatenate(chunks)
+
+    def process(self, x):
+        """
+        Feed input samples
+
+        Returns:
+        - Output samples that are fully determined by the input so far
+        """
+        if self.passthrough:
+            return np.array(x, dtype=np.float64)
+
+        self._buf = np.concatenate([self._buf, np.asarray(x, dtype=np.float64)])
+        self._total_in += len(x)
+
+        # Output n needs input up to (n*down + half_len) // up
+        last_out = (self._total_in * self.up - 1 - self.half_len) // self.down
+        return self._produce(last_out)
+
+    def flush(self):
+        """
+        Finish the stream, treating the input past the end as zeros
+
+        Returns:
+        - Remaining output samples; the total is ceil(num_in * up / down)
+        """
+        if self.passthrough:
+            return np.zeros(0)
+
+        num_out = -(-self._total_in * self.up // self.down)
+        self._buf = np.concatenate([self._buf, np.zeros(self.num_taps + 1)])
+        return self._produce(num_out - 1)
+
+def resample_signal(x, rate_in, rate_out, chunk_samples=1 << 20):
+    """
+    Resample a whole signal in streaming chunks
+
+    Parameters:
+    - x: Input signal
+    - rate_in: Input sampling rate (Hz)
+    - rate_out: Output sampling rate (Hz)
+    - chunk_samples: Input samples fed per step
+
+    Returns:
+    - Resampled signal (float32 when the input is float32)
+    """
+    resampler = PolyphaseResampler(rate_in, rate_out)
+    parts = [resampler.process(x[start:start + chunk_samples])
+             for start in range(0, len(x), chunk_samples)]
+    parts.append(resampler.flush())
+    return np.concatenate(parts).astype(np.result_type(x, np.float32))
\ No newline at end of file
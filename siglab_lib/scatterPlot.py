@@ -4,6 +4,7 @@ import tkinter as tk
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from siglab_lib.reportFigures import draw_higuchi_scatter, draw_range_bloodref_scatter, draw_higuchi_sweep
 
 def create_higuchi_scatter(app):
     """
@@ -13,11 +14,11 @@ def create_higuchi_scatter(app):
     - app: Main application instance
     """
     from siglab_lib.calcHiguchi import calculate_higuchi_stats
-    from siglab_lib.calcStats import calculate_segment_stats
     
-    # Calculate Higuchi and segment statistics
-    higuchi_stats = calculate_higuchi_stats(app.magR, app.time_S)
-    segment_stats = calculate_segment_stats(app)
+    # Use precomputed Higuchi statistics when available
+    higuchi_stats = app.higuchi_stats
+    if higuchi_stats is None:
+        higuchi_stats = calculate_higuchi_stats(app.magR, app.time_axis)
     
     # Create scatter plot window
     plot_window = tk.Toplevel()
@@ -42,29 +43,8 @@ def create_higuchi_scatter(app):
     canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
     toolbar.pack(side=tk.TOP, fill=tk.X)
     
-    # Calculate Higuchi Mean and Slope
-    higuchi_mean = np.mean(higuchi_stats[:, :5], axis=1)
-    higuchi_slope = higuchi_stats[:, 5]
-    
-    # Plot scatter for each state
-    for state_val, state_info in app.state_colors.items():
-        # Find indices for this state
-        state_mask = app.tag_state == state_val
-        
-        # Plot scatter for this state
-        ax.scatter(
-            higuchi_mean[state_mask], 
-            higuchi_slope[state_mask], 
-            color=state_info['color'], 
-            label=state_info['name'],
-            alpha=0.7
-        )
-    
-    ax.set_title(f"Higuchi Mean vs Slope: {os.path.basename(app.filepath)}")
-    ax.set_xlabel('Higuchi Mean')
-    ax.set_ylabel('Higuchi Slope')
-    ax.grid(True)
-    ax.legend()
+    # Scatter Higuchi Mean vs Slope for each state
+    draw_higuchi_scatter(ax, higuchi_stats, app.tag_state, app.state_colors, os.path.basename(app.filepath))
     
     # Adjust layout
     plt.tight_layout()
@@ -81,8 +61,10 @@ def create_range_bloodref_scatter(app):
     """
     from siglab_lib.calcStats import calculate_segment_stats
     
-    # Calculate segment statistics
-    segment_stats = calculate_segment_stats(app)
+    # Use precomputed segment statistics when available
+    segment_stats = app.stats
+    if segment_stats is None:
+        segment_stats = calculate_segment_stats(app)
     
     # Create scatter plot window
     plot_window = tk.Toplevel()
@@ -107,36 +89,145 @@ def create_range_bloodref_scatter(app):
     canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
     toolbar.pack(side=tk.TOP, fill=tk.X)
     
-    # Extract segment statistics
-    segment_rng = segment_stats['segmentStats']['each'][:, 3]  # Range column
-    
-    # Calculate blood reference difference
-    blood_est_val = segment_stats['bloodEstVal']
-    segment_mean = segment_stats['segmentStats']['each'][:, 2]  # Mean column
-    blood_ref_diff = np.abs(segment_mean - blood_est_val)
-    
-    # Plot scatter for each state
-    for state_val, state_info in app.state_colors.items():
-        # Find indices for this state
-        state_mask = app.tag_state == state_val
-        
-        # Plot scatter for this state
-        ax.scatter(
-            segment_rng[state_mask], 
-            blood_ref_diff[state_mask], 
-            color=state_info['color'], 
-            label=state_info['name'],
-            alpha=0.7
-        )
-    
-    ax.set_title(f"Range vs Blood Reference Diff: {os.path.basename(app.filepath)}")
-    ax.set_xlabel('Range')
-    ax.set_ylabel('Blood Reference Difference')
-    ax.grid(True)
-    ax.legend()
+    # Scatter Range vs Blood Reference Difference for each state
+    draw_range_bloodref_scatter(ax, segment_stats, app.tag_state, app.state_colors, os.path.basename(app.filepath))
     
     # Adjust layout
     plt.tight_layout()
     
     # Show the plot
-    canvas.draw()
\ No newline at end of file
+    canvas.draw()
+
+def create_state_distribution_plot(app, num_bins=60):
+    """
+    Plot per-state distributions of the estimator features
+
+    The current file is sketched on the fly; a loaded cohort sketch file
+    (app.cohort_sketches) is drawn dashed on the same axes.
+
+    Parameters:
+    - app: Main application instance
+    - num_bins: Histogram bins per feature
+    """
+    from siglab_lib.calcStats import calculate_segment_stats
+    from siglab_lib.calcHiguchi import calculate_higuchi_stats
+    from siglab_lib.quantileSketch import SKETCH_FEATURES, recording_sketches
+
+    # Use precomputed features when available
+    segment_stats = app.stats
+    if segment_stats is None:
+        segment_stats = calculate_segment_stats(app)
+    higuchi_stats = app.higuchi_stats
+    if higuchi_stats is None:
+        higuchi_stats = calculate_higuchi_stats(app.magR, app.time_axis)
+
+    sketches = recording_sketches(segment_stats, higuchi_stats, app.tag_state)
+    cohort = getattr(app, 'cohort_sketches', None)
+
+    # Create plot window
+    plot_window = tk.Toplevel()
+    plot_window.title(f"State Distributions: {os.path.basename(app.filepath)}")
+    plot_window.geometry('1000x750')
+    plot_window.configure(bg='#B0C4DE')  # Match main window background
+
+    # Create matplotlib figure
+    fig, axes = plt.subplots(2, 2, figsize=(10, 7.5))
+    fig.patch.set_facecolor('#B0C4DE')
+
+    # Create canvas
+    canvas = FigureCanvasTkAgg(fig, master=plot_window)
+    canvas.draw()
+
+    # Create toolbar
+    toolbar = NavigationToolbar2Tk(canvas, plot_window)
+    toolbar.update()
+
+    # Pack widgets
+    canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+    toolbar.pack(side=tk.TOP, fill=tk.X)
+
+    titles = {
+        'range': 'Range',
+        'ref_diff': 'Blood Reference Difference',
+        'higuchi_mean': 'Higuchi Mean',
+        'higuchi_slope': 'Higuchi Slope'
+    }
+
+    for ax, feature in zip(axes.ravel(), SKETCH_FEATURES):
+        ax.set_facecolor('#E6EDF3')
+
+        # Shared bins over the central 98% of every state
+        sources = [sketches] + ([cohort] if cohort is not None else [])
+        bounds = np.concatenate([source.quantiles(feature, [0.01, 0.99]).ravel() for source in sources])
+        bounds = bounds[np.isfinite(bounds)]
+        if len(bounds) == 0 or bounds.min() == bounds.max():
+            continue
+        edges = np.linspace(bounds.min(), bounds.max(), num_bins + 1)
+        centers = (edges[:-1] + edges[1:]) / 2
+
+        for source, linestyle in zip(sources, ['-', '--']):
+            counts = source.histograms(feature, edges)
+            totals = np.maximum(source.counts(feature), 1)[:, None]
+            density = counts / totals / np.diff(edges)
+            for state_val, state_info in app.state_colors.items():
+                if state_val >= len(density) or counts[state_val].sum() == 0:
+                    continue
+                ax.plot(centers, density[state_val],
+                        color=state_info['color'],
+                        linestyle=linestyle,
+                        label=state_info['name'] if linestyle == '-' else None)
+
+        ax.set_title(titles[feature])
+        ax.set_ylabel('Density')
+        ax.grid(True)
+
+    axes[0, 0].legend()
+    if cohort is not None:
+        fig.suptitle(f"Solid: this file, dashed: cohort of {len(cohort.files)} recordings")
+
+    # Adjust layout
+    fig.tight_layout()
+
+    # Show the plot
+    canvas.draw()
+
+def create_higuchi_sweep_scatter(app, window_seconds, kmax_values):
+    """
+    Compare Higuchi configurations as a grid of mean vs slope scatters
+
+    Parameters:
+    - app: Main application instance
+    - window_seconds: Window lengths in seconds
+    - kmax_values: Largest interval k of each configuration
+    """
+    from siglab_lib.calcHiguchi import higuchi_sweep
+
+    configs, cube = higuchi_sweep(app.magR, app.time_axis, window_seconds, kmax_values)
+
+    # Create scatter plot window
+    plot_window = tk.Toplevel()
+    plot_window.title(f"Higuchi Sweep: {os.path.basename(app.filepath)}")
+    plot_window.geometry('1200x900')
+    plot_window.configure(bg='#B0C4DE')  # Match main window background
+
+    # Create matplotlib figure
+    fig = plt.figure(figsize=(12, 9))
+    draw_higuchi_sweep(fig, configs, cube, app.tag_state, app.state_colors, os.path.basename(app.filepath))
+
+    # Create canvas
+    canvas = FigureCanvasTkAgg(fig, master=plot_window)
+    canvas.draw()
+
+    # Create toolbar
+    toolbar = NavigationToolbar2Tk(canvas, plot_window)
+    toolbar.update()
+
+    # Pack widgets
+    canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+    toolbar.pack(side=tk.TOP, fill=tk.X)
+
+    # Adjust layout
+    fig.tight_layout()
+
+    # Show the plot
+    canvas.draw()
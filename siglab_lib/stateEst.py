@@ -0,0 +1,161 @@
+# siglab_lib/stateEst.py
+import numpy as np
+from siglab_lib.calcHiguchi import higuchi_mean
+
+# State codes and their display colors (SignalLab.state_colors)
+UNKNOWN, BLOOD1, BLOOD2, WALL, CLOT, STEP = range(6)
+NUM_STATES = 6
+STATE_COLORS = {
+    UNKNOWN: {'name': 'Unknown', 'color': 'gray', 'label_color': 'white'},
+    BLOOD1: {'name': 'Blood1', 'color': 'green', 'label_color': 'white'},
+    BLOOD2: {'name': 'Blood2', 'color': 'cyan', 'label_color': 'black'},
+    WALL: {'name': 'Wall', 'color': 'blue', 'label_color': 'white'},
+    CLOT: {'name': 'Clot', 'color': 'orange', 'label_color': 'black'},
+    STEP: {'name': 'Step', 'color': 'black', 'label_color': 'white'}
+}
+STATE_NAMES = tuple(STATE_COLORS[code]['name'] for code in range(NUM_STATES))
+
+# Rule thresholds; starting values meant to be tuned against labeled files
+DEFAULT_EST_PARAMS = {
+    'step_range': 150.0,        # Segment range above which the segment is a Step
+    'wall_ref_diff': 90.0,      # |mean - blood ref| above which the segment is Wall
+    'clot_ref_diff': 40.0,      # |mean - blood ref| above which the segment may be Clot
+    'clot_slope': -1.0,         # ... and Clot when the Higuchi slope is above this
+    'blood_range': 40.0,        # Blood segments have at most this range
+    'blood_ref_diff': 25.0,     # ... and stay this close to the blood reference
+    'blood2_higuchi_mean': 60.0 # Blood above this Higuchi mean is Blood2, else Blood1
+}
+
+def estimator_features(stats, higuchi_stats):
+    """
+    Per-segment features used by the estimator
+
+    Parameters:
+    - stats: Stats table from calculate_segment_stats
+    - higuchi_stats: Higuchi table from calculate_higuchi_stats
+
+    Returns:
+    - Dictionary of equal-length arrays: range, ref_diff, higuchi_mean, higuchi_slope
+    """
+    num_segments = min(len(stats), len(higuchi_stats))
+    stats = stats.rows(0, num_segments)
+    higuchi_stats = higuchi_stats.rows(0, num_segments)
+    return {
+        'range': stats['range'],
+        'ref_diff': np.abs(stats['mean'] - stats['blood_val']),
+        'higuchi_mean': higuchi_mean(higuchi_stats),
+        'higuchi_slope': higuchi_stats['slope']
+    }
+
+def classify_segments(features, params=None):
+    """
+    Classify all segments at once with threshold rules
+
+    Thresholds may be scalars or arrays of shape (P, 1) to evaluate P
+    parameter sets in one call.
+
+    Parameters:
+    - features: Dictionary from estimator_features
+    - params: Threshold dictionary (defaults to DEFAULT_EST_PARAMS)
+
+    Returns:
+    - int8 state codes, shape (num_segments,) or (P, num_segments)
+    """
+    p = dict(DEFAULT_EST_PARAMS, **(params or {}))
+    seg_range = features['range']
+    ref_diff = features['ref_diff']
+
+    is_blood = (seg_range <= p['blood_range']) & (ref_diff <= p['blood_ref_diff'])
+
+    # First matching rule wins
+    conditions = [
+        seg_range > p['step_range'],
+        ref_diff > p['wall_ref_diff'],
+        (ref_diff > p['clot_ref_diff']) & (features['higuchi_slope'] > p['clot_slope']),
+        is_blood & (features['higuchi_mean'] > p['blood2_higuchi_mean']),
+        is_blood
+    ]
+    choices = [STEP, WALL, CLOT, BLOOD2, BLOOD1]
+    conditions = np.broadcast_arrays(*conditions)
+
+    return np.select(conditions, choices, default=UNKNOWN).astype(np.int8)
+
+def estimate_states(stats, higuchi_stats, num_tags=None, params=None):
+    """
+    Estimate the state of every segment of a recording
+
+    Parameters:
+    - stats: Stats table from calculate_segment_stats
+    - higuchi_stats: Higuchi table from calculate_higuchi_stats
+    - num_tags: Length of tag_state; segments without features are Unknown
+    - params: Threshold dictionary (defaults to DEFAULT_EST_PARAMS)
+
+    Returns:
+    - int8 estimated-state track
+    """
+    est = classify_segments(estimator_features(stats, higuchi_stats), params)
+    if num_tags is not None and num_tags != len(est):
+        padded = np.full(num_tags, UNKNOWN, dtype=np.int8)
+        padded[:min(num_tags, len(est))] = est[:num_tags]
+        est = padded
+    return est
+
+def confusion_matrix(true_states, est_states, num_states=NUM_STATES):
+    """
+    Count (true, estimated) state pairs
+
+    Returns:
+    - (num_states, num_states) int array; rows are true states, columns estimates
+    """
+    num = min(len(true_states), len(est_states))
+    true_codes = np.asarray(true_states[:num]).astype(np.int64)
+    est_codes = np.asarray(est_states[:num]).astype(np.int64)
+
+    # Ignore codes outside the state table
+    valid = (true_codes >= 0) & (true_codes < num_states) & (est_codes >= 0) & (est_codes < num_states)
+    counts = np.bincount(true_codes[valid] * num_states + est_codes[valid], minlength=num_states * num_states)
+    return counts.reshape(num_states, num_states)
+
+def confusion_metrics(confusion):
+    """
+    Accuracy, balanced accuracy and Cohen's kappa for stacked confusion matrices
+
+    Parameters:
+    - confusion: (..., S, S) counts
+
+    Returns:
+    - Dictionary of arrays with the leading shape of confusion
+    """
+    total = confusion.sum(axis=(-2, -1)).astype(np.float64)
+    correct = np.trace(confusion, axis1=-2, axis2=-1)
+    true_counts = confusion.sum(axis=-1)
+    est_counts = confusion.sum(axis=-2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        accuracy = correct / total
+        recall = np.diagonal(confusion, axis1=-2, axis2=-1) / true_counts
+        balanced = np.nanmean(np.where(true_counts > 0, recall, np.nan), axis=-1)
+        expected = (true_counts * est_counts).sum(axis=-1) / total**2
+        kappa = (accuracy - expected) / (1.0 - expected)
+
+    return {'accuracy': accuracy, 'balanced_accuracy': balanced, 'kappa': kappa}
+
+def format_confusion(matrix, state_names):
+    """
+    Render a confusion matrix as a fixed-width text table with per-state recall
+
+    Parameters:
+    - matrix: Output of confusion_matrix
+    - state_names: Names in state-code order
+    """
+    width = max(8, max(len(name) for name in state_names) + 1)
+    lines = ["true \\ est".ljust(width) + "".join(name.rjust(width) for name in state_names) + "recall".rjust(width)]
+    for code, name in enumerate(state_names):
+        row = matrix[code]
+        recall = row[code] / row.sum() if row.sum() else float('nan')
+        lines.append(name.ljust(width) + "".join(str(v).rjust(width) for v in row) + f"{recall:{width}.2f}")
+
+    accuracy = np.trace(matrix) / max(matrix.sum(), 1)
+    lines.append("")
+    lines.append(f"Accuracy: {accuracy:.3f} over {matrix.sum()} segments")
+    return "\n".join(lines)
\ No newline at end of file
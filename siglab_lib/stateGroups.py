@@ -0,0 +1,181 @@
+# siglab_lib/stateGroups.py
+import numpy as np
+from siglab_lib.calcStats import STATS_COLUMNS
+from siglab_lib.stateEst import NUM_STATES, estimator_features
+
+# Quantiles reported per state and feature
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+class StateGroups:
+    def __init__(self, states, num_states=NUM_STATES):
+        """
+        Segments grouped by state with one stable sort
+
+        Every per-state view (indices, reductions, quantiles) is a slice of
+        the same sorted order, so the cost does not grow with the number of
+        states. Codes outside 0..num_states-1 belong to no group.
+
+        Parameters:
+        - states: Per-segment state codes
+        - num_states: Size of the state table
+        """
+        states = np.asarray(states).astype(np.int64)
+        self.num_states = num_states
+        self.order = np.argsort(states, kind='stable')
+        self.bounds = np.searchsorted(states[self.order], np.arange(num_states + 1))
+        self.counts = np.diff(self.bounds)
+
+    def indices(self, state):
+        """Segment indices of one state, ascending"""
+        if not 0 <= state < self.num_states:
+            return self.order[:0]
+        return self.order[self.bounds[state]:self.bounds[state + 1]]
+
+    def thinned_indices(self, states, max_points):
+        """
+        Segment indices of several states, thinned to a shared point budget
+
+        Each state gets a share of max_points proportional to its segment
+        count, and at least one point, so rare states stay visible.
+
+        Parameters:
+        - states: State codes wanted
+        - max_points: Total point budget (None keeps every segment)
+
+        Returns:
+        - {state code: indices}
+        """
+        indices = {state: self.indices(state) for state in states}
+        total = sum(len(index) for index in indices.values())
+        if max_points is None or total <= max_points:
+            return indices
+
+        thinned = {}
+        for state, index in indices.items():
+            budget = max(1, int(max_points * len(index) / total))
+            if len(index) > budget:
+                index = index[np.linspace(0, len(index) - 1, budget).astype(np.int64)]
+            thinned[state] = index
+        return thinned
+
+    def summarize(self, columns, quantiles=DEFAULT_QUANTILES):
+        """
+        Count, mean, std, min, max and quantiles of every column per state
+
+        All columns are gathered into one state-sorted (columns, segments)
+        array and reduced per state with reduceat; non-finite values are
+        left out of every statistic.
+
+        Parameters:
+        - columns: {name: per-segment array} (at least as long as the states)
+        - quantiles: Quantiles to report
+
+        Returns:
+        - Dictionary with columns (names), quantiles, and (columns, num_states)
+          arrays n, mean, std, min, max plus a (columns, num_states, len(quantiles))
+          array of quantiles; statistics of states without values are NaN
+        """
+        names = list(columns)
+        first = self.bounds[0]
+        rows = self.order[first:self.bounds[-1]]
+        values = np.vstack([np.asarray(columns[name], dtype=np.float64)[rows] for name in names])
+        finite = np.isfinite(values)
+
+        # Group of every sorted value and the start of each non-empty group
+        group = np.repeat(np.arange(self.num_states), self.counts)
+        present = np.flatnonzero(self.counts)
+        starts = self.bounds[present] - first
+
+        def per_state(reduced, empty=np.nan):
+            result = np.full((len(names), self.num_states), empty)
+            result[:, present] = reduced
+            return result
+
+        n = per_state(np.add.reduceat(finite, starts, axis=1), 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = per_state(np.add.reduceat(np.where(finite, values, 0.0), starts, axis=1)) / n
+            deviation = np.where(finite, values - mean[:, group], 0.0)
+            std = np.sqrt(per_state(np.add.reduceat(deviation ** 2, starts, axis=1)) / n)
+        value_min = per_state(np.minimum.reduceat(np.where(finite, values, np.inf), starts, axis=1))
+        value_max = per_state(np.maximum.reduceat(np.where(finite, values, -np.inf), starts, axis=1))
+        value_min[n == 0] = np.nan
+        value_max[n == 0] = np.nan
+
+        # Quantiles by linear interpolation within each state's sorted values
+        # (non-finite values sort to the end of their state and are skipped)
+        q = np.asarray(quantiles, dtype=np.float64)
+        state_quantiles = np.full((len(names), self.num_states, len(q)), np.nan)
+        start = (self.bounds[:-1] - first)[:, np.newaxis]
+        for col in range(len(names)):
+            sorted_values = values[col][np.lexsort((np.where(finite[col], values[col], np.inf), group))]
+            count = n[col][:, np.newaxis]
+            position = q * np.maximum(count - 1, 0)
+            low = np.floor(position).astype(np.int64)
+            high = np.ceil(position).astype(np.int64)
+            if len(sorted_values):
+                low_values = sorted_values[np.clip(start + low, 0, len(sorted_values) - 1)]
+                high_values = sorted_values[np.clip(start + high, 0, len(sorted_values) - 1)]
+                interpolated = low_values + (position - low) * (high_values - low_values)
+                state_quantiles[col] = np.where(count > 0, interpolated, np.nan)
+
+        return {
+            'columns': names,
+            'quantiles': tuple(quantiles),
+            'n': n.astype(np.int64),
+            'mean': mean,
+            'std': std,
+            'min': value_min,
+            'max': value_max,
+            'quantile': state_quantiles
+        }
+
+def summarize_states(stats, higuchi_stats, tag_state, time_axis, quantiles=DEFAULT_QUANTILES):
+    """
+    Per-state summary of the segment stats and estimator features of one recording
+
+    Parameters:
+    - stats: Stats table from calculate_segment_stats
+    - higuchi_stats: Higuchi table from calculate_higuchi_stats
+    - tag_state: Labeled states
+    - time_axis: TimeAxis of the recording
+    - quantiles: Quantiles to report
+
+    Returns:
+    - StateGroups.summarize dictionary with counts and duration_S (per state) added
+    """
+    features = estimator_features(stats, higuchi_stats)
+    num = min(len(features['range']), len(tag_state))
+    columns = {name: stats[name][:num] for name in STATS_COLUMNS}
+    columns.update({name: features[name][:num] for name in ('ref_diff', 'higuchi_mean', 'higuchi_slope')})
+
+    groups = StateGroups(tag_state[:num])
+    summary = groups.summarize(columns, quantiles)
+    summary['counts'] = groups.counts
+    summary['duration_S'] = groups.counts * time_axis.samples_per_segment / time_axis.sample_rate_Hz
+    return summary
+
+def format_state_summary(summary, state_names):
+    """
+    Render a state summary as fixed-width text tables, one per column
+
+    Parameters:
+    - summary: Output of summarize_states
+    - state_names: Names in state-code order
+    """
+    width = max(10, max(len(name) for name in state_names) + 1)
+    total = max(summary['counts'].sum(), 1)
+    lines = ["state".ljust(width) + "segments".rjust(width) + "minutes".rjust(width) + "share".rjust(width)]
+    for code, name in enumerate(state_names):
+        lines.append(name.ljust(width) + f"{summary['counts'][code]:{width}d}"
+                     + f"{summary['duration_S'][code] / 60:{width}.1f}"
+                     + f"{summary['counts'][code] / total:{width}.1%}")
+
+    stat_names = ['mean', 'std', 'min'] + [f"q{q * 100:g}" for q in summary['quantiles']] + ['max']
+    for col, column in enumerate(summary['columns']):
+        lines.append("")
+        lines.append(column.ljust(width) + "".join(stat.rjust(width) for stat in stat_names))
+        for code, name in enumerate(state_names):
+            row = ([summary['mean'][col, code], summary['std'][col, code], summary['min'][col, code]]
+                   + list(summary['quantile'][col, code]) + [summary['max'][col, code]])
+            lines.append(name.ljust(width) + "".join(f"{value:{width}.3g}" for value in row))
+    return "\n".join(lines)
@@ -0,0 +1,180 @@
+# siglab_lib/streamCalc.py
+import numpy as np
+import h5py
+from siglab_lib.calcStats import STATS_COLUMNS, add_blood_stats, compute_segment_block_stats, init_blood_carry
+from siglab_lib.calcHiguchi import HIGUCHI_COLUMNS, calculate_higuchi_block
+from siglab_lib.featureTable import FeatureTable, create_table_dataset, append_table
+from siglab_lib.timeAxis import TimeAxis
+from siglab_lib.resample import PolyphaseResampler, resample_ratio
+
+# Rough working set per input sample: the float32 block, its lookback windows,
+# Higuchi temporaries and the float64 feature rows
+_WORKING_BYTES_PER_SAMPLE = 48
+
+def block_segments_for_memory(max_memory_mb, samples_per_sec):
+    """
+    Number of segments per block that keeps the working set under a memory cap
+
+    Parameters:
+    - max_memory_mb: Peak working memory allowed for one block, in MB
+    - samples_per_sec: Samples in one segment
+
+    Returns:
+    - Segments per block (at least 1)
+    """
+    bytes_per_segment = samples_per_sec * _WORKING_BYTES_PER_SAMPLE
+    return max(1, int(max_memory_mb * 2**20) // bytes_per_segment)
+
+def _analysis_axes(filepath, analysis_rate_Hz):
+    """Native time axis of a recording and the axis its features are computed on"""
+    with h5py.File(filepath, 'r') as f:
+        native_axis = TimeAxis.from_hdf5(f)
+
+    if analysis_rate_Hz is None or analysis_rate_Hz == native_axis.sample_rate_Hz:
+        return native_axis, native_axis
+
+    # Resampled recordings are treated as one continuous run
+    up, down = resample_ratio(native_axis.sample_rate_Hz, analysis_rate_Hz)
+    return native_axis, TimeAxis(native_axis.start, analysis_rate_Hz,
+                                 -(-native_axis.num_samples * up // down))
+
+def analysis_time_axis(filepath, analysis_rate_Hz=None):
+    """
+    Time axis the features of a recording are computed on
+
+    Parameters:
+    - filepath: Path to the .f5b file
+    - analysis_rate_Hz: Common analysis rate, or None to use the file's own rate
+
+    Returns:
+    - TimeAxis
+    """
+    return _analysis_axes(filepath, analysis_rate_Hz)[1]
+
+def _iter_resampled(magR, rate_in, rate_out, chunk_samples):
+    """Stream a dataset through the polyphase resampler"""
+    resampler = PolyphaseResampler(rate_in, rate_out)
+    for start in range(0, magR.shape[0], chunk_samples):
+        yield resampler.process(magR[start:start + chunk_samples])
+    yield resampler.flush()
+
+def iter_signal_blocks(filepath, block_segments, analysis_rate_Hz=None):
+    """
+    Read a recording as segment-aligned blocks without loading the whole signal
+
+    Parameters:
+    - filepath: Path to the .f5b file
+    - block_segments: Number of 1-second segments per block
+    - analysis_rate_Hz: Resample onto this rate on the fly (None keeps the file rate)
+
+    Yields:
+    - (first_segment, magR_block, segment_time_block)
+    """
+    native_axis, time_axis = _analysis_axes(filepath, analysis_rate_Hz)
+    samples_per_sec = time_axis.samples_per_segment
+    num_segments = time_axis.num_samples // samples_per_sec
+    block_samples = block_segments * samples_per_sec
+
+    with h5py.File(filepath, 'r') as f:
+        magR = f['signal/magR']
+
+        if time_axis is native_axis:
+            # Native rate: read each block straight from the file
+            chunks = (magR[start:start + block_samples]
+                      for start in range(0, num_segments * samples_per_sec, block_samples))
+        else:
+            # Resampled: feed input chunks of about one block's duration
+            rate_in = native_axis.sample_rate_Hz
+            chunk_samples = max(1, int(block_segments * rate_in))
+            chunks = _iter_resampled(magR, rate_in, analysis_rate_Hz, chunk_samples)
+
+        # Re-cut the chunk stream into whole-segment blocks
+        pending = np.zeros(0, dtype=magR.dtype)
+        seg_start = 0
+        for chunk in chunks:
+            pending = np.concatenate([pending, chunk])
+            while len(pending) >= block_samples and seg_start < num_segments:
+                block, pending = pending[:block_samples], pending[block_samples:]
+                yield (seg_start, block,
+                       time_axis.segment_to_time(np.arange(seg_start, seg_start + block_segments)))
+                seg_start += block_segments
+
+        # Remaining whole segments
+        seg_end = min(seg_start + len(pending) // samples_per_sec, num_segments)
+        if seg_end > seg_start:
+            yield (seg_start, pending[:(seg_end - seg_start) * samples_per_sec],
+                   time_axis.segment_to_time(np.arange(seg_start, seg_end)))
+
+def _create_feature_datasets(dst):
+    """Create resizable feature datasets in the output file"""
+    chunk = 4096
+    return {
+        'stats': create_table_dataset(dst, 'stats', STATS_COLUMNS, chunk_rows=chunk),
+        'higuchi': create_table_dataset(dst, 'higuchi', HIGUCHI_COLUMNS, chunk_rows=chunk),
+        'time': dst.create_dataset('time_S', shape=(0,), maxshape=(None,), dtype='f8', chunks=(chunk,))
+    }
+
+def stream_features(filepath, out_path, max_memory_mb=64, analysis_rate_Hz=None, progress=None):
+    """
+    Compute segment stats, blood estimates and Higuchi statistics out of core
+
+    The recording is processed in segment-aligned blocks; lookback samples and
+    the blood tracker state are carried between blocks, so the results match
+    calculate_segment_stats / calculate_higuchi_stats on the full arrays.
+
+    Parameters:
+    - filepath: Source .f5b file
+    - out_path: HDF5 file that receives the features as they are computed
+    - max_memory_mb: Peak working memory for one block, independent of recording length
+    - analysis_rate_Hz: Resample onto this common rate first (None keeps the file rate)
+    - progress: Optional callback(segments_done, total_segments)
+
+    Returns:
+    - Number of segments written
+    """
+    time_axis = analysis_time_axis(filepath, analysis_rate_Hz)
+    samples_per_sec = time_axis.samples_per_segment
+    block_segments = block_segments_for_memory(max_memory_mb, samples_per_sec)
+    total_segments = time_axis.num_samples // samples_per_sec
+
+    blood_carry = init_blood_carry()
+    higuchi_carry = None
+    done = 0
+
+    with h5py.File(out_path, 'w') as dst:
+        dst.attrs['source'] = str(filepath)
+        dst.attrs['samples_per_sec'] = samples_per_sec
+        dst.attrs['sample_rate_Hz'] = time_axis.sample_rate_Hz
+        dsets = _create_feature_datasets(dst)
+
+        for seg_start, block, seg_time in iter_signal_blocks(filepath, block_segments, analysis_rate_Hz):
+            segments = block.reshape(-1, samples_per_sec)
+            stats = add_blood_stats(compute_segment_block_stats(segments), blood_carry)
+            higuchi_stats, higuchi_carry = calculate_higuchi_block(block, samples_per_sec, higuchi_carry)
+
+            append_table(dsets['stats'], stats)
+            append_table(dsets['higuchi'], higuchi_stats)
+            start = dsets['time'].shape[0]
+            dsets['time'].resize(start + len(seg_time), axis=0)
+            dsets['time'][start:] = seg_time
+            dst.flush()
+
+            done = seg_start + len(segments)
+            if progress is not None:
+                progress(done, total_segments)
+
+    return done
+
+def load_feature_file(out_path):
+    """
+    Load features written by stream_features
+
+    Parameters:
+    - out_path: Feature file path
+
+    Returns:
+    - stats: Stats table (STATS_COLUMNS)
+    - higuchi_stats: Higuchi table (HIGUCHI_COLUMNS)
+    """
+    with h5py.File(out_path, 'r') as f:
+        return FeatureTable.load(f['stats']), FeatureTable.load(f['higuchi'])
@@ -0,0 +1,179 @@
+# siglab_lib/timeAxis.py
+import numpy as np
+
+# Samples of time_S read at once while scanning for discontinuities
+_SCAN_CHUNK = 1 << 20
+
+def scan_gaps(time_S, sample_rate_Hz, start=0, stop=None):
+    """
+    Find the discontinuities of a stored time array in chunks
+
+    Parameters:
+    - time_S: Time dataset or array
+    - sample_rate_Hz: Sampling rate
+    - start, stop: Sample range to scan (a gap at start itself is not reported)
+
+    Returns:
+    - List of (sample_index, time_S) where a new uniform run starts
+    """
+    stop = time_S.shape[0] if stop is None else stop
+    if stop - start < 2:
+        return []
+
+    # A step counts as a gap when it is off by more than half a sample,
+    # or by more than the stored precision can resolve for long recordings
+    t_last = abs(float(time_S[stop - 1]))
+    tolerance = max(0.5 / sample_rate_Hz, 4 * float(np.spacing(time_S.dtype.type(t_last))))
+
+    gaps = []
+    for chunk_start in range(start, stop - 1, _SCAN_CHUNK):
+        chunk = time_S[chunk_start:min(chunk_start + _SCAN_CHUNK + 1, stop)].astype(np.float64)
+        steps = np.diff(chunk)
+        for j in np.flatnonzero(np.abs(steps - 1.0 / sample_rate_Hz) > tolerance):
+            gaps.append((chunk_start + j + 1, chunk[j + 1]))
+    return gaps
+
+class TimeAxis:
+    def __init__(self, t0, sample_rate_Hz, num_samples, gaps=None, segment_S=1.0):
+        """
+        Uniformly sampled time axis with optional discontinuities
+
+        Parameters:
+        - t0: Time of the first sample (s)
+        - sample_rate_Hz: Sampling rate
+        - num_samples: Number of samples
+        - gaps: Optional sequence of (sample_index, time_S) where a new uniform run starts
+        - segment_S: Analysis segment length (s)
+        """
+        self.sample_rate_Hz = float(sample_rate_Hz)
+        self.num_samples = int(num_samples)
+        self.samples_per_segment = int(round(self.sample_rate_Hz * segment_S))
+
+        # Table of uniform runs: first sample index and its time
+        runs = [(0, float(t0))] + [(int(i), float(t)) for i, t in (gaps if gaps is not None else [])]
+        self.run_start = np.array([i for i, _ in runs], dtype=np.int64)
+        self.run_t0 = np.array([t for _, t in runs], dtype=np.float64)
+
+        self._segment_times = None
+
+    @classmethod
+    def from_hdf5(cls, f):
+        """
+        Build the time axis of an open .f5b file
+
+        Reads signal/sample_rate_Hz and scans signal/time_S in chunks for
+        discontinuities; the time array itself is not kept.
+
+        Parameters:
+        - f: Open h5py.File
+        """
+        time_S = f['signal/time_S']
+        num_samples = time_S.shape[0]
+
+        if 'signal/sample_rate_Hz' in f:
+            sample_rate_Hz = float(f['signal/sample_rate_Hz'][()])
+        else:
+            sample_rate_Hz = 1.0 / float(np.median(np.diff(time_S[:min(num_samples, 1024)])))
+
+        if num_samples == 0:
+            return cls(0.0, sample_rate_Hz, 0)
+
+        return cls(float(time_S[0]), sample_rate_Hz, num_samples, scan_gaps(time_S, sample_rate_Hz))
+
+    @property
+    def num_segments(self):
+        """Number of segments, counting a trailing partial segment"""
+        return -(-self.num_samples // self.samples_per_segment)
+
+    @property
+    def start(self):
+        return float(self.run_t0[0])
+
+    @property
+    def end(self):
+        """Time of the last sample"""
+        return float(self.index_to_time(max(self.num_samples - 1, 0)))
+
+    def _run_of_index(self, index):
+        return np.searchsorted(self.run_start, index, side='right') - 1
+
+    def index_to_time(self, index):
+        """
+        Time of sample index (scalar or array)
+        """
+        index = np.asarray(index)
+        if len(self.run_start) == 1:
+            return self.run_t0[0] + index / self.sample_rate_Hz
+        run = self._run_of_index(index)
+        return self.run_t0[run] + (index - self.run_start[run]) / self.sample_rate_Hz
+
+    def time_to_index(self, time_S, side='left'):
+        """
+        Sample index for a time (scalar or array)
+
+        Parameters:
+        - time_S: Time(s) in seconds
+        - side: 'left' gives the first sample at or after the time,
+                'right' the last sample at or before it
+
+        Returns:
+        - Sample index, clipped to the recording
+        """
+        time_S = np.asarray(time_S, dtype=np.float64)
+        run = np.maximum(np.searchsorted(self.run_t0, time_S, side='right') - 1, 0)
+        run_end = np.append(self.run_start[1:], self.num_samples)[run]
+
+        # Tolerance of 1/100 sample so times that land on a sample (within
+        # float32 storage precision) map to that sample
+        offset = (time_S - self.run_t0[run]) * self.sample_rate_Hz
+        if side == 'left':
+            offset = np.ceil(offset - 1e-2)
+        else:
+            offset = np.floor(offset + 1e-2)
+
+        index = self.run_start[run] + offset.astype(np.int64)
+
+        # Times inside a gap belong to the next run ('left') or the previous one ('right')
+        index = np.minimum(index, run_end if side == 'left' else run_end - 1)
+        index = np.maximum(index, self.run_start[run] if side == 'left' else -1)
+        return np.clip(index, -1, self.num_samples)
+
+    def index_to_segment(self, index):
+        return np.asarray(index) // self.samples_per_segment
+
+    def segment_to_time(self, segment):
+        """Start time of segment(s)"""
+        return self.index_to_time(np.asarray(segment) * self.samples_per_segment)
+
+    def segment_range(self, tmin, tmax):
+        """
+        Segments whose start time lies in [tmin, tmax]
+
+        Returns:
+        - (first, end) segment indices for slicing tag_state[first:end]
+        """
+        first_sample = int(self.time_to_index(tmin, side='left'))
+        last_sample = int(self.time_to_index(tmax, side='right'))
+
+        first = -(-first_sample // self.samples_per_segment)
+        end = min(last_sample // self.samples_per_segment + 1, self.num_segments)
+        return first, max(first, end)
+
+    def times(self, start=0, stop=None, step=1):
+        """
+        Materialize sample times for a slice of the recording
+
+        Returns:
+        - float64 array, same as time_S[start:stop:step]
+        """
+        return self.index_to_time(np.arange(*slice(start, stop, step).indices(self.num_samples)))
+
+    def segment_times(self):
+        """
+        Start time of every segment (same as time_S[::samples_per_segment])
+
+        The array is built on first use and reused afterwards.
+        """
+        if self._segment_times is None:
+            self._segment_times = self.times(step=self.samples_per_segment)
+        return self._segment_times
\ No newline at end of file
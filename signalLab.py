@@ -12,6 +12,7 @@ from siglab_lib.mainWinSupport import InteractionModes, ToolbarUtils
 from siglab_lib.fileIO import FileOperations
 from siglab_lib.mainWinPlot import MainWindowPlotter
 from siglab_lib.calcStats import calculate_segment_stats
+from siglab_lib.stateEst import STATE_COLORS
 from siglab_lib.externalPlot import create_stats_plot, create_higuchi_plot
 
 # Add library path
@@ -19,6 +20,9 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 lib_path = os.path.join(current_dir, 'siglab_lib')
 sys.path.insert(0, lib_path)
 
+# Interval at which partial feature results are published to open plots
+PROGRESS_POLL_MS = 300
+
 class SignalLab:
     def __init__(self, root):
         # Window setup
@@ -30,19 +34,27 @@ class SignalLab:
         # Data storage
         self.filepath = None
         self.magR = None
-        self.time_S = None
+        self.time_axis = None
         self.tag_state = None
         self.stats = None
+        self.higuchi_stats = None
+        self.state_est = None
+        self.overview = None
+        self.compare_state = None
+        self.disagreement_span = None
+        self.cohort_sketches = None
+        self.feature_index = None
+        self.feature_query = "range > 80 and higuchi_slope < -1.2 and state == Blood1"
+        self.hit_span = None
+        self.progressive = {}
+        self.progress_listeners = []
+        self.progress_polling = False
+        self.labels_dirty = False
+        self.journal = None
+        self.session = None
 
         # State colors
-        self.state_colors = {
-            0: {'name': 'Unknown', 'color': 'gray', 'label_color': 'white'},
-            1: {'name': 'Blood1', 'color': 'green', 'label_color': 'white'},
-            2: {'name': 'Blood2', 'color': 'cyan', 'label_color': 'black'},
-            3: {'name': 'Wall', 'color': 'blue', 'label_color': 'white'},
-            4: {'name': 'Clot', 'color': 'orange', 'label_color': 'black'},
-            5: {'name': 'Step', 'color': 'black', 'label_color': 'white'}
-        }
+        self.state_colors = STATE_COLORS
 
         # Create toolbar/plot_utils/canvas
         self.file_ops = FileOperations(self)
@@ -65,17 +77,46 @@ class SignalLab:
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Open", command=self.file_ops.open_file)
+        file_menu.add_command(label="Open Session Folder", command=self._open_session)
+        file_menu.add_command(label="Next File", command=self._next_session_file)
         file_menu.add_command(label="Save", command=self.file_ops.save_file)
         file_menu.add_command(label="Save As", command=self.file_ops.save_as_file)
+        self.compress_save_as = tk.BooleanVar(value=False)
+        file_menu.add_checkbutton(label="Compress on Save As", variable=self.compress_save_as)
+        self.fast_open = tk.BooleanVar(value=False)
+        file_menu.add_checkbutton(label="Fast Open (memory-mapped sidecar)", variable=self.fast_open)
+        self.build_overview = tk.BooleanVar(value=False)
+        file_menu.add_checkbutton(label="Build Overview on Save", variable=self.build_overview)
+        file_menu.add_command(label="Revert to Saved", command=self.file_ops.revert_file)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
 
+        # Edit Menu
+        edit_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Edit", menu=edit_menu)
+        # (interaction_modes is created after the menu bar, so look it up on use)
+        edit_menu.add_command(label="Undo", accelerator="Ctrl+Z",
+                              command=lambda: self.interaction_modes.undo_state_edit())
+        edit_menu.add_command(label="Redo", accelerator="Ctrl+Y",
+                              command=lambda: self.interaction_modes.redo_state_edit())
+        self.root.bind_all('<Control-z>', lambda event: self.interaction_modes.undo_state_edit())
+        self.root.bind_all('<Control-y>', lambda event: self.interaction_modes.redo_state_edit())
+
         # Calculate Menu (existing code remains the same)
         calc_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Calc", menu=calc_menu)
         calc_menu.add_command(label="Stats", command=self._calculate_stats)
         calc_menu.add_command(label="Higuchi", command=self._calculate_higuchi)
         calc_menu.add_command(label="All", command=self._calculate_all)
+        calc_menu.add_command(label="Estimate States", command=self._estimate_states)
+        calc_menu.add_command(label="State Summary", command=self._state_summary)
+        calc_menu.add_separator()
+        calc_menu.add_command(label="Load Comparison Labels", command=self._load_comparison_labels)
+        calc_menu.add_command(label="Next Disagreement", accelerator="Ctrl+D", command=self._next_disagreement)
+        self.root.bind_all('<Control-d>', lambda event: self._next_disagreement())
+        calc_menu.add_separator()
+        calc_menu.add_command(label="Load Feature Index", command=self._load_feature_index)
+        calc_menu.add_command(label="Feature Query", command=self._feature_query)
 
         # Time-Plot Menu (renamed from Plot)
         time_plot_menu = tk.Menu(menubar, tearoff=0)
@@ -88,6 +129,10 @@ class SignalLab:
         menubar.add_cascade(label="Scatter-Plot", menu=scatter_plot_menu)
         scatter_plot_menu.add_command(label="Higuchi", command=self._scatter_plot_higuchi)
         scatter_plot_menu.add_command(label="Range Vs BloodRefDiff", command=self._scatter_plot_range_bloodref)
+        scatter_plot_menu.add_command(label="Higuchi Sweep", command=self._scatter_plot_higuchi_sweep)
+        scatter_plot_menu.add_separator()
+        scatter_plot_menu.add_command(label="State Distributions", command=self._plot_state_distributions)
+        scatter_plot_menu.add_command(label="Load Cohort Sketches", command=self._load_cohort_sketches)
 
 
     def create_toolbar_buttons(self, toolbar):
@@ -117,16 +162,12 @@ class SignalLab:
             btn.pack(side=tk.LEFT, padx=5, pady=5)
             
     def _calculate_stats(self):
-        """Calculate and store signal statistics"""
-        from siglab_lib.calcStats import calculate_segment_stats       
-        # Calculate comprehensive statistics
-        self.stats = calculate_segment_stats(self)      
-        #print("bloodEstVal:", *[int(val) for val in self.stats['bloodEstVal'][:30]])
-        #print("bloodEstRng:", *[int(val) for val in self.stats['bloodEstRng'][:30]])
-        
+        """Calculate segment statistics progressively, visible range first"""
+        self._start_progressive('stats')
+
     def _plot_stats(self):
         """Launch external stats plot"""
-        if self.stats is None:
+        if self.stats is None and 'stats' not in self.progressive:
             tk.messagebox.showinfo("Stats Plot", "Please calculate stats first using Calc > Stats")
             return
         
@@ -134,18 +175,263 @@ class SignalLab:
         create_stats_plot(self)
 
     def _calculate_higuchi(self):
-        """Calculate and store Higuchi Fractal Dimension statistics"""
+        """Calculate Higuchi Fractal Dimension statistics progressively, visible range first"""
+        self._start_progressive('higuchi_stats')
+
+    def _start_progressive(self, kind):
+        """
+        Compute a feature table in the background, starting with the visible range
+
+        Parameters:
+        - kind: App attribute that receives the finished table ('stats' or 'higuchi_stats')
+        """
+        from siglab_lib.progressiveCalc import ProgressiveStats, ProgressiveHiguchi
+
+        if self.magR is None:
+            tk.messagebox.showinfo("Calc", "Please open a file first using File > Open")
+            return
+        if getattr(self, kind) is not None or kind in self.progressive:
+            return
+
+        # Another instance may already have computed it through the feature service
+        from siglab_lib.featureService import peek_features
+        table = peek_features(self.filepath, kind)
+        if table is not None:
+            setattr(self, kind, table)
+            print(f"{kind} from feature service")
+            return
+
+        progressive = {'stats': ProgressiveStats, 'higuchi_stats': ProgressiveHiguchi}[kind](self.magR, self.time_axis)
+        progressive.focus(*self.time_axis.segment_range(*self.ax.get_xlim()))
+        self.progressive[kind] = progressive.start()
+        if not self.progress_polling:
+            self.progress_polling = True
+            self.root.after(PROGRESS_POLL_MS, self._poll_progressive)
+
+    def _poll_progressive(self):
+        """Publish partial feature results to open plots and store finished tables"""
+        for kind, progressive in list(self.progressive.items()):
+            if progressive.done:
+                self._store_progressive(kind)
+            else:
+                self._publish_progress(progressive)
+
+        self.progress_polling = bool(self.progressive)
+        if self.progress_polling:
+            self.root.after(PROGRESS_POLL_MS, self._poll_progressive)
+
+    def _publish_progress(self, progressive):
+        """Redraw the plots that follow a progressive computation"""
+        for listener_progressive, update in list(self.progress_listeners):
+            if listener_progressive is progressive:
+                update()
+
+    def _store_progressive(self, kind):
+        """Wait for a progressive computation and keep its table"""
+        progressive = self.progressive.pop(kind)
+        setattr(self, kind, progressive.wait())
+        self._publish_progress(progressive)
+        print(f"{kind} calculated")
+
+        # Cache the table in the sidecar so the next fast open has it
+        if self.fast_open.get():
+            from siglab_lib.fastOpen import store_features
+            store_features(self.filepath, kind, getattr(self, kind))
+
+        # Share it with other instances through the feature service, if one is running
+        from siglab_lib.featureService import put_features
+        put_features(self.filepath, kind, getattr(self, kind))
+
+    def _finish_features(self):
+        """Complete progressive feature computations before whole-recording analysis"""
+        if not self.progressive:
+            return
+
+        # Waiting blocks the event loop, so show it before the wait starts
+        title = self.root.title()
+        self.root.title(f"{title} - finishing feature calculation...")
+        self.root.config(cursor='watch')
+        self.root.update_idletasks()
+        try:
+            for kind in list(self.progressive):
+                self._store_progressive(kind)
+        finally:
+            self.root.config(cursor='')
+            self.root.title(title)
+
+    def _estimate_states(self):
+        """Estimate states for all segments, overlay them and compare with the labels"""
+        from siglab_lib.calcStats import calculate_segment_stats
         from siglab_lib.calcHiguchi import calculate_higuchi_stats
-        
-        # Calculate Higuchi statistics
-        self.higuchi_stats = calculate_higuchi_stats(self.magR, self.time_S)
-        
-        # Optional: Print some stats
-        print("Higuchi Fractal Dimension statistics calculated")
+        from siglab_lib.stateEst import estimate_states
+        from siglab_lib.externalPlot import create_confusion_window
+
+        if self.magR is None:
+            tk.messagebox.showinfo("Estimate States", "Please open a file first using File > Open")
+            return
+
+        self._finish_features()
+        # Features the rules work on
+        if self.stats is None:
+            self.stats = calculate_segment_stats(self)
+        if self.higuchi_stats is None:
+            self.higuchi_stats = calculate_higuchi_stats(self.magR, self.time_axis)
+
+        self.state_est = estimate_states(self.stats, self.higuchi_stats, num_tags=len(self.tag_state))
+        self.plot_utils.plot_data(rescale=False)
+        create_confusion_window(self)
+
+    def _state_summary(self):
+        """Show per-state counts, durations and feature statistics"""
+        from siglab_lib.calcStats import calculate_segment_stats
+        from siglab_lib.calcHiguchi import calculate_higuchi_stats
+        from siglab_lib.externalPlot import create_state_summary_window
+
+        if self.magR is None:
+            tk.messagebox.showinfo("State Summary", "Please open a file first using File > Open")
+            return
+
+        self._finish_features()
+        # Features to summarize
+        if self.stats is None:
+            self.stats = calculate_segment_stats(self)
+        if self.higuchi_stats is None:
+            self.higuchi_stats = calculate_higuchi_stats(self.magR, self.time_axis)
+
+        create_state_summary_window(self)
+
+    def _load_comparison_labels(self):
+        """Load another annotator's labels of the current recording for comparison"""
+        from tkinter import filedialog
+        from siglab_lib.labelCompare import load_labels, compare_labels
+
+        if self.tag_state is None:
+            messagebox.showinfo("Comparison Labels", "Please open a file first using File > Open")
+            return
+
+        filepath = filedialog.askopenfilename(title="Open Labeled Copy", filetypes=[("F5B files", "*.f5b")])
+        if not filepath:
+            return
+
+        try:
+            self.compare_state, _ = load_labels(filepath)
+        except Exception as e:
+            messagebox.showerror("Comparison Labels Error", str(e))
+            return
+
+        result = compare_labels(self.tag_state, self.compare_state)
+        messagebox.showinfo("Comparison Labels",
+                            f"Agreement {result['agreement']:.1%}, kappa {result['kappa']:.3f}\n"
+                            f"{len(result['intervals'])} disagreement intervals "
+                            f"({result['disagree_segments']} segments)")
+
+    def _next_disagreement(self):
+        """Center the main plot on the next interval where the labels disagree"""
+        from siglab_lib.labelCompare import disagreement_intervals
+
+        # Compare against loaded labels, else against the estimated states
+        other = self.compare_state if self.compare_state is not None else self.state_est
+        if self.tag_state is None or other is None:
+            messagebox.showinfo("Next Disagreement",
+                                "Load comparison labels (Calc > Load Comparison Labels) or estimate states first")
+            return
+
+        intervals = disagreement_intervals(self.tag_state, other)
+        if len(intervals) == 0:
+            messagebox.showinfo("Next Disagreement", "The labels agree everywhere")
+            return
+
+        # Step on from the highlighted interval, or start at the left edge of the view
+        xmin = self.ax.get_xlim()[0]
+        start_times = self.time_axis.segment_to_time(intervals[:, 0])
+        highlighted = self.disagreement_span is not None and self.disagreement_span in self.ax.patches
+        if highlighted:
+            later = np.flatnonzero(start_times > self.disagreement_span.get_x())
+        else:
+            later = np.flatnonzero(start_times >= xmin)
+        start, end = intervals[later[0] if len(later) else 0, :2]
+
+        t_start = self.time_axis.segment_to_time(start)
+        t_end = self.time_axis.segment_to_time(end - 1) + self.time_axis.samples_per_segment / self.time_axis.sample_rate_Hz
+
+        self._zoom_to_interval(t_start, t_end)
+
+        # Highlight the interval
+        if highlighted:
+            self.disagreement_span.remove()
+        self.disagreement_span = self.ax.axvspan(t_start, t_end, color='red', alpha=0.15, zorder=0)
+        self.canvas.draw_idle()
+
+    def _zoom_to_interval(self, t_start, t_end):
+        """Center the main plot on an interval, keeping the zoom level but close enough in to see it"""
+        xmin, xmax = self.ax.get_xlim()
+        width = max(min(xmax - xmin, max(600.0, 4 * (t_end - t_start))), 2 * (t_end - t_start))
+        self.ax.set_xlim((t_start + t_end - width) / 2, (t_start + t_end + width) / 2)
+
+    def _load_feature_index(self):
+        """Load a feature index built with signalLabBatch.py index"""
+        from tkinter import filedialog
+        from siglab_lib.featureIndex import FeatureIndex
+
+        filepath = filedialog.askopenfilename(title="Open Feature Index", filetypes=[("Index files", "*.h5")])
+        if not filepath:
+            return False
+        try:
+            self.feature_index = FeatureIndex.load(filepath)
+        except Exception as e:
+            messagebox.showerror("Feature Index Error", str(e))
+            return False
+        return True
+
+    def _feature_query(self):
+        """Find segments of the indexed recordings that match a feature query"""
+        from tkinter import simpledialog
+        from siglab_lib.externalPlot import create_query_window
+
+        if self.feature_index is None and not self._load_feature_index():
+            return
+
+        query = simpledialog.askstring("Feature Query", "Query (terms joined by 'and'):",
+                                       initialvalue=self.feature_query)
+        if not query:
+            return
+
+        try:
+            hits = self.feature_index.hits(self.feature_index.query(query))
+        except Exception as e:
+            messagebox.showerror("Feature Query Error", str(e))
+            return
+
+        self.feature_query = query
+        create_query_window(self, query, hits)
+
+    def _open_hit(self, hit):
+        """
+        Show a query hit in the main plot, opening its file if needed
+
+        Parameters:
+        - hit: Dictionary from FeatureIndex.hits
+        """
+        from siglab_lib.fileIO import load_recording
+
+        if self.filepath is None or os.path.abspath(self.filepath) != hit['file']:
+            if not self._offer_save("Open Hit", "Save labels before opening another file?"):
+                return
+            try:
+                self.file_ops.show_recording(load_recording(hit['file']))
+            except Exception as e:
+                messagebox.showerror("Open Hit Error", str(e))
+                return
+
+        self._zoom_to_interval(hit['start_S'], hit['end_S'])
+        if self.hit_span is not None and self.hit_span in self.ax.patches:
+            self.hit_span.remove()
+        self.hit_span = self.ax.axvspan(hit['start_S'], hit['end_S'], color='gold', alpha=0.25, zorder=0)
+        self.canvas.draw_idle()
 
     def _plot_higuchi(self):
         """Launch external Higuchi plot"""
-        if not hasattr(self, 'higuchi_stats') or self.higuchi_stats is None:
+        if self.higuchi_stats is None and 'higuchi_stats' not in self.progressive:
             tk.messagebox.showinfo("Higuchi Plot", "Please calculate Higuchi stats first using Calc > Higuchi")
             return
         
@@ -155,15 +441,123 @@ class SignalLab:
     def _scatter_plot_higuchi(self):
         """Launch Higuchi scatter plot"""
         from siglab_lib.scatterPlot import create_higuchi_scatter
+        self._finish_features()
         create_higuchi_scatter(self)
 
     def _scatter_plot_range_bloodref(self):
         """Launch Range vs Blood Reference Difference scatter plot"""
         from siglab_lib.scatterPlot import create_range_bloodref_scatter
+        self._finish_features()
         create_range_bloodref_scatter(self)
 
 
 
+    def _scatter_plot_higuchi_sweep(self):
+        """Launch Higuchi mean vs slope scatters for several window lengths and k-max values"""
+        from tkinter import simpledialog
+        from siglab_lib.scatterPlot import create_higuchi_sweep_scatter
+
+        if self.magR is None:
+            messagebox.showinfo("Higuchi Sweep", "Please open a file first using File > Open")
+            return
+
+        windows = simpledialog.askstring("Higuchi Sweep", "Window lengths (s):", initialvalue="1, 2, 4")
+        if not windows:
+            return
+        kmaxes = simpledialog.askstring("Higuchi Sweep", "k-max values:", initialvalue="3, 5, 8")
+        if not kmaxes:
+            return
+
+        try:
+            window_seconds = [float(value) for value in windows.replace(',', ' ').split()]
+            kmax_values = [int(value) for value in kmaxes.replace(',', ' ').split()]
+            create_higuchi_sweep_scatter(self, window_seconds, kmax_values)
+        except Exception as e:
+            messagebox.showerror("Higuchi Sweep Error", str(e))
+
+    def _plot_state_distributions(self):
+        """Launch per-state feature distribution plot"""
+        if self.magR is None:
+            tk.messagebox.showinfo("State Distributions", "Please open a file first using File > Open")
+            return
+        from siglab_lib.scatterPlot import create_state_distribution_plot
+        self._finish_features()
+        create_state_distribution_plot(self)
+
+    def _load_cohort_sketches(self):
+        """Load per-state feature sketches of a cohort for the distribution plot"""
+        from tkinter import filedialog
+        from siglab_lib.quantileSketch import FeatureSketches
+
+        filepath = filedialog.askopenfilename(title="Open State Sketches", filetypes=[("Sketch files", "*.h5")])
+        if not filepath:
+            return
+        try:
+            self.cohort_sketches = FeatureSketches.load(filepath)
+        except Exception as e:
+            messagebox.showerror("Cohort Sketches Error", str(e))
+
+    def _open_session(self):
+        """Start a labeling session over the .f5b files in a folder"""
+        from tkinter import filedialog
+        from siglab_lib.labelSession import LabelSession
+
+        folder = filedialog.askdirectory(title="Open Session Folder")
+        if not folder:
+            return
+
+        session = LabelSession.from_folder(folder)
+        if not session.file_list:
+            messagebox.showinfo("Session", f"No .f5b files found in {folder}")
+            session.close()
+            return
+
+        if self.session is not None:
+            self.session.close()
+        self.session = session
+        self._next_session_file()
+
+    def _offer_save(self, title, question):
+        """
+        Offer to save unsaved labels before leaving the current file
+
+        Declined edits are dropped from the journal, so they are not
+        recovered the next time the file is opened.
+
+        Returns:
+        - False when the user cancels
+        """
+        if not self.labels_dirty:
+            return True
+        answer = messagebox.askyesnocancel(title, question)
+        if answer is None:
+            return False
+        if answer:
+            self.file_ops.save_file()
+        elif self.journal is not None:
+            self.journal.discard()
+        return True
+
+    def _next_session_file(self):
+        """Switch to the next file of the session (prefetched in the background)"""
+        if self.session is None:
+            messagebox.showinfo("Next File", "Open a session folder first using File > Open Session Folder")
+            return
+        if not self.session.has_next():
+            messagebox.showinfo("Next File", "Last file of the session reached")
+            return
+
+        if not self._offer_save("Next File", "Save labels before moving to the next file?"):
+            return
+
+        try:
+            recording = self.session.next()
+            self.file_ops.show_recording(recording)
+            self.root.title(f"SignalLab - {os.path.basename(self.filepath)} "
+                            f"({self.session.index + 1}/{len(self.session.file_list)})")
+        except Exception as e:
+            messagebox.showerror("Next File Error", str(e))
+
     def _set_state_mode(self, state_val):
         # State selection mode
         pass
@@ -190,8 +584,9 @@ class SignalLab:
 
 
     def _calculate_all(self):
-        # Calculate all available metrics
-        pass
+        """Calculate all available metrics progressively"""
+        self._start_progressive('stats')
+        self._start_progressive('higuchi_stats')
 
 def main():
     root = tk.Tk()
@@ -0,0 +1,401 @@
+import argparse
+import json
+import os
+import sys
+
+def _stream(args):
+    """Compute features for a recording out of core"""
+    from siglab_lib.streamCalc import stream_features
+
+    out_path = args.output or os.path.splitext(args.file)[0] + '_features.h5'
+
+    def progress(done, total):
+        print(f"\r{done}/{total} segments", end='', flush=True)
+
+    num_segments = stream_features(args.file, out_path,
+                                   max_memory_mb=args.max_mb,
+                                   analysis_rate_Hz=args.analysis_rate,
+                                   progress=progress)
+    print(f"\n{num_segments} segments written to {out_path}")
+
+def _repack(args):
+    """Rewrite recordings with a chunked, compressed layout"""
+    from siglab_lib.repack import DEFAULT_LAYOUT, repack_file
+
+    layout = dict(DEFAULT_LAYOUT,
+                  chunk_seconds=args.chunk_seconds,
+                  compression=None if args.compression == 'none' else args.compression,
+                  compression_opts=args.level,
+                  shuffle=not args.no_shuffle)
+
+    for path in args.files:
+        dst_path = None
+        if args.output_dir:
+            dst_path = os.path.join(args.output_dir, os.path.basename(path))
+        try:
+            report = repack_file(path, dst_path, layout, overview=not args.no_overview)
+        except Exception as e:
+            print(f"{path}: {e}")
+            continue
+        print(f"{os.path.basename(path)}: "
+              f"{report['size_before_MB']:.1f} MB -> {report['size_after_MB']:.1f} MB "
+              f"({report['size_ratio']:.0%}), "
+              f"read {report['read_before_MBps']:.0f} -> {report['read_after_MBps']:.0f} MB/s ({report['read_cache']} cache)")
+
+def _overview(args):
+    """Build or extend the overview pyramid of recordings in place"""
+    from siglab_lib.overviewPyramid import write_overview
+
+    for path in args.files:
+        try:
+            covered = write_overview(path, args.factor)
+        except Exception as e:
+            print(f"{path}: {e}")
+            continue
+        print(f"{os.path.basename(path)}: overview covers {covered} samples")
+
+def _fastopen(args):
+    """Build the memory-mapped fast-open sidecar of recordings"""
+    from siglab_lib.fastOpen import build_sidecar, sidecar_is_current, sidecar_path, store_features
+    from siglab_lib.labelSession import load_recording_features
+
+    for path in args.files:
+        try:
+            if sidecar_is_current(path) and not args.force and not args.features:
+                print(f"{os.path.basename(path)}: sidecar is current")
+                continue
+            recording = load_recording_features(path) if args.features else None
+            build_sidecar(path, recording)
+            if args.features:
+                store_features(path, 'stats', recording['stats'])
+                store_features(path, 'higuchi_stats', recording['higuchi_stats'])
+        except Exception as e:
+            print(f"{path}: {e}")
+            continue
+        print(f"{os.path.basename(path)}: wrote {sidecar_path(path)}")
+
+def _feature_service(args):
+    """Run the shared feature service, or query / stop a running one"""
+    from siglab_lib.featureService import DEFAULT_CACHE_DIR, FeatureService, connect, service_address
+
+    address = service_address()
+    if args.status or args.stop:
+        client = connect(address)
+        if client is None:
+            print(f"No feature service at {address}")
+            return
+        with client:
+            if args.stop:
+                client.request('shutdown')
+                print("Feature service stopped")
+            else:
+                status = client.request('status')
+                print(f"{status['entries']} results in memory ({status['memory_mb']:.1f} MB), "
+                      f"{status['pending']} pending")
+                print(", ".join(f"{source}: {count}" for source, count in status['counts'].items()))
+        return
+
+    cache_dir = None if args.no_disk_cache else args.cache_dir or DEFAULT_CACHE_DIR
+    service = FeatureService(address, args.workers, cache_dir, args.memory_mb, args.disk_mb)
+    print(f"Feature service listening at {address} (Ctrl+C to stop)")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+def _sweep(args):
+    """Grid or random search of tracker/estimator thresholds over labeled files"""
+    from siglab_lib.paramSweep import (DEFAULT_SWEEP_SPACE, grid_configs, random_configs,
+                                       run_sweep, write_sweep_table)
+    from siglab_lib.report import expand_inputs
+
+    space = DEFAULT_SWEEP_SPACE
+    if args.space:
+        with open(args.space) as f:
+            # Two-element lists prefixed with "range" become uniform ranges
+            space = {name: tuple(values[1:]) if values and values[0] == 'range' else values
+                     for name, values in json.load(f).items()}
+
+    if args.random:
+        configs = random_configs(space, args.random, seed=args.seed)
+    else:
+        configs = grid_configs(space)
+
+    def progress(filepath, error):
+        print(f"{os.path.basename(filepath)}: {error or 'done'}")
+
+    rows = run_sweep(expand_inputs(args.inputs), configs, workers=args.workers,
+                     batch_size=args.batch_size, metric=args.metric, progress=progress)
+    if not rows:
+        print("No recordings evaluated")
+        return 1
+    write_sweep_table(rows, args.output)
+
+    for row in rows[:args.top]:
+        params = ", ".join(f"{name}={row[name]}" for name in configs[0])
+        print(f"{row['rank']:4d}  {args.metric}={row[args.metric]:.4f}  "
+              f"acc={row['accuracy']:.4f}  {row['seconds'] * 1000:.1f} ms  {params}")
+    print(f"{len(rows)} configurations ranked in {args.output}")
+
+def _compare(args):
+    """Compare label versions of many recordings"""
+    from siglab_lib.labelCompare import compare_cohort, sort_rows, write_rows
+
+    def progress(name, error):
+        if error:
+            print(f"{name}: {error}")
+
+    rows, intervals = compare_cohort(args.versions, datasets=args.datasets,
+                                     workers=args.workers, progress=progress)
+    if not rows:
+        print("No comparisons made")
+        return
+
+    rows = sort_rows(rows, args.sort, descending=args.descending)
+    write_rows(rows, args.output)
+    if args.intervals:
+        write_rows(intervals, args.intervals)
+
+    for row in rows[:args.top]:
+        print(f"{row['file']}  {row['version_a']} vs {row['version_b']}: "
+              f"agreement {row['agreement']:.3f}, kappa {row['kappa']:.3f}, "
+              f"{row['disagreements']} intervals, boundary offset {row['boundary_offset_mean']:.1f}")
+    print(f"{len(rows)} comparisons written to {args.output}")
+
+def _sketch(args):
+    """Build or extend per-state feature quantile sketches over many recordings"""
+    from siglab_lib.quantileSketch import FeatureSketches, build_cohort_sketches
+
+    sketches = None
+    if args.append and os.path.exists(args.output):
+        sketches = FeatureSketches.load(args.output)
+
+    def progress(filepath, error):
+        print(f"{os.path.basename(filepath)}: {error or 'done'}")
+
+    sketches = build_cohort_sketches(args.files, sketches, k=args.k, workers=args.workers, progress=progress)
+    sketches.save(args.output)
+    print(f"{len(sketches.files)} recordings sketched in {args.output}")
+
+def _quantiles(args):
+    """Print per-state feature quantiles from a sketch file"""
+    from siglab_lib.quantileSketch import FeatureSketches
+    from siglab_lib.stateEst import STATE_NAMES
+
+    sketches = FeatureSketches.load(args.sketches)
+    for feature in args.features or sketches.features:
+        quantiles = sketches.quantiles(feature, args.q)
+        print(f"\n{feature}")
+        print("state".ljust(10) + "count".rjust(10) + "".join(f"q{q:g}".rjust(10) for q in args.q))
+        for state, count in enumerate(sketches.counts(feature)):
+            print(STATE_NAMES[state].ljust(10) + str(count).rjust(10) +
+                  "".join(f"{value:10.2f}" for value in quantiles[state]))
+
+def _report(args):
+    """Render summary reports for recordings without a display"""
+    from siglab_lib.report import expand_inputs, render_reports
+
+    def progress(filepath, written, seconds, error):
+        status = error or ", ".join(os.path.basename(path) for path in written)
+        print(f"{os.path.basename(filepath)} ({seconds:.1f} s): {status}")
+
+    files = expand_inputs(args.inputs)
+    max_points = args.max_points if args.max_points > 0 else None
+    rendered = render_reports(files, args.output_dir, fmt=args.format, max_points=max_points,
+                              dpi=args.dpi, workers=args.workers, progress=progress)
+    print(f"{rendered}/{len(files)} reports written to {args.output_dir}")
+
+def _higuchi_sweep(args):
+    """Compute a Higuchi configuration cube for one recording"""
+    import h5py
+    from siglab_lib.fileIO import load_recording
+    from siglab_lib.calcHiguchi import SWEEP_FEATURES, higuchi_sweep
+
+    recording = load_recording(args.file)
+    configs, cube = higuchi_sweep(recording['magR'], recording['time_axis'], args.windows, args.kmax)
+
+    out_path = args.output or os.path.splitext(args.file)[0] + '_higuchi_sweep.h5'
+    with h5py.File(out_path, 'w') as f:
+        dset = f.create_dataset('cube', data=cube)
+        dset.attrs['window_seconds'] = [w for w, _ in configs]
+        dset.attrs['kmax'] = [kmax for _, kmax in configs]
+        dset.attrs['features'] = list(SWEEP_FEATURES)
+    print(f"{len(configs)} configurations x {cube.shape[2]} segments written to {out_path}")
+
+    if args.plot:
+        from matplotlib.figure import Figure
+        from siglab_lib.reportFigures import draw_higuchi_sweep
+        from siglab_lib.stateEst import STATE_COLORS
+
+        fig = Figure(figsize=(4 * len(args.kmax), 3.5 * len(args.windows)))
+        draw_higuchi_sweep(fig, configs, cube, recording['tag_state'], STATE_COLORS,
+                           os.path.basename(args.file), max_points=10000)
+        fig.tight_layout()
+        fig.savefig(args.plot)
+        print(f"Scatter grid written to {args.plot}")
+
+def _index(args):
+    """Build a feature index over labeled recordings"""
+    from siglab_lib.featureIndex import build_feature_index
+    from siglab_lib.report import expand_inputs
+
+    def progress(filepath, error):
+        if error:
+            print(f"{filepath}: {error}")
+
+    index = build_feature_index(expand_inputs(args.inputs), args.workers, progress)
+    index.save(args.output)
+    print(f"{len(index)} segments of {len(index.files)} recordings indexed in {args.output}")
+
+def _query(args):
+    """Find the time spans of indexed recordings that match a query"""
+    from siglab_lib.featureIndex import FeatureIndex
+    from siglab_lib.labelCompare import write_rows
+
+    index = FeatureIndex.load(args.index)
+    hits = index.hits(index.query(args.query))
+    print(f"{len(hits)} spans, {sum(hit['segments'] for hit in hits)} segments")
+    for hit in hits[:args.limit]:
+        print(f"{hit['file']}  {hit['start_S']:.1f} - {hit['end_S']:.1f} s  ({hit['segments']} seg)")
+    if args.output:
+        write_rows(hits, args.output)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="SignalLab batch tools")
+    parser.add_argument('--precision', choices=['float32', 'float64'], default='float32',
+                        help="Storage precision of computed features")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    # Out-of-core feature computation
+    stream_parser = subparsers.add_parser('stream', help="Compute features in bounded memory")
+    stream_parser.add_argument('file', help=".f5b recording")
+    stream_parser.add_argument('-o', '--output', help="Feature output file (default <file>_features.h5)")
+    stream_parser.add_argument('--max-mb', type=float, default=64,
+                               help="Peak working memory per block in MB")
+    stream_parser.add_argument('--analysis-rate', type=float, default=None,
+                               help="Resample onto this rate (Hz) before computing features")
+    stream_parser.set_defaults(func=_stream)
+
+    # Read-optimized repack
+    repack_parser = subparsers.add_parser('repack', help="Rewrite files chunked and compressed")
+    repack_parser.add_argument('files', nargs='+', help=".f5b recordings")
+    repack_parser.add_argument('-o', '--output-dir', help="Write repacked copies here (default: replace in place)")
+    repack_parser.add_argument('--chunk-seconds', type=int, default=600,
+                               help="Chunk length in seconds of signal")
+    repack_parser.add_argument('--compression', choices=['gzip', 'lzf', 'none'], default='gzip')
+    repack_parser.add_argument('--level', type=int, default=4, help="gzip level")
+    repack_parser.add_argument('--no-shuffle', action='store_true', help="Disable the shuffle filter")
+    repack_parser.add_argument('--no-overview', action='store_true', help="Do not write the overview pyramid")
+    repack_parser.set_defaults(func=_repack)
+
+    # Overview pyramid
+    overview_parser = subparsers.add_parser('overview', help="Build or extend the stored min/max/mean overview")
+    overview_parser.add_argument('files', nargs='+', help=".f5b recordings")
+    overview_parser.add_argument('--factor', type=int, default=8, help="Samples per bin growth per level")
+    overview_parser.set_defaults(func=_overview)
+
+    # Memory-mapped sidecars
+    fastopen_parser = subparsers.add_parser('fastopen', help="Build memory-mapped fast-open sidecars")
+    fastopen_parser.add_argument('files', nargs='+', help=".f5b recordings")
+    fastopen_parser.add_argument('--features', action='store_true', help="Also compute and cache stats and Higuchi features")
+    fastopen_parser.add_argument('--force', action='store_true', help="Rebuild sidecars that are current")
+    fastopen_parser.set_defaults(func=_fastopen)
+
+    # Shared feature computation
+    service_parser = subparsers.add_parser('feature-service', help="Run the feature service shared by SignalLab instances")
+    service_parser.add_argument('--workers', type=int, default=None, help="Compute processes (default: CPU count)")
+    service_parser.add_argument('--cache-dir', default=None, help="On-disk result cache (default ~/.cache/signallab/features)")
+    service_parser.add_argument('--no-disk-cache', action='store_true', help="Keep results in memory only")
+    service_parser.add_argument('--memory-mb', type=float, default=2048, help="Shared-memory cache budget")
+    service_parser.add_argument('--disk-mb', type=float, default=10240, help="On-disk cache budget")
+    service_parser.add_argument('--status', action='store_true', help="Report on a running service")
+    service_parser.add_argument('--stop', action='store_true', help="Stop a running service")
+    service_parser.set_defaults(func=_feature_service)
+
+    # Threshold search against labeled recordings
+    sweep_parser = subparsers.add_parser('sweep', help="Rank tracker/estimator thresholds against labels")
+    sweep_parser.add_argument('inputs', nargs='+', help="Labeled .f5b files or folders of them")
+    sweep_parser.add_argument('--space', help="JSON file {param: [values]} or {param: [\"range\", lo, hi]}")
+    sweep_parser.add_argument('--random', type=int, default=0, help="Random search with this many configurations")
+    sweep_parser.add_argument('--seed', type=int, default=0)
+    sweep_parser.add_argument('--workers', type=int, default=None, help="Processes (default: CPU count)")
+    sweep_parser.add_argument('--batch-size', type=int, default=32, help="Configurations evaluated together")
+    sweep_parser.add_argument('--metric', choices=['kappa', 'accuracy', 'balanced_accuracy'], default='kappa')
+    sweep_parser.add_argument('--top', type=int, default=10, help="Rows printed")
+    sweep_parser.add_argument('-o', '--output', default='sweep_results.csv', help="Ranked CSV table")
+    sweep_parser.set_defaults(func=_sweep)
+
+    # Annotator agreement
+    compare_parser = subparsers.add_parser('compare', help="Compare label versions between annotators")
+    compare_parser.add_argument('versions', nargs='+',
+                                help="One folder of .f5b copies per annotator (files matched by name)")
+    compare_parser.add_argument('--datasets', nargs='+',
+                                help="Label dataset per folder; with one folder, the datasets to compare")
+    compare_parser.add_argument('--workers', type=int, default=None, help="Processes (default: CPU count)")
+    compare_parser.add_argument('--sort', default='kappa', help="Report column to sort by")
+    compare_parser.add_argument('--descending', action='store_true')
+    compare_parser.add_argument('--top', type=int, default=10, help="Rows printed")
+    compare_parser.add_argument('-o', '--output', default='label_agreement.csv', help="Report CSV")
+    compare_parser.add_argument('--intervals', help="Also write every disagreement interval to this CSV")
+    compare_parser.set_defaults(func=_compare)
+
+    # Per-state feature distributions
+    sketch_parser = subparsers.add_parser('sketch', help="Sketch per-state feature distributions")
+    sketch_parser.add_argument('files', nargs='+', help="Labeled .f5b recordings")
+    sketch_parser.add_argument('-o', '--output', default='state_sketches.h5', help="Sketch file")
+    sketch_parser.add_argument('--append', action='store_true', help="Extend an existing sketch file")
+    sketch_parser.add_argument('--k', type=int, default=200, help="Sketch accuracy (rank error about 1.7/k)")
+    sketch_parser.add_argument('--workers', type=int, default=None, help="Processes (default: CPU count)")
+    sketch_parser.set_defaults(func=_sketch)
+
+    quantile_parser = subparsers.add_parser('quantiles', help="Print per-state quantiles from a sketch file")
+    quantile_parser.add_argument('sketches', help="Sketch file written by sketch")
+    quantile_parser.add_argument('--q', type=float, nargs='+', default=[0.05, 0.25, 0.5, 0.75, 0.95])
+    quantile_parser.add_argument('--features', nargs='+', help="Features to show (default all)")
+    quantile_parser.set_defaults(func=_quantiles)
+
+    # Headless reports
+    report_parser = subparsers.add_parser('report', help="Render PDF/PNG summaries of recordings")
+    report_parser.add_argument('inputs', nargs='+', help=".f5b recordings or folders of them")
+    report_parser.add_argument('-o', '--output-dir', default='reports', help="Output folder")
+    report_parser.add_argument('--format', choices=['pdf', 'png'], default='pdf')
+    report_parser.add_argument('--max-points', type=int, default=10000,
+                               help="Points drawn per series (0 draws every point)")
+    report_parser.add_argument('--dpi', type=int, default=100, help="PNG resolution")
+    report_parser.add_argument('--workers', type=int, default=None, help="Processes (default: CPU count)")
+    report_parser.set_defaults(func=_report)
+
+    # Feature index and queries
+    index_parser = subparsers.add_parser('index', help="Index per-segment features of labeled recordings")
+    index_parser.add_argument('inputs', nargs='+', help=".f5b files or folders of them")
+    index_parser.add_argument('-o', '--output', default='feature_index.h5', help="Index file")
+    index_parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    index_parser.set_defaults(func=_index)
+
+    query_parser = subparsers.add_parser('query', help="Find segments matching a feature query")
+    query_parser.add_argument('index', help="Index file from the index command")
+    query_parser.add_argument('query', help="e.g. \"range > 80 and higuchi_slope < -1.2 and state == Blood1\"")
+    query_parser.add_argument('--limit', type=int, default=20, help="Spans to print")
+    query_parser.add_argument('-o', '--output', help="Write all spans to this CSV")
+    query_parser.set_defaults(func=_query)
+
+    # Higuchi configuration sweep
+    higuchi_parser = subparsers.add_parser('higuchi-sweep', help="Higuchi features for many window/k-max settings")
+    higuchi_parser.add_argument('file', help=".f5b recording")
+    higuchi_parser.add_argument('--windows', type=float, nargs='+', default=[1, 2, 4], help="Window lengths (s)")
+    higuchi_parser.add_argument('--kmax', type=int, nargs='+', default=[3, 5, 8], help="k-max values")
+    higuchi_parser.add_argument('-o', '--output', help="Cube output file (default <file>_higuchi_sweep.h5)")
+    higuchi_parser.add_argument('--plot', help="Also save the scatter grid to this image/PDF")
+    higuchi_parser.set_defaults(func=_higuchi_sweep)
+
+    return parser
+
+def main(argv=None):
+    from siglab_lib.featureTable import set_feature_precision
+
+    args = build_parser().parse_args(argv)
+    set_feature_precision(args.precision)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
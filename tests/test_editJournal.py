@@ -0,0 +1,70 @@
+# tests/test_editJournal.py
+import os
+import numpy as np
+from siglab_lib.editJournal import EditJournal, journal_path
+
+NUM_SEGMENTS = 100
+
+def _replayed(filepath):
+    """Labels recovered from the journal by a new session"""
+    journal = EditJournal(filepath, NUM_SEGMENTS)
+    tag_state = np.zeros(NUM_SEGMENTS)
+    journal.replay(tag_state)
+    return journal, tag_state
+
+def test_edits_after_a_torn_record_replay(tmp_path):
+    filepath = str(tmp_path / 'rec.f5b')
+    journal = EditJournal(filepath, NUM_SEGMENTS)
+    tag_state = np.zeros(NUM_SEGMENTS)
+    journal.assign(tag_state, 0, 10, 1)
+    journal.assign(tag_state, 20, 30, 2)
+    journal.close()
+
+    # Crash while writing the second record
+    os.truncate(journal_path(filepath), os.path.getsize(journal_path(filepath)) - 3)
+
+    journal, tag_state = _replayed(filepath)
+    journal.assign(tag_state, 50, 60, 3)
+    journal.close()
+
+    expected = np.zeros(NUM_SEGMENTS)
+    expected[0:10] = 1
+    expected[50:60] = 3
+    np.testing.assert_array_equal(_replayed(filepath)[1], expected)
+
+def test_edits_after_a_torn_snapshot_replay(tmp_path):
+    filepath = str(tmp_path / 'rec.f5b')
+    journal = EditJournal(filepath, NUM_SEGMENTS)
+    tag_state = np.zeros(NUM_SEGMENTS)
+    journal.assign(tag_state, 0, 10, 1)
+    journal.close()
+    size_before = os.path.getsize(journal_path(filepath))
+
+    # Crash part way through a snapshot appended after the first record
+    with open(journal_path(filepath), 'ab') as f:
+        f.write(b'\xff\xff\xff\xff' + bytes(6) + bytes(20))
+
+    journal, tag_state = _replayed(filepath)
+    assert os.path.getsize(journal_path(filepath)) == size_before
+    journal.assign(tag_state, 40, 45, 4)
+    journal.close()
+
+    expected = np.zeros(NUM_SEGMENTS)
+    expected[0:10] = 1
+    expected[40:45] = 4
+    np.testing.assert_array_equal(_replayed(filepath)[1], expected)
+
+def test_compacted_journal_replays_and_continues(tmp_path):
+    filepath = str(tmp_path / 'rec.f5b')
+    journal = EditJournal(filepath, NUM_SEGMENTS, compact_every=3)
+    tag_state = np.zeros(NUM_SEGMENTS)
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        start = int(rng.integers(0, NUM_SEGMENTS - 10))
+        journal.assign(tag_state, start, start + 10, int(rng.integers(0, 6)))
+        if journal.needs_compaction():
+            journal.compact(tag_state)
+    journal.undo(tag_state)
+    journal.close()
+
+    np.testing.assert_array_equal(_replayed(filepath)[1], tag_state)
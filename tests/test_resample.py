@@ -0,0 +1,23 @@
+# tests/test_resample.py
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+from siglab_lib.resample import resample_ratio, resample_signal
+
+@pytest.mark.parametrize('rate_in, rate_out', [(30, 25), (10, 30), (25, 30), (48, 16), (7, 3)])
+@pytest.mark.parametrize('chunk_samples', [1, 2, 7, 13, 1000, 1 << 20])
+def test_streaming_matches_resample_poly(rate_in, rate_out, chunk_samples):
+    x = np.random.default_rng(1).standard_normal(5003)
+    up, down = resample_ratio(rate_in, rate_out)
+    expected = resample_poly(x, up, down)
+
+    y = resample_signal(x, rate_in, rate_out, chunk_samples=chunk_samples)
+
+    assert len(y) == len(expected)
+    np.testing.assert_allclose(y, expected, rtol=0, atol=1e-6)
+
+def test_equal_rates_pass_through():
+    x = np.arange(10, dtype=np.float32)
+    y = resample_signal(x, 20, 20, chunk_samples=3)
+    assert y.dtype == np.float32
+    np.testing.assert_array_equal(y, x)